@@ -1,9 +1,7 @@
 import streamlit as st
 import networkx as nx
-import pickle
 import sys
 from pathlib import Path
-from pyvis.network import Network
 import streamlit.components.v1 as components
 
 ROOT_PATH = Path(__file__).resolve().parent
@@ -11,104 +9,162 @@ sys.path.append(str(ROOT_PATH))
 
 BASE_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_base.gpickle"
 FINAL_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_final.gpickle"
-TOPICS_CSV_PATH = ROOT_PATH / "data" / "processed" / "topicos_nomeados_llm.csv"
 
-from src.graph import graph_populate, graph_combiner
+from src import metrics, pipeline
+from src.graph.entity_index import get_entity_index, normalize_entity
+from src.graph.graph_store import get_graph_store
+from src.graph.graph_index import ClosureIndex, DEFAULT_NODE_BUDGET, get_focused_subgraph, get_tree_by_area
+from src.graph import graph_render
+from src.graph.graph_format import preferred_path
+from src.graph.graph_layout import graph_signature, saved_positions
+from src.graph import micro_view
 
 st.set_page_config(layout="wide", page_title="Taxonomia Dinâmica UFMG")
 
-def get_focused_subgraph(G, selected_categories=None):
-    if selected_categories:
-        lattes_nodes = [
-            n for n, attr in G.nodes(data=True) 
-            if attr.get('origin') == 'LATTES' and attr.get('Category') in selected_categories
-        ]
-    else:
-        lattes_nodes = [n for n, attr in G.nodes(data=True) if attr.get('origin') == 'LATTES']
-    
-    if not lattes_nodes:
-        return None 
-    
-    relevant_nodes = set(lattes_nodes)
-    for node in lattes_nodes:
-        try:
-            parents = list(G.predecessors(node))
-            relevant_nodes.update(parents)
-            for p in parents:
-                ancestors = nx.ancestors(G, p)
-                relevant_nodes.update(ancestors)
-        except:
-            pass
-    return G.subgraph(relevant_nodes)
-
-def get_tree_by_area(G, selected_areas):
-    nodes_to_keep = set()
-    for node in G.nodes():
-        if node in selected_areas:
-            nodes_to_keep.add(node)
-            descendants = nx.descendants(G, node)
-            nodes_to_keep.update(descendants)
-            ancestors = nx.ancestors(G, node)
-            nodes_to_keep.update(ancestors)
-
-    if not nodes_to_keep:
-        return None
-    return G.subgraph(nodes_to_keep)
+def get_closure_index():
+    """Índice de ancestrais/descendentes do grafo final, reaproveitado entre interações."""
+    return get_graph_store().derived(preferred_path(FINAL_GRAPH_PATH), "closure_index", ClosureIndex)
+
+def get_layout(layout_mode):
+    """(versão, posições) do modo, lidos do arquivo da etapa `layout`; posições None enquanto
+    a etapa não rodou para a versão atual do grafo final (o cálculo nunca roda na requisição)."""
+    signature = get_graph_store().derived(preferred_path(FINAL_GRAPH_PATH), "layout_signature", graph_signature)
+    return saved_positions(graph_render.LAYOUT_POSITIONS[layout_mode], signature)
+
+APP_STAGES = ["base_graph", "final_graph", "layout"]
+LOD_LEVELS = {1: "Grande Área", 2: "Área", 3: "Subárea", 4: "Especialidade"}
+VISAO_MACRO = "🌐 Taxonomia Geral (Grafo Macro)"
+PREFIXO_MICRO = "🔬 Subárea: "
 
 def check_and_run_pipeline():
+    """Atualiza em segundo plano as etapas desatualizadas enquanto a versão atual continua no ar."""
     status_box = st.sidebar.status("Verificando Dados...", expanded=True)
-    if not BASE_GRAPH_PATH.exists():
-        status_box.write("⚙️ Gerando Grafo Base...")
-        graph_populate.build_and_save_cnpq()
-    if not TOPICS_CSV_PATH.exists():
-        status_box.error("❌ Rode o 'topic_labeler_llm.py' primeiro!")
-        st.stop()
-    if not FINAL_GRAPH_PATH.exists():
-        status_box.write("⚙️ Realizando Enxerto...")
-        graph_combiner.run_grafting()
+    job = pipeline.get_background_job()
+
+    # Depois de uma falha, a etapa só é refeita quando o usuário pede; sem isso ela seria
+    # reiniciada a cada rerun enquanto continuasse desatualizada.
+    if not job.running and not job.failed:
+        pipeline.adopt_legacy_csv()
+        if not pipeline.LABELS_PATH.exists():
+            status_box.error("❌ Rode o 'topic_labeler_llm.py' primeiro!")
+            st.stop()
+        pendentes = pipeline.plan(APP_STAGES, include_upstream=False)
+        if pendentes:
+            for name, reason in pendentes:
+                status_box.write(f"⚙️ {name}: {reason}")
+            job.start(APP_STAGES, include_upstream=False)
+
+    if job.running:
+        status_box.update(label=f"⚙️ Atualizando ({job.current_stage or 'iniciando'})...", state="running")
+        if not FINAL_GRAPH_PATH.exists():
+            status_box.write("Aguardando a primeira versão do grafo. Recarregue em instantes.")
+            st.stop()
+        return
+
+    if job.failed:
+        status_box.update(label="Falha na atualização", state="error")
+        status_box.error(f"❌ {job.error}")
+        if status_box.button("🔁 Tentar novamente"):
+            job.start(APP_STAGES, include_upstream=False)
+            st.rerun()
+        if not FINAL_GRAPH_PATH.exists():
+            st.stop()
+        return
+
     status_box.update(label="Sistema Pronto", state="complete", expanded=False)
 
 def get_available_topics():
-    """Lê o grafo principal e retorna a lista de tópicos que possuem micro-grafos."""
-    if not FINAL_GRAPH_PATH.exists():
-        return []
-    with open(FINAL_GRAPH_PATH, 'rb') as f:
-        G_full = pickle.load(f)
-    
-    topics = [n for n, attr in G_full.nodes(data=True) if attr.get('origin') == 'LATTES' and attr.get('micro_path')]
-    return sorted(topics)
+    """Tópicos que possuem micro-grafos, lidos do manifesto (sem carregar o grafo final)."""
+    return sorted(micro_view.get_topic_manifest())
+
+def get_topic_labels():
+    """Id do tópico -> rótulo, pelo manifesto dos micro-grafos."""
+    return {entry["topic"]: label for label, entry in micro_view.get_topic_manifest().items()}
+
+def _abrir_topico(label, entidade=None):
+    st.session_state["visao"] = f"{PREFIXO_MICRO}{label}"
+    st.session_state["foco_pendente"] = entidade
+
+def render_entity_search():
+    """Busca de entidades em todos os micro-grafos pelo índice global, sem abrir os pickles."""
+    with st.sidebar.expander("🔎 Buscar Entidade"):
+        termo = st.text_input("Entidade (ex: Deep Learning):", key="entidade_busca")
+        if not termo:
+            return
+        index = get_entity_index()
+        encontrados = index.search(termo)
+        if not encontrados:
+            st.caption("Nenhuma entidade encontrada.")
+            return
+
+        nome = st.selectbox(
+            "Resultados:", [n for n, _ in encontrados],
+            format_func=lambda n: f"{n} ({dict(encontrados)[n]} tópicos)"
+        )
+        labels = get_topic_labels()
+        for topic_id, n_arestas in index.topics_for(nome):
+            label = labels.get(topic_id)
+            if label is None:
+                st.write(f"Tópico {topic_id} (sem nó no grafo final): {n_arestas} relações")
+                continue
+            st.button(f"{label} ({n_arestas} relações)", key=f"abrir_{topic_id}",
+                      on_click=_abrir_topico, args=(label, nome))
+        st.dataframe(
+            [{"Origem": u, "Relação": r, "Destino": v, "Tópico": t} for u, r, v, t in index.edges_for(nome)[:50]],
+            hide_index=True
+        )
 
 def render_micro_graph(topic_name):
     st.title("🔬 Inspeção de Subárea (Micro-Grafo)")
     st.subheader(f"Explorando as conexões internas de: {topic_name}")
 
-    with open(FINAL_GRAPH_PATH, 'rb') as f:
-        G_full = pickle.load(f)
-        
-    micro_path_str = G_full.nodes[topic_name].get('micro_path')
-    caminho_micro = ROOT_PATH / micro_path_str
+    entry = micro_view.get_topic_manifest().get(topic_name)
+    if entry is None:
+        st.error(f"Tópico sem micro-grafo no manifesto: {topic_name}")
+        return
+    caminho_micro = ROOT_PATH / entry["path"]
 
     if not caminho_micro.exists():
         st.error(f"Arquivo do micro-grafo não encontrado em: {caminho_micro}")
         return
         
-    with open(caminho_micro, 'rb') as f:
-        G_micro = pickle.load(f)
+    micro_path = preferred_path(caminho_micro)
+    store = get_graph_store()
+    G_micro = store.get(micro_path)
+    ranking = store.derived(micro_path, "degree_ranking", micro_view.degree_ranking)
         
     st.sidebar.divider()
     st.sidebar.header("📊 Estatísticas da Subárea")
     st.sidebar.write(f"**Entidades Extraídas:** {G_micro.number_of_nodes()}")
     st.sidebar.write(f"**Relações Mapeadas:** {G_micro.number_of_edges()}")
-    
-    net = Network(height="700px", width="100%", bgcolor="#ffffff", font_color="black", directed=True)
-    net.from_nx(G_micro)
-    net.repulsion(node_distance=150, spring_length=200) 
-    
-    path_html = ROOT_PATH / "data" / "processed" / "micro_graph_viz.html"
-    net.save_graph(str(path_html))
-    
-    with open(path_html, 'r', encoding='utf-8') as f:
-        source_code = f.read()
+
+    st.sidebar.header("🧭 Recorte do Micro-Grafo")
+    foco_pendente = st.session_state.pop("foco_pendente", None)
+    if foco_pendente is not None:
+        chave = normalize_entity(foco_pendente)
+        st.session_state[f"micro_foco_{topic_name}"] = next((n for n in ranking if normalize_entity(n) == chave), None)
+    foco = st.sidebar.selectbox(
+        "Centralizar na entidade:", [None] + ranking, key=f"micro_foco_{topic_name}",
+        format_func=lambda n: "— Mais conectadas do tópico —" if n is None else f"{n} (grau {G_micro.degree(n)})"
+    )
+    hops = micro_view.DEFAULT_HOPS
+    if foco is not None:
+        hops = st.sidebar.slider("Distância máxima (saltos):", 1, 3, micro_view.DEFAULT_HOPS)
+        ranking = micro_view.neighbourhood_ranking(G_micro, foco, hops)
+    page_size = st.sidebar.slider("Entidades por página:", 10, 200, micro_view.DEFAULT_PAGE_SIZE, step=10)
+    pages = micro_view.page_count(len(ranking), page_size)
+    page = 0
+    if pages > 1:
+        page = st.sidebar.number_input(f"Página (de {pages}):", min_value=1, max_value=pages, value=1) - 1
+
+    G_page = micro_view.micro_page(G_micro, ranking, page, page_size, focus=foco)
+    st.caption(f"Mostrando {G_page.number_of_nodes()} de {len(ranking)} entidades "
+               f"(página {page + 1} de {pages}, {G_page.number_of_edges()} relações).")
+
+    micro_key = ("micro", str(micro_path), store.version(micro_path), foco, hops, page_size, page)
+    source_code = graph_render.get_render_cache().get_or_render(
+        micro_key, lambda: graph_render.build_micro_html(G_page, focus=foco, degrees=dict(G_micro.degree()))
+    )
         
     components.html(source_code, height=760)
 
@@ -116,15 +172,14 @@ def render_macro_graph():
     st.title("🧬 Taxonomia Viva: CNPq + Lattes")
     st.markdown("Use o menu lateral **'Navegação'** para mergulhar em um tópico específico.")
     
-    with open(FINAL_GRAPH_PATH, 'rb') as f:
-        G_full = pickle.load(f)
+    graph_path = preferred_path(FINAL_GRAPH_PATH)
+    version = get_graph_store().version(graph_path)
+    index = get_closure_index()
 
     st.sidebar.divider()
     st.sidebar.header("🔍 Filtros da Taxonomia")
   
-    all_categories = sorted(list(set(
-        [attr.get('Category') for n, attr in G_full.nodes(data=True) if attr.get('Category')]
-    )))
+    all_categories = index.categories()
     
     selected_areas = st.sidebar.multiselect(
         "Filtrar por Grande Área:",
@@ -142,89 +197,140 @@ def render_macro_graph():
         st.warning("Selecione pelo menos uma área.")
         return
 
+    lod = None
     if show_full_tree:
-        G_viz = get_tree_by_area(G_full, selected_areas)
-        if G_viz is None:
-             st.warning("Não foi possível encontrar a estrutura dessas áreas no grafo.")
-             return
-        st.sidebar.warning(f"⚠️ Exibindo estrutura completa: {G_viz.number_of_nodes()} nós.")
-    else:
-        G_viz = get_focused_subgraph(G_full, selected_categories=selected_areas)
-        if G_viz is None or G_viz.number_of_nodes() == 0:
-            st.warning("Nenhum tópico encontrado para essa seleção.")
-            return
-        st.sidebar.success(f"Foco: {G_viz.number_of_nodes()} nós relevantes.")
+        lod_layer = st.sidebar.select_slider(
+            "Nível de detalhe:",
+            options=list(LOD_LEVELS),
+            value=2,
+            format_func=lambda layer: LOD_LEVELS[layer],
+            help="Ramos abaixo deste nível aparecem recolhidos em um único nó."
+        )
+        lod = {
+            "max_layer": lod_layer,
+            "expanded": st.session_state.get("lod_expanded", []),
+            "node_budget": DEFAULT_NODE_BUDGET,
+        }
+        expand_slot = st.sidebar.empty()
+
+    selection_status = st.sidebar.empty()
 
     st.sidebar.divider()
     st.sidebar.header("🎨 Aparência")
     
     layout_mode = st.sidebar.selectbox(
         "Formato do Grafo:",
-        ["Hierárquico (Árvore Organizada)", "Explosão (Espalhado)"],
+        graph_render.LAYOUT_MODES,
         index=0
     )
 
     show_labels = st.sidebar.toggle("Mostrar Nomes (Rótulos)", value=True)
 
-    G_plot = G_viz.copy()
+    layout_version, positions = get_layout(layout_mode)
+    view = graph_render.cached_macro_view(
+        graph_render.get_render_cache(), version, index,
+        selected_areas, show_full_tree, layout_mode, show_labels,
+        positions=positions, lod=lod, layout_version=layout_version
+    )
 
-    for node in G_plot.nodes():
-        attrs = G_plot.nodes[node]
-        if 'layer' in attrs:
-            attrs['level'] = attrs['layer']
-            if attrs.get('origin') == 'LATTES':
-                 attrs['level'] = 5 
+    if lod is not None and view["lod_info"] is not None:
+        info = view["lod_info"]
+        with expand_slot.container():
+            st.multiselect(
+                "Expandir ramos recolhidos:",
+                options=sorted(set(info["collapsed"]) | set(lod["expanded"])),
+                key="lod_expanded"
+            )
+            if info["dropped"]:
+                st.caption(f"Limite de {DEFAULT_NODE_BUDGET} nós: não foi possível expandir {', '.join(info['dropped'])}.")
+            if info["max_layer"] != lod["max_layer"]:
+                st.caption(f"Limite de {DEFAULT_NODE_BUDGET} nós: detalhe reduzido para '{LOD_LEVELS.get(info['max_layer'], info['max_layer'])}'.")
 
-        if not show_labels:
-            if 'title' not in attrs or not attrs['title']:
-                attrs['title'] = str(attrs.get('label', node))
-            attrs['label'] = " " 
-        
-    net = Network(height="700px", width="100%", bgcolor="#ffffff", font_color="black")
-    net.from_nx(G_plot)
-
-    if layout_mode == "Hierárquico (Árvore Organizada)":
-        net.set_options("""
-        var options = {
-          "layout": { "hierarchical": { "enabled": true, "direction": "UD", "sortMethod": "directed", "nodeSpacing": 380, "treeSpacing": 380, "levelSeparation": 220 } },
-          "physics": { "enabled": false }, 
-          "interaction": { "hover": true }
-        }
-        """)
+    if show_full_tree:
+        if view["html"] is None:
+             st.warning("Não foi possível encontrar a estrutura dessas áreas no grafo.")
+             return
+        selection_status.warning(f"⚠️ Exibindo estrutura completa: {view['nodes']} nós.")
     else:
-        net.set_options("""
-        var options = {
-          "physics": {
-            "forceAtlas2Based": { "gravitationalConstant": -50, "springLength": 100, "springConstant": 0.08, "damping": 0.4 },
-            "maxVelocity": 50, "minVelocity": 0.1, "solver": "forceAtlas2Based",
-            "stabilization": { "enabled": true, "iterations": 1000, "updateInterval": 25, "onlyDynamicEdges": false, "fit": true }
-          },
-          "interaction": { "hover": true }
-        }
-        """)
+        if view["html"] is None:
+            st.warning("Nenhum tópico encontrado para essa seleção.")
+            return
+        selection_status.success(f"Foco: {view['nodes']} nós relevantes.")
 
-    path_html = ROOT_PATH / "data" / "processed" / "graph_viz.html"
-    net.save_graph(str(path_html))
-    
-    with open(path_html, 'r', encoding='utf-8') as f:
-        source_code = f.read()
+    components.html(view["html"], height=760)
 
-    components.html(source_code, height=760)
+def prewarm_on_publish(path, version):
+    """Pré-renderiza a visão padrão assim que uma nova versão do grafo final é carregada."""
+    if path != str(preferred_path(FINAL_GRAPH_PATH).resolve()):
+        return
+    layouts = {mode: get_layout(mode) for mode in graph_render.LAYOUT_MODES}
+    graph_render.prewarm_macro_views(graph_render.get_render_cache(), version, get_closure_index(), layouts)
+
+get_graph_store().add_listener("prewarm_macro", prewarm_on_publish)
+
+def render_store_stats():
+    stats = get_graph_store().stats()
+    with st.sidebar.expander("⏱️ Cache de Grafos"):
+        st.write(f"**Carregamentos do disco:** {stats['loads']}")
+        st.write(f"**Acertos em memória:** {stats['hits']}")
+        st.write(f"**Último carregamento:** {stats['last_load_seconds'] * 1000:.1f} ms")
+        st.write(f"**Tempo total de carga:** {stats['load_seconds_total']:.2f} s")
+        st.write(f"**Trocas de versão em segundo plano:** {stats['background_reloads']} "
+                 f"({stats['stale_hits']} leituras da versão anterior durante a carga)")
+        render_stats = graph_render.get_render_cache().stats()
+        st.write(f"**Renderizações em cache:** {render_stats['entries']} "
+                 f"({render_stats['hits']} acertos / {render_stats['misses']} faltas)")
+
+def render_pipeline_metrics():
+    run, stages = metrics.last_run()
+    if run is None:
+        return
+    with st.sidebar.expander("📈 Última Execução do Pipeline"):
+        st.write(f"**Concluída em:** {run['finished_at']} ({run['wall_s']:.1f} s)")
+        if run.get("error"):
+            st.error(run["error"])
+        linhas = []
+        for r in stages:
+            llm = r.get("llm", {})
+            caches = r.get("caches", {})
+            linhas.append({
+                "Etapa": r["stage"],
+                "Parede (s)": r["wall_s"],
+                "CPU (s)": r["cpu_s"],
+                "Pico RSS (MB)": r["peak_rss_mb"],
+                "Chamadas LLM": llm.get("calls", 0),
+                "LLM p50/p90 (s)": f"{llm['p50_s']:.2f} / {llm['p90_s']:.2f}" if "p50_s" in llm else "-",
+                "Tokens": llm.get("tokens", {}).get("input", 0) + llm.get("tokens", {}).get("output", 0),
+                "Acerto de cache": ", ".join(
+                    f"{nome}: {c['hit_rate']:.0%}" for nome, c in caches.items() if c.get("hit_rate") is not None
+                ) or "-",
+            })
+        st.dataframe(linhas, hide_index=True)
+        for r in stages:
+            if r.get("spans") or r.get("counters"):
+                st.caption(f"**{r['stage']}**: " + ", ".join(
+                    [f"{k} {v['seconds']:.2f}s ({v['calls']}x)" for k, v in r.get("spans", {}).items()]
+                    + [f"{k}={v}" for k, v in r.get("counters", {}).items()]
+                ))
 
 if __name__ == "__main__":
     check_and_run_pipeline()
     
-    opcoes_visao = ["🌐 Taxonomia Geral (Grafo Macro)"]
+    opcoes_visao = [VISAO_MACRO]
     topicos_disponiveis = get_available_topics()
-    opcoes_visao.extend([f"🔬 Subárea: {t}" for t in topicos_disponiveis])
+    opcoes_visao.extend([f"{PREFIXO_MICRO}{t}" for t in topicos_disponiveis])
     
     st.sidebar.header("🗺️ Navegação")
-    visao_selecionada = st.sidebar.selectbox("Escolha o Nível de Visualização:", opcoes_visao)
+    visao_selecionada = st.sidebar.selectbox("Escolha o Nível de Visualização:", opcoes_visao, key="visao")
+    render_entity_search()
     
-    if visao_selecionada == "🌐 Taxonomia Geral (Grafo Macro)":
+    if visao_selecionada == VISAO_MACRO:
         if st.sidebar.button("🔄 Recarregar Dados"):
             st.rerun()
         render_macro_graph()
     else:
-        nome_topico = visao_selecionada.replace("🔬 Subárea: ", "")
-        render_micro_graph(nome_topico)
\ No newline at end of file
+        nome_topico = visao_selecionada.replace(PREFIXO_MICRO, "")
+        render_micro_graph(nome_topico)
+
+    render_store_stats()
+    render_pipeline_metrics()
\ No newline at end of file
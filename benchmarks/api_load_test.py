@@ -0,0 +1,138 @@
+"""Teste de carga da API HTTP (`src/api.py`): requisições por segundo e latência p50/p90/p99.
+
+Sem `--url`, sobe a API num subprocesso sobre os grafos de `data/processed` e a derruba no fim.
+Cada rodada dispara `--requests` requisições com `--concurrency` conexões simultâneas,
+alternando entre os endpoints; com `--conditional`, os clientes reenviam o ETag recebido
+(If-None-Match) e medem o caminho 304.
+
+    python benchmarks/api_load_test.py --requests 5000 --concurrency 50 --conditional
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError, HTTPRequest
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src.api import DEFAULT_PORT
+
+PERCENTILES = (50, 90, 99)
+
+
+async def _fetch(client, url: str, etag: str = None):
+    headers = {"If-None-Match": etag} if etag else {}
+    try:
+        response = await client.fetch(HTTPRequest(url, headers=headers))
+    except HTTPClientError as e:
+        if e.code != 304:
+            raise
+        response = e.response
+    return response.code, response.headers.get("ETag")
+
+
+async def _wait_ready(base_url: str, timeout: float = 120):
+    client = AsyncHTTPClient()
+    limite = time.perf_counter() + timeout
+    while time.perf_counter() < limite:
+        try:
+            await client.fetch(f"{base_url}/health")
+            return
+        except Exception:
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"API não respondeu em {timeout:.0f}s: {base_url}")
+
+
+async def endpoints(base_url: str) -> list:
+    """URLs exercitadas: listagens, subgrafos por categoria/área e micro-grafos."""
+    client = AsyncHTTPClient()
+    topics = json.loads((await client.fetch(f"{base_url}/topics")).body)["topics"]
+    categories = json.loads((await client.fetch(f"{base_url}/categories")).body)["categories"]
+    urls = [f"{base_url}/topics", f"{base_url}/categories", f"{base_url}/subgraph/focused"]
+    for category in categories[:3]:
+        urls.append(f"{base_url}/subgraph/focused?category={quote(category)}")
+        urls.append(f"{base_url}/subgraph/tree?area={quote(category)}")
+    for topic in topics[:5]:
+        urls.append(f"{base_url}/topics/{topic['topic']}/micro")
+    return urls
+
+
+async def run_load(urls: list, n_requests: int, concurrency: int, conditional: bool) -> dict:
+    AsyncHTTPClient.configure(None, max_clients=concurrency)
+    client = AsyncHTTPClient()
+    etags = {}
+    if conditional:
+        for url in urls:
+            etags[url] = (await _fetch(client, url))[1]
+
+    latencies = []
+    status = {}
+    queue = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(urls[i % len(urls)])
+
+    async def worker():
+        while not queue.empty():
+            url = queue.get_nowait()
+            inicio = time.perf_counter()
+            code, _ = await _fetch(client, url, etags.get(url))
+            latencies.append(time.perf_counter() - inicio)
+            status[code] = status.get(code, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - inicio
+
+    values = np.percentile(latencies, PERCENTILES) * 1000
+    return {
+        "conditional": conditional,
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(n_requests / elapsed, 1),
+        **{f"p{p}_ms": round(float(v), 2) for p, v in zip(PERCENTILES, values)},
+        "status": {str(k): v for k, v in sorted(status.items())},
+    }
+
+
+async def main_async(args) -> list:
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([sys.executable, "-m", "src.api", "--port", str(args.port)], cwd=ROOT_PATH)
+    try:
+        await _wait_ready(base_url)
+        urls = await endpoints(base_url)
+        results = [await run_load(urls, args.requests, args.concurrency, conditional=False)]
+        if args.conditional:
+            results.append(await run_load(urls, args.requests, args.concurrency, conditional=True))
+        return results
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="API já em execução (padrão: sobe uma local).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT + 1)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--conditional", action="store_true", help="Roda também com If-None-Match.")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Mede a vazão (sentenças/s) do serviço de codificação em cada configuração de CPU.
+
+Combina backend (torch, onnx, onnx-int8), número de processos e ordenação por tamanho,
+sempre sem o cache de embeddings, sobre os documentos do dataset de currículos.
+
+Uso: python benchmarks/encoding_bench.py [--n 2000] [--processes 1 4] [--backends torch onnx-int8]
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src.etl.curriculos_loader import iter_document_batches
+from src.etl.encoding_service import BACKENDS, DEFAULT_BATCH_SIZE, EncodingService
+
+DEFAULT_DATASET = ROOT_PATH / "data" / "curriculos" / "dataset_bertopic.csv"
+
+
+def load_texts(dataset: Path, n: int) -> list:
+    docs = [doc for batch in iter_document_batches(dataset) for doc in batch]
+    # Repete o corpus até `n` textos, variando o sufixo para não haver duplicatas exatas.
+    return [f"{doc} ({i // len(docs)})" for i, doc in zip(range(n), itertools.cycle(docs))]
+
+
+def measure(texts: list, backend: str, processes: int, bucket: bool, batch_size: int) -> dict:
+    service = EncodingService(backend=backend, processes=processes, batch_size=batch_size, bucket_by_length=bucket)
+    try:
+        service.encode(texts[:batch_size])
+        if service.processes > 1:
+            service._get_pool()
+        inicio = time.perf_counter()
+        vectors = service.encode(texts)
+        elapsed = time.perf_counter() - inicio
+    finally:
+        service.close()
+    return {
+        "backend": backend,
+        "processes": service.processes,
+        "bucket_by_length": bucket,
+        "batch_size": batch_size,
+        "texts": len(texts),
+        "seconds": round(elapsed, 3),
+        "sentences_per_second": round(len(texts) / elapsed, 1),
+        "dim": int(vectors.shape[1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", type=Path, default=DEFAULT_DATASET)
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--backends", nargs="*", default=["torch"], choices=BACKENDS)
+    parser.add_argument("--processes", nargs="*", type=int, default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    texts = load_texts(args.dataset, args.n)
+    vistos = set()
+    for backend, processes, bucket in itertools.product(args.backends, args.processes, (False, True)):
+        # Os backends ONNX rodam sempre em um processo; não repete a mesma medição.
+        chave = (backend, processes if backend == "torch" else 1, bucket)
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        print(json.dumps(measure(texts, backend, processes, bucket, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
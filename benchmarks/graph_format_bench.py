@@ -0,0 +1,84 @@
+"""Compara o tempo de carga e o pico de memória (RSS) do pickle com o formato compacto `.tgraph`.
+
+Uso: python benchmarks/graph_format_bench.py [--graph caminho.gpickle] [--repeat N]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import pickle
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src.graph.graph_format import CompactGraph
+
+DEFAULT_GRAPH = ROOT_PATH / "data" / "processed" / "grafo_final.gpickle"
+
+
+def _load(mode: str, path: str):
+    if mode == "pickle":
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    if mode == "compact_mmap":
+        return CompactGraph.load(path)
+    if mode == "compact_to_networkx":
+        return CompactGraph.load(path).to_networkx()
+    raise ValueError(mode)
+
+
+def _measure(mode: str, path: str, repeat: int, queue):
+    rss_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        graph = _load(mode, path)
+        tempos.append(time.perf_counter() - inicio)
+    rss_depois = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del graph
+    queue.put({
+        "mode": mode,
+        "best_ms": min(tempos) * 1000,
+        "mean_ms": sum(tempos) / len(tempos) * 1000,
+        "peak_rss_delta_kb": rss_depois - rss_antes,
+    })
+
+
+def run(graph_path: Path, repeat: int) -> list:
+    with open(graph_path, 'rb') as f:
+        G = pickle.load(f)
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    compact_path = tmp_dir / (graph_path.stem + ".tgraph")
+    CompactGraph.from_networkx(G).save(compact_path)
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for mode, path in (("pickle", graph_path), ("compact_mmap", compact_path), ("compact_to_networkx", compact_path)):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_measure, args=(mode, str(path), repeat, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        result["file_bytes"] = Path(path).stat().st_size
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--graph", type=Path, default=DEFAULT_GRAPH)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.graph, args.repeat)
+    for r in results:
+        print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
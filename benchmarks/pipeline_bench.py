@@ -0,0 +1,182 @@
+"""Benchmark de ponta a ponta sobre dados sintéticos, sem rede: encoder e LLM são substituídos
+pelos stand-ins determinísticos de `benchmarks/synthetic.py`.
+
+Cada caso roda `--repeat` vezes e o resultado sai em JSON (com o commit atual), para comparar
+entre versões: python benchmarks/pipeline_bench.py --docs 100000 --nodes 10000 --output antes.json
+
+Casos: load_curricula, populate, labeling, graft, closure_index, focused_subgraph,
+tree_by_area, render_macro.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import networkx as nx
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from benchmarks.synthetic import (HashEncoder, StubLabelingChain, generate_curricula, generate_taxonomy,
+                                  generate_topics, taxonomy_names)
+from src.etl.curriculos_loader import contar_tipos
+from src.etl.topic_labeler_llm import processar_topicos
+from src.etl.topic_store import TopicStore
+from src.graph import graph_render
+from src.graph.graph_combiner import graft_lattes_topics
+from src.graph.graph_index import ClosureIndex, get_focused_subgraph, get_tree_by_area
+from src.graph.graph_populate import recursive_graph_populate
+from src.graph.vector_index import ExactIndex, get_cnpq_candidates
+
+CASES = ["load_curricula", "populate", "labeling", "graft", "closure_index",
+         "focused_subgraph", "tree_by_area", "render_macro"]
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_PATH,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timed(fn, repeat: int, setup=None) -> dict:
+    """Executa `fn(setup())` `repeat` vezes; só `fn` é cronometrada e a saída do console é descartada."""
+    tempos = []
+    result = None
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            result = fn(arg)
+            tempos.append(time.perf_counter() - inicio)
+    return {"best_s": round(min(tempos), 6), "mean_s": round(sum(tempos) / len(tempos), 6), "result": result}
+
+
+def run(n_docs: int, n_nodes: int, n_topics: int, repeat: int, cases=None, seed: int = 0,
+        keep: bool = False) -> dict:
+    """Roda os casos numa pasta temporária, apagada no final (a não ser com `keep`)."""
+    work_dir = Path(tempfile.mkdtemp(prefix="taxonomia_bench_"))
+    try:
+        return _run_cases(work_dir, n_docs, n_nodes, n_topics, repeat, cases, seed)
+    finally:
+        if keep:
+            print(f"Arquivos do benchmark mantidos em: {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _run_cases(work_dir: Path, n_docs: int, n_nodes: int, n_topics: int, repeat: int, cases=None, seed: int = 0) -> dict:
+    cases = cases or CASES
+    encoder = HashEncoder()
+    results = []
+
+    def record(case, timing, **extra):
+        timing.pop("result", None)
+        results.append({"case": case, **timing, **extra})
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    taxonomy = generate_taxonomy(n_nodes, seed)
+    area_names = taxonomy_names(taxonomy, 2) or taxonomy_names(taxonomy, 1)
+
+    if "load_curricula" in cases:
+        dataset = generate_curricula(n_docs, work_dir / "dataset.csv", seed)
+        timing = _timed(lambda _: contar_tipos(dataset), repeat)
+        record("load_curricula", timing, docs=n_docs, counts=timing["result"])
+
+    def populate(_):
+        G = nx.DiGraph(name="Taxonomia Sintética")
+        recursive_graph_populate(G, taxonomy)
+        return G
+
+    timing = _timed(populate, repeat)
+    G_base = timing["result"]
+    if "populate" in cases:
+        record("populate", timing, nodes=G_base.number_of_nodes(), edges=G_base.number_of_edges())
+
+    store = TopicStore(work_dir / "topic_store")
+    store.write_topics(generate_topics(n_topics, seed))
+    chain = StubLabelingChain(area_names)
+    timing = _timed(
+        lambda _: processar_topicos(store.root, chain=chain, requests_per_second=0),
+        repeat if "labeling" in cases else 1
+    )
+    if "labeling" in cases:
+        record("labeling", timing, topics=n_topics + 1)
+    df_topics = store.read_labeled_topics()
+
+    leaves = get_cnpq_candidates(G_base, scope="leaves")
+    index = ExactIndex(leaves, encoder.encode(leaves))
+    timing = _timed(
+        lambda G: graft_lattes_topics(G, df_topics, model=encoder, index=index),
+        repeat if "graft" in cases else 1, setup=G_base.copy
+    )
+    G_final = timing["result"]
+    if "graft" in cases:
+        lattes = sum(1 for _, a in G_final.nodes(data=True) if a.get('origin') == 'LATTES')
+        record("graft", timing, leaves=len(leaves), lattes_nodes=lattes,
+               edges_added=G_final.number_of_edges() - G_base.number_of_edges())
+
+    timing = _timed(lambda _: ClosureIndex(G_final), repeat if "closure_index" in cases else 1)
+    closure = timing["result"]
+    if "closure_index" in cases:
+        record("closure_index", timing, nodes=G_final.number_of_nodes())
+
+    categories = closure.categories()
+    selected = categories[:max(1, len(categories) // 4)]
+    if "focused_subgraph" in cases:
+        timing = _timed(lambda _: get_focused_subgraph(G_final, selected, index=closure), repeat)
+        record("focused_subgraph", timing, selected=len(selected),
+               nodes=timing["result"].number_of_nodes() if timing["result"] is not None else 0)
+
+    if "tree_by_area" in cases:
+        timing = _timed(lambda _: get_tree_by_area(G_final, selected, index=closure), repeat)
+        record("tree_by_area", timing, selected=len(selected),
+               nodes=timing["result"].number_of_nodes() if timing["result"] is not None else 0)
+
+    if "render_macro" in cases:
+        timing = _timed(lambda _: graph_render.render_macro_view(
+            closure, selected, False, graph_render.LAYOUT_HIERARCHICAL, True
+        ), repeat)
+        record("render_macro", timing, nodes=timing["result"]["nodes"], html_bytes=len(timing["result"]["html"] or ""))
+
+    return {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {"docs": n_docs, "nodes": n_nodes, "topics": n_topics, "repeat": repeat, "seed": seed},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1_000, help="Currículos sintéticos (10^3 a 10^6).")
+    parser.add_argument("--nodes", type=int, default=1_000, help="Nós da taxonomia sintética (10^3 a 10^5).")
+    parser.add_argument("--topics", type=int, default=None, help="Tópicos sintéticos (padrão: docs / 50).")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", nargs="*", choices=CASES, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="Arquivo JSON de saída (padrão: stdout).")
+    parser.add_argument("--keep", action="store_true",
+                        help="Mantém a pasta temporária com o dataset e o TopicStore sintéticos.")
+    args = parser.parse_args()
+
+    n_topics = args.topics if args.topics is not None else max(1, args.docs // 50)
+    report = run(args.docs, args.nodes, n_topics, args.repeat, args.cases, args.seed, keep=args.keep)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output is not None:
+        args.output.write_text(text, encoding='utf-8')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Geradores determinísticos de taxonomias e currículos sintéticos e substitutos locais do
+encoder e do LLM, para rodar os benchmarks sem rede e em qualquer escala."""
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src.etl.topic_labeler_llm import AreaPrediction, TopicLabel
+
+LEVEL_PREFIXES = ["Grande Área", "Área", "Subárea", "Especialidade"]
+VOCABULARY = (
+    "modelagem computacional dados redes aprendizado ensino saúde coletiva epidemiologia robótica "
+    "educação energia solar gestão inovação tecnologia social políticas públicas território escola "
+    "algoritmos otimização simulação sistemas informação biologia genética ambiente sustentabilidade "
+    "economia turismo cultura filosofia ética linguagem análise estatística controle produção "
+    "engenharia materiais física química matemática avaliação formação docente pesquisa extensão"
+).split()
+DOC_TYPES = ["bibliographic_production", "abstract"]
+
+
+def _seed(*parts) -> int:
+    return int(hashlib.sha1("|".join(map(str, parts)).encode('utf-8')).hexdigest()[:8], 16)
+
+
+def generate_taxonomy(n_nodes: int, seed: int = 0) -> dict:
+    """Taxonomia no formato do `cnpq_taxonomy.json` (raiz "CNPQ" + 4 níveis) com ~`n_nodes` nós.
+
+    O fator de ramificação é o menor que alcança `n_nodes` em 4 níveis; a árvore é
+    preenchida em largura e cortada ao atingir o total, como uma tabela real desbalanceada.
+    """
+    branching = 1
+    while sum(branching ** k for k in range(1, 5)) < n_nodes:
+        branching += 1
+    rng = np.random.default_rng(seed)
+
+    root = {"name": "CNPQ", "children": []}
+    frontier = [(root, "")]
+    count = 0
+    for depth in range(4):
+        next_frontier = []
+        for node, code in frontier:
+            n_children = max(1, int(rng.integers(max(1, branching - 1), branching + 2)))
+            for i in range(n_children):
+                if count >= n_nodes:
+                    break
+                child_code = f"{code}.{i + 1}" if code else str(i + 1)
+                child = {"name": f"{LEVEL_PREFIXES[depth]} {child_code}"}
+                node.setdefault("children", []).append(child)
+                next_frontier.append((child, child_code))
+                count += 1
+        frontier = next_frontier
+    return root
+
+
+def taxonomy_names(taxonomy: dict, depth: int) -> list:
+    """Nomes dos nós na profundidade `depth` (1 = Grande Área)."""
+    level = [taxonomy]
+    for _ in range(depth):
+        level = [child for node in level for child in node.get("children", [])]
+    return [node["name"] for node in level]
+
+
+def _document(rng) -> str:
+    words = rng.choice(VOCABULARY, size=int(rng.integers(15, 80)))
+    return " ".join(words).capitalize() + "."
+
+
+def generate_curricula(n_docs: int, path, seed: int = 0, chunk_rows: int = 100_000) -> Path:
+    """CSV no formato do `dataset_bertopic.csv`, gravado em blocos para não montar tudo em memória."""
+    path = Path(path)
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_docs, chunk_rows):
+        rows = range(start, min(start + chunk_rows, n_docs))
+        pd.DataFrame({
+            "researcher_id": [f"pesq-{i // 20:07d}" for i in rows],
+            "name": [f"Pesquisador {i // 20}" for i in rows],
+            "content": [_document(rng) for _ in rows],
+            "type": [DOC_TYPES[int(rng.random() < 0.1)] for _ in rows],
+        }).to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+def generate_topics(n_topics: int, seed: int = 0) -> pd.DataFrame:
+    """Tabela no formato de `get_topic_info` do BERTopic (a entrada do `TopicStore`), incluindo o tópico -1."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for topic in range(-1, n_topics):
+        words = [str(w) for w in rng.choice(VOCABULARY, size=10, replace=False)]
+        docs = [_document(rng) for _ in range(3)]
+        rows.append({
+            "Topic": topic,
+            "Count": int(rng.integers(5, 200)),
+            "Name": f"{topic}_" + "_".join(words[:4]),
+            "Representation": words,
+            "Representative_Docs": docs,
+        })
+    return pd.DataFrame(rows)
+
+
+def _features(text: str):
+    """Palavras com peso 1; códigos hierárquicos ("1.2.3") viram seus prefixos com peso 2, para
+    que um tópico ligado à "Área 1.2" fique próximo das folhas "Especialidade 1.2.x.y"."""
+    for token in text.lower().replace("(", " ").replace(")", " ").split():
+        if token[0].isdigit():
+            parts = token.split(".")
+            for k in range(1, len(parts) + 1):
+                yield ".".join(parts[:k]), 2.0
+        else:
+            yield token, 1.0
+
+
+class HashEncoder:
+    """Encoder determinístico por feature hashing das palavras; substitui o SentenceTransformer."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in _features(text):
+                h = _seed(feature)
+                vectors[row, h % self.dim] += weight if (h >> 16) & 1 else -weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class StubLabelingChain:
+    """Substituto da chain de rotulagem: a mesma entrada sempre gera o mesmo `TopicLabel`."""
+
+    def __init__(self, area_names: list):
+        self.area_names = list(area_names)
+
+    def invoke(self, inputs: dict) -> TopicLabel:
+        rng = np.random.default_rng(_seed(inputs["keywords"], inputs["docs"]))
+        keywords = [w.strip(" '[]") for w in str(inputs["keywords"]).split(",")]
+        n_areas = int(rng.integers(1, 4))
+        areas = rng.choice(len(self.area_names), size=min(n_areas, len(self.area_names)), replace=False)
+        confidences = sorted(rng.uniform(0.5, 0.95, size=len(areas)), reverse=True)
+        return TopicLabel(
+            short_label=" ".join(keywords[:3]).title(),
+            multi_areas=[
+                AreaPrediction(area_name=self.area_names[i], confidence=round(float(c), 2))
+                for i, c in zip(areas, confidences)
+            ],
+        )
+
+    async def ainvoke(self, inputs: dict) -> TopicLabel:
+        return self.invoke(inputs)
@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import tornado.web
+from tornado.ioloop import IOLoop
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src.graph import micro_view
+from src.graph.entity_index import entity_index_version, get_entity_index
+from src.graph.graph_format import preferred_path
+from src.graph.graph_index import ClosureIndex, get_focused_subgraph, get_tree_by_area
+from src.graph.graph_render import RenderCache
+from src.graph.graph_store import get_graph_store
+
+FINAL_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_final.gpickle"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+RESPONSE_CACHE_ENTRIES = 256
+MAX_PAGE_SIZE = 500
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def dumps(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+def graph_payload(G: nx.DiGraph) -> dict:
+    if G is None:
+        return {"nodes": [], "edges": []}
+    return {
+        "nodes": [{"id": n, **attr} for n, attr in G.nodes(data=True)],
+        "edges": [{"source": u, "target": v, **attr} for u, v, attr in G.edges(data=True)],
+    }
+
+
+class GraphService:
+    """Consultas da taxonomia sobre os grafos residentes no `GraphStore`.
+
+    As respostas já serializadas ficam num LRU indexado por (versão do grafo, URI); a mesma
+    chave gera o ETag, então um `If-None-Match` válido é respondido sem tocar no grafo.
+    """
+
+    def __init__(self, final_graph_path: Path = FINAL_GRAPH_PATH, cache_entries: int = RESPONSE_CACHE_ENTRIES):
+        self.final_graph_path = final_graph_path
+        self.store = get_graph_store()
+        self.responses = RenderCache(max_entries=cache_entries)
+
+    @property
+    def graph_path(self) -> Path:
+        return preferred_path(self.final_graph_path)
+
+    def version(self) -> str:
+        return self.store.version(self.graph_path)
+
+    def closure_index(self) -> ClosureIndex:
+        return self.store.derived(self.graph_path, "closure_index", ClosureIndex)
+
+    def warm(self):
+        self.closure_index()
+        micro_view.get_topic_manifest(final_graph_path=self.final_graph_path)
+        get_entity_index()
+
+    def entity_index_version(self) -> str:
+        # Sem o .npz, `get_entity_index` monta o índice a partir de todos os micro-grafos.
+        get_entity_index()
+        return f"entities:{entity_index_version()}"
+
+    @staticmethod
+    def etag(version: str, uri: str) -> str:
+        return '"' + hashlib.sha1(f"{version}|{uri}".encode('utf-8')).hexdigest()[:20] + '"'
+
+    def cached(self, version: str, uri: str, build) -> bytes:
+        return self.responses.get_or_render((version, uri), lambda: dumps(build()))
+
+    # --- consultas ---
+
+    def topics(self) -> dict:
+        G = self.closure_index().graph
+        manifest = micro_view.get_topic_manifest(final_graph_path=self.final_graph_path)
+        topics = []
+        for label, entry in sorted(manifest.items()):
+            attr = G.nodes[label] if G.has_node(label) else {}
+            topics.append({
+                "label": label,
+                "topic": entry["topic"],
+                "category": entry.get("category"),
+                "doc_count": attr.get('doc_count'),
+                "parents": sorted(G.predecessors(label)) if G.has_node(label) else [],
+            })
+        return {"topics": topics}
+
+    def categories(self) -> dict:
+        return {"categories": self.closure_index().categories()}
+
+    def focused(self, categories) -> dict:
+        index = self.closure_index()
+        return graph_payload(get_focused_subgraph(index.graph, selected_categories=categories or None, index=index))
+
+    def tree(self, areas) -> dict:
+        index = self.closure_index()
+        return graph_payload(get_tree_by_area(index.graph, areas, index=index))
+
+    def entities(self, query: str, limit: int) -> dict:
+        index = get_entity_index()
+        return {"entities": [
+            {"name": name, "topics": index.topics_for(name), "topic_count": n}
+            for name, n in index.search(query, limit)
+        ]}
+
+    def micro_path(self, topic_id: int):
+        manifest = micro_view.get_topic_manifest(final_graph_path=self.final_graph_path)
+        for label, entry in manifest.items():
+            if entry["topic"] == topic_id:
+                path = ROOT_PATH / entry["path"]
+                return label, (preferred_path(path) if path.exists() else None)
+        return None, None
+
+    def micro_target(self, topic_id: int):
+        """(rótulo, caminho, versão) do micro-grafo do tópico; caminho e versão None se não há."""
+        label, path = self.micro_path(topic_id)
+        if path is None:
+            return label, None, None
+        return label, path, f"{self.version()}:{self.store.version(path)}"
+
+    def micro(self, topic_id: int, label: str, path: Path, focus=None, hops: int = micro_view.DEFAULT_HOPS,
+              page: int = 0, page_size: int = micro_view.DEFAULT_PAGE_SIZE) -> dict:
+        G_micro = self.store.get(path)
+        ranking = self.store.derived(path, "degree_ranking", micro_view.degree_ranking)
+        if focus is not None:
+            if focus not in G_micro:
+                raise tornado.web.HTTPError(404, "%s", f"Entidade fora do micro-grafo: {focus}")
+            ranking = micro_view.neighbourhood_ranking(G_micro, focus, hops)
+        G_page = micro_view.micro_page(G_micro, ranking, page, page_size, focus=focus)
+        return {
+            "topic": topic_id,
+            "label": label,
+            "page": page,
+            "pages": micro_view.page_count(len(ranking), page_size),
+            "total_nodes": len(ranking),
+            **graph_payload(G_page),
+        }
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, service: GraphService):
+        self.service = service
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def write_error(self, status_code, **kwargs):
+        message = self._reason
+        error = kwargs.get("exc_info", (None, None, None))[1]
+        if isinstance(error, tornado.web.HTTPError) and error.log_message:
+            message = error.log_message % error.args
+        self.finish(dumps({"error": message, "status": status_code}))
+
+    async def blocking(self, fn, *args):
+        """Roda `fn` no executor: resolver versões pode carregar o grafo do disco."""
+        return await IOLoop.current().run_in_executor(None, fn, *args)
+
+    def compute_etag(self):
+        # O ETag é definido a partir da versão do grafo, antes de montar a resposta.
+        return None
+
+    async def respond(self, version: str, build):
+        """Responde 304 se o cliente já tem esta versão; senão monta (ou reaproveita) o JSON
+        fora do event loop, para consultas pesadas não travarem as demais conexões."""
+        etag = self.service.etag(version, self.request.uri)
+        self.set_header("ETag", etag)
+        self.set_header("Cache-Control", "no-cache")
+        if etag in self.request.headers.get("If-None-Match", ""):
+            self.set_status(304)
+            return
+        body = await self.blocking(self.service.cached, version, self.request.uri, build)
+        self.write(body)
+
+    def int_argument(self, name: str, default: int, minimum: int = 0, maximum: int = None) -> int:
+        raw = self.get_argument(name, None)
+        if raw is None:
+            return default
+        try:
+            value = int(raw)
+        except ValueError:
+            raise tornado.web.HTTPError(400, "%s", f"Parâmetro '{name}' deve ser inteiro.")
+        if value < minimum or (maximum is not None and value > maximum):
+            raise tornado.web.HTTPError(400, "%s", f"Parâmetro '{name}' fora do intervalo.")
+        return value
+
+
+class HealthHandler(BaseHandler):
+    async def get(self):
+        version = await self.blocking(self.service.version)
+        self.write(dumps({"status": "ok", "graph_version": version,
+                          "response_cache": self.service.responses.stats()}))
+
+
+class TopicsHandler(BaseHandler):
+    async def get(self):
+        await self.respond(await self.blocking(self.service.version), self.service.topics)
+
+
+class CategoriesHandler(BaseHandler):
+    async def get(self):
+        await self.respond(await self.blocking(self.service.version), self.service.categories)
+
+
+class FocusedSubgraphHandler(BaseHandler):
+    async def get(self):
+        categories = sorted(self.get_arguments("category"))
+        await self.respond(await self.blocking(self.service.version), lambda: self.service.focused(categories))
+
+
+class AreaTreeHandler(BaseHandler):
+    async def get(self):
+        areas = sorted(self.get_arguments("area"))
+        if not areas:
+            raise tornado.web.HTTPError(400, "%s", "Informe ao menos um parâmetro 'area'.")
+        await self.respond(await self.blocking(self.service.version), lambda: self.service.tree(areas))
+
+
+class MicroGraphHandler(BaseHandler):
+    async def get(self, topic_id):
+        topic_id = int(topic_id)
+        label, path, version = await self.blocking(self.service.micro_target, topic_id)
+        if path is None:
+            raise tornado.web.HTTPError(404, "%s", f"Tópico sem micro-grafo: {topic_id}")
+        focus = self.get_argument("focus", None)
+        hops = self.int_argument("hops", micro_view.DEFAULT_HOPS, minimum=1, maximum=3)
+        page = self.int_argument("page", 0)
+        page_size = self.int_argument("page_size", micro_view.DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+        await self.respond(version, lambda: self.service.micro(topic_id, label, path, focus, hops, page, page_size))
+
+
+class EntitySearchHandler(BaseHandler):
+    async def get(self):
+        query = self.get_argument("q", "")
+        limit = self.int_argument("limit", 20, minimum=1, maximum=200)
+        version = await self.blocking(self.service.entity_index_version)
+        await self.respond(version, lambda: self.service.entities(query, limit))
+
+
+def make_app(service: GraphService = None) -> tornado.web.Application:
+    service = service or GraphService()
+    args = {"service": service}
+    return tornado.web.Application([
+        (r"/health", HealthHandler, args),
+        (r"/topics", TopicsHandler, args),
+        (r"/topics/(-?\d+)/micro", MicroGraphHandler, args),
+        (r"/categories", CategoriesHandler, args),
+        (r"/subgraph/focused", FocusedSubgraphHandler, args),
+        (r"/subgraph/tree", AreaTreeHandler, args),
+        (r"/entities", EntitySearchHandler, args),
+    ])
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, service: GraphService = None):
+    service = service or GraphService()
+    inicio = time.perf_counter()
+    service.warm()
+    print(f"Grafo carregado e índices prontos em {time.perf_counter() - inicio:.2f}s.")
+    make_app(service).listen(port, address=host)
+    print(f"API da taxonomia em http://{host}:{port}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP (JSON) de consulta da taxonomia.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
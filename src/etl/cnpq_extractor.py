@@ -1,15 +1,29 @@
 import pdfplumber
+import hashlib
 import json
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from src import metrics
+
 PDF_PATH = ROOT_DIR / "data" / "pdfs" / "cnpq_taxonomy.pdf"
 OUTPUT_JSON = ROOT_DIR / "data" / "taxonomies" / "cnpq_taxonomy.json"
+PAGE_CACHE_DIR = ROOT_DIR / "data" / "cache" / "pdf_pages"
+
+PAGES_PER_CHUNK = 16
+
+CODE_LINE_RE = re.compile(r'^"?(\d{8})"?\s*(.*)')
+NON_DIGIT_RE = re.compile(r'\D')
+WHITESPACE_RE = re.compile(r'\s+')
 
 def get_hierarchy_level(code_str):
-    nums = re.sub(r'\D', '', code_str)
+    nums = NON_DIGIT_RE.sub('', code_str)
     if len(nums) != 8: return None
     if nums[1:7] == "000000": return 1
     elif nums[3:7] == "0000": return 2
@@ -19,62 +33,113 @@ def get_hierarchy_level(code_str):
 def clean_name(name_raw):
     name = name_raw.replace('"', '').strip()
     if name.startswith(','): name = name[1:].strip()
-    return re.sub(r'\s+', ' ', name.replace('\n', ' ').replace('\r', ''))
+    return WHITESPACE_RE.sub(' ', name.replace('\n', ' ').replace('\r', ''))
+
+def pdf_digest(path) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def extract_page_range(pdf_path, start: int, stop: int) -> list:
+    """Texto das páginas [start, stop). Roda em um processo do pool, que abre o PDF por conta própria."""
+    with pdfplumber.open(pdf_path) as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def extract_pages(pdf_path, max_workers: int = None, use_cache: bool = True) -> list:
+    """Texto de todas as páginas, em ordem.
+
+    As páginas são divididas em blocos de `PAGES_PER_CHUNK` e extraídas em paralelo. Com
+    `use_cache`, o resultado fica em `PAGE_CACHE_DIR` sob o hash do PDF, e reprocessar o
+    mesmo arquivo não abre o PDF de novo.
+    """
+    cache_path = None
+    if use_cache:
+        cache_path = PAGE_CACHE_DIR / f"{pdf_digest(pdf_path)}.json"
+        if cache_path.exists():
+            print("Texto das páginas recuperado do cache.")
+            return json.loads(cache_path.read_text(encoding='utf-8'))["pages"]
+
+    with pdfplumber.open(pdf_path) as pdf:
+        n_pages = len(pdf.pages)
+    ranges = [(start, min(start + PAGES_PER_CHUNK, n_pages)) for start in range(0, n_pages, PAGES_PER_CHUNK)]
+
+    if len(ranges) <= 1 or max_workers == 1:
+        chunks = [extract_page_range(pdf_path, start, stop) for start, stop in ranges]
+    else:
+        workers = min(max_workers or os.cpu_count() or 1, len(ranges))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # `map` devolve os blocos na ordem de envio, então a ordem das páginas se mantém.
+            chunks = list(pool.map(extract_page_range, [pdf_path] * len(ranges), *zip(*ranges)))
+    pages = [text for chunk in chunks for text in chunk]
 
-def parse_pdf_to_json():
-    if not PDF_PATH.exists():
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"pdf": str(pdf_path), "pages": pages}, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, cache_path)
+    return pages
+
+def parse_code_lines(text: str) -> list:
+    """(nível, nome) de cada linha com código CNPq válido, na ordem em que aparecem."""
+    entries = []
+    for line in text.split('\n'):
+        match = CODE_LINE_RE.match(line.strip())
+        if not match: continue
+        level = get_hierarchy_level(match.group(1))
+        if level is None: continue
+        entries.append((level, clean_name(match.group(2))))
+    return entries
+
+def parse_pdf_to_json(pdf_path=PDF_PATH, output_json=OUTPUT_JSON, max_workers: int = None, use_cache: bool = True):
+    pdf_path = Path(pdf_path)
+    output_json = Path(output_json)
+    if not pdf_path.exists():
         print(f"Arquivo não encontrado!")
-        print(f"O script está procurando em: {PDF_PATH}")
+        print(f"O script está procurando em: {pdf_path}")
         sys.exit(1)
 
-    OUTPUT_JSON.parent.mkdir(parents=True, exist_ok=True)
+    output_json.parent.mkdir(parents=True, exist_ok=True)
 
     root = {"name": "CNPQ", "children": []}
     stack = [root]
     count_items = 0
 
-    print(f"Lendo arquivo: {PDF_PATH.name}...")
-    
-    try:
-        with pdfplumber.open(PDF_PATH) as pdf:
-            for i, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                
-                if not text:
-                    print(f"Aviso: Página {i+1} não tem texto reconhecível (pode ser imagem).")
-                    continue
-                    
-                for line in text.split('\n'):
-                    match = re.search(r'^"?(\d{8})"?\s*(.*)', line.strip())
-                    
-                    if match:
-                        code = match.group(1)
-                        raw_name = match.group(2)
-                        level = get_hierarchy_level(code)
-                        
-                        if level is None: continue
-                            
-                        name = clean_name(raw_name)
-                        new_node = {"name": name}
-                        
-                        while len(stack) > level: stack.pop()
-                        
-                        parent = stack[-1]
-                        if "children" not in parent: parent["children"] = []
-                        parent["children"].append(new_node)
-                        stack.append(new_node)
-                        count_items += 1
+    print(f"Lendo arquivo: {pdf_path.name}...")
 
+    try:
+        with metrics.span("pdf_extract"):
+            pages = extract_pages(pdf_path, max_workers=max_workers, use_cache=use_cache)
+        metrics.count("pdf_pages", len(pages))
     except Exception as e:
         print(f"Erro durante o processamento do PDF: {e}")
         sys.exit(1)
 
+    # A pilha da hierarquia atravessa as páginas, por isso a montagem da árvore é sequencial.
+    for i, text in enumerate(pages):
+        if not text:
+            print(f"Aviso: Página {i+1} não tem texto reconhecível (pode ser imagem).")
+            continue
+
+        for level, name in parse_code_lines(text):
+            new_node = {"name": name}
+
+            while len(stack) > level: stack.pop()
+
+            parent = stack[-1]
+            if "children" not in parent: parent["children"] = []
+            parent["children"].append(new_node)
+            stack.append(new_node)
+            count_items += 1
+
+    metrics.count("taxonomy_items", count_items)
     print("Gerando JSON...")
-    with open(OUTPUT_JSON, 'w', encoding='utf-8') as f:
+    with open(output_json, 'w', encoding='utf-8') as f:
         json.dump(root, f, indent=2, ensure_ascii=False)
-        
+
     print(f"Sucesso! {count_items} itens extraídos.")
-    print(f"Arquivo salvo em: {OUTPUT_JSON}")
+    print(f"Arquivo salvo em: {output_json}")
 
 if __name__ == "__main__":
-    parse_pdf_to_json()
\ No newline at end of file
+    parse_pdf_to_json()
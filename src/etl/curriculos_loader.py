@@ -1,20 +1,122 @@
+import os
+from pathlib import Path
+
 import pandas as pd
 
-def carregar_dados_mistos(caminho_csv: str):
-    df = pd.read_csv(caminho_csv, quotechar='"')
-    
-    df['content'] = df['content'].astype(str).fillna('')
-    
-    df = df[df['content'].str.len() > 15]
-    
-    docs = df['content'].tolist()
-    
-    qtd_abstracts = len(df[df['type'] == 'abstract'])
-    qtd_artigos = len(df[df['type'] == 'bibliographic_production'])
-    print(f"Carregado: {qtd_abstracts} Resumos e {qtd_artigos} Artigos.")
-    
-    return docs, df
+CHUNK_ROWS = 50_000
+MIN_CONTENT_LENGTH = 15
+CSV_DTYPES = {
+    "researcher_id": "string",
+    "name": "string",
+    "content": "string",
+    "type": "category",
+}
+
+
+def parquet_path_for(caminho_csv) -> Path:
+    return Path(caminho_csv).with_suffix(".parquet")
+
+
+def preferred_dataset_path(caminho_csv) -> Path:
+    """A cópia Parquet do dataset quando ela existe e está em dia com o CSV; senão, o próprio CSV."""
+    caminho_csv = Path(caminho_csv)
+    parquet = parquet_path_for(caminho_csv)
+    if parquet.exists() and (not caminho_csv.exists() or parquet.stat().st_mtime_ns >= caminho_csv.stat().st_mtime_ns):
+        return parquet
+    return caminho_csv
+
+
+def _raw_chunks(caminho, chunksize: int):
+    caminho = Path(caminho)
+    if caminho.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        offset = 0
+        for batch in pq.ParquetFile(caminho).iter_batches(batch_size=chunksize):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk.astype({k: v for k, v in CSV_DTYPES.items() if k in chunk.columns})
+    else:
+        yield from pd.read_csv(caminho, quotechar='"', dtype=CSV_DTYPES, chunksize=chunksize)
+
+
+def iter_chunks(caminho, chunksize: int = CHUNK_ROWS):
+    """Lê o dataset (CSV ou Parquet) em blocos, já sem os textos curtos demais.
+
+    O índice de cada bloco continua o do anterior, como em um `read_csv` do arquivo inteiro.
+    """
+    for chunk in _raw_chunks(caminho, chunksize):
+        chunk['content'] = chunk['content'].fillna('').astype(str)
+        yield chunk[chunk['content'].str.len() > MIN_CONTENT_LENGTH]
+
+
+def iter_document_batches(caminho, chunksize: int = CHUNK_ROWS, counts: dict = None):
+    """Gera listas de documentos, bloco a bloco, sem montar o DataFrame completo.
+
+    Com `counts`, acumula nele a quantidade de documentos por `type`.
+    """
+    for chunk in iter_chunks(caminho, chunksize):
+        if counts is not None:
+            for tipo, qtd in chunk['type'].value_counts(sort=False).items():
+                counts[tipo] = counts.get(tipo, 0) + int(qtd)
+        if len(chunk):
+            yield chunk['content'].tolist()
+
+
+def contar_tipos(caminho, chunksize: int = CHUNK_ROWS) -> dict:
+    """Quantidade de documentos válidos por `type`, acumulada bloco a bloco."""
+    counts = {}
+    for _ in iter_document_batches(caminho, chunksize, counts):
+        pass
+    return counts
+
+
+def resumo_tipos(counts: dict) -> str:
+    return f"{counts.get('abstract', 0)} Resumos e {counts.get('bibliographic_production', 0)} Artigos"
+
+
+def converter_para_parquet(caminho_csv, caminho_parquet=None, chunksize: int = CHUNK_ROWS) -> Path:
+    """Converte o CSV para Parquet em streaming, um row group por bloco.
+
+    As linhas são gravadas sem filtro; a leitura aplica o mesmo critério do CSV, então as
+    contagens são idênticas.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    caminho_parquet = Path(caminho_parquet or parquet_path_for(caminho_csv))
+    # `type` vai como texto: o dicionário de categorias muda de bloco para bloco, e o Parquet
+    # já codifica colunas repetitivas em dicionário.
+    schema = pa.schema([(col, pa.string()) for col in CSV_DTYPES])
+
+    tmp_path = caminho_parquet.with_suffix(f".{os.getpid()}.tmp")
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for chunk in _raw_chunks(caminho_csv, chunksize):
+            chunk = chunk[list(CSV_DTYPES)].astype("string")
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    os.replace(tmp_path, caminho_parquet)
+    return caminho_parquet
+
+
+def garantir_parquet(caminho_csv, chunksize: int = CHUNK_ROWS) -> Path:
+    """Caminho a ler: a cópia Parquet, convertida antes se estiver ausente ou mais velha que o CSV."""
+    caminho = preferred_dataset_path(caminho_csv)
+    if caminho.suffix != ".parquet":
+        print(f"Convertendo {caminho.name} para Parquet...")
+        caminho = converter_para_parquet(caminho, chunksize=chunksize)
+    return caminho
+
+
+def carregar_dados_mistos(caminho_csv: str, chunksize: int = CHUNK_ROWS):
+    """Documentos válidos e a contagem por `type`, lidos bloco a bloco (sem o DataFrame completo)."""
+    counts = {}
+    docs = []
+    for batch in iter_document_batches(caminho_csv, chunksize, counts):
+        docs.extend(batch)
+    print(f"Carregado: {resumo_tipos(counts)}.")
+    return docs, counts
 
 if __name__ == "__main__":
-    docs, df = carregar_dados_mistos("data/curriculos/dataset_bertopic.csv")
-    print(docs[:3])
\ No newline at end of file
+    docs, counts = carregar_dados_mistos("data/curriculos/dataset_bertopic.csv")
+    print(docs[:3])
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+from filelock import FileLock
+
+from src import metrics
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+EMBEDDING_CACHE_DIR = ROOT_DIR / "data" / "cache" / "embeddings"
+DEFAULT_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+# Acima desta quantidade de segmentos, `put_many` junta todos num só.
+COMPACT_AFTER_SEGMENTS = 16
+
+# Argumentos do `encode` que mudam os vetores: cada combinação tem o seu próprio cache.
+VECTOR_KWARGS = ("normalize_embeddings", "prompt_name", "prompt", "truncate_dim")
+# Argumentos que não afetam o resultado e só são repassados ao modelo.
+PASSTHROUGH_KWARGS = ("show_progress_bar",)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Cache em disco de embeddings endereçado pelo conteúdo (modelo + hash do texto).
+
+    Os vetores ficam em segmentos `.npy` float32, lidos via memmap, e o `index.json`
+    aponta cada hash para (segmento, linha). Cada lote de textos inéditos vira um segmento
+    novo; passado `COMPACT_AFTER_SEGMENTS`, eles são juntados num só. As gravações são
+    feitas sob um lock de arquivo, já que pipeline, app e ingestão usam o mesmo diretório.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, cache_dir=EMBEDDING_CACHE_DIR, namespace: str = None):
+        self.model_name = model_name
+        self.namespace = namespace or model_name
+        self.dir = Path(cache_dir) / re.sub(r'[^\w.=-]', '_', self.namespace)
+        self._index_path = self.dir / "index.json"
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        self._index: dict[str, list] = {}
+        self._segments: list[str] = []
+        self._mmaps: dict[int, np.ndarray] = {}
+        self._next_segment = 0
+        if self._index_path.exists():
+            data = json.loads(self._index_path.read_text(encoding='utf-8'))
+            self._index = data["index"]
+            self._segments = data["segments"]
+            self.dim = data["dim"]
+            # Índices anteriores à compactação numeravam os segmentos pela posição.
+            self._next_segment = data.get("next_segment", len(self._segments))
+
+    def _lock(self) -> FileLock:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        return FileLock(str(self.dir / ".lock"))
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, text: str):
+        return text_hash(text) in self._index
+
+    def _segment(self, seg_id: int) -> np.ndarray:
+        if seg_id not in self._mmaps:
+            self._mmaps[seg_id] = np.load(self.dir / self._segments[seg_id], mmap_mode='r')
+        return self._mmaps[seg_id]
+
+    def _lookup(self, h: str):
+        loc = self._index.get(h)
+        if loc is None:
+            return None
+        try:
+            return self._segment(loc[0])[loc[1]]
+        except FileNotFoundError:
+            # Outro processo compactou o cache depois da última leitura do índice.
+            self._load()
+            loc = self._index.get(h)
+            return None if loc is None else self._segment(loc[0])[loc[1]]
+
+    def get_many(self, texts) -> list:
+        """Vetor de cada texto, ou None para os que ainda não estão no cache."""
+        found = []
+        for text in texts:
+            vector = self._lookup(text_hash(text))
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            found.append(vector)
+        return found
+
+    def _new_segment_name(self) -> str:
+        name = f"vectors_{self._next_segment:05d}.npy"
+        self._next_segment += 1
+        return name
+
+    def put_many(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock():
+            # Relê o índice: outro processo pode ter gravado segmentos desde a última leitura.
+            self._load()
+            novos = {}
+            for row, text in enumerate(texts):
+                h = text_hash(text)
+                if h not in self._index:
+                    novos.setdefault(h, row)
+            if not novos:
+                return
+
+            seg_id = len(self._segments)
+            seg_name = self._new_segment_name()
+            np.save(self.dir / seg_name, vectors[list(novos.values())])
+
+            self._segments.append(seg_name)
+            for row, h in enumerate(novos):
+                self._index[h] = [seg_id, row]
+            self.dim = int(vectors.shape[1])
+            self._write_index()
+
+            if len(self._segments) > COMPACT_AFTER_SEGMENTS:
+                self._compact()
+
+    def compact(self):
+        """Junta todos os segmentos num só."""
+        with self._lock():
+            self._load()
+            if len(self._segments) > 1:
+                self._compact()
+
+    def _compact(self):
+        # Chamado com o lock: o segmento novo só passa a valer quando o índice é trocado, e
+        # os antigos são apagados depois (memmaps já abertos em outros processos continuam válidos).
+        sizes = [len(self._segment(i)) for i in range(len(self._segments))]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+        merged = np.concatenate([np.asarray(self._segment(i)) for i in range(len(self._segments))])
+
+        seg_name = self._new_segment_name()
+        np.save(self.dir / seg_name, merged)
+        old_segments = self._segments
+        self._index = {h: [0, int(offsets[seg]) + row] for h, (seg, row) in self._index.items()}
+        self._segments = [seg_name]
+        self._mmaps = {}
+        self._write_index()
+
+        for name in old_segments:
+            (self.dir / name).unlink(missing_ok=True)
+
+    def _write_index(self):
+        tmp_path = self._index_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "model": self.model_name,
+                "namespace": self.namespace,
+                "dim": self.dim,
+                "segments": self._segments,
+                "next_segment": self._next_segment,
+                "index": self._index,
+            }, f)
+        os.replace(tmp_path, self._index_path)
+
+
+class CachedEncoder:
+    """Substituto do `SentenceTransformer.encode` que só calcula vetores para textos inéditos.
+
+    O modelo só é carregado na primeira falta de cache, então rodadas com tudo em cache
+    nem chegam a instanciar o SentenceTransformer. Sem `encoder`, as faltas vão para o
+    serviço de codificação compartilhado (`encoding_service.get_encoding_service`).
+    Argumentos que mudam os vetores (`VECTOR_KWARGS`) separam o cache; os demais são recusados.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, cache_dir=EMBEDDING_CACHE_DIR, encoder=None):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self._encoder = encoder
+        # Backend e quantização do codificador separam o cache: vetores int8 e fp32 não se misturam.
+        if encoder is None:
+            from src.etl.encoding_service import get_encoding_service
+            self.namespace = get_encoding_service(model_name).cache_namespace
+        else:
+            self.namespace = getattr(encoder, "cache_namespace", model_name)
+        self.cache = EmbeddingCache(model_name, cache_dir, namespace=self.namespace)
+        self._variant_caches: dict[str, EmbeddingCache] = {}
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            from src.etl.encoding_service import get_encoding_service
+            self._encoder = get_encoding_service(self.model_name)
+        return self._encoder
+
+    def _cache_for(self, variant: dict) -> EmbeddingCache:
+        """Cache dos vetores gerados com os argumentos de `VECTOR_KWARGS` em `variant`."""
+        if not variant:
+            return self.cache
+        key = hashlib.sha1(json.dumps(variant, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        if key not in self._variant_caches:
+            self._variant_caches[key] = EmbeddingCache(
+                self.model_name, self.cache_dir, namespace=f"{self.cache.namespace}__{key}"
+            )
+        return self._variant_caches[key]
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        unknown = set(kwargs) - set(VECTOR_KWARGS) - set(PASSTHROUGH_KWARGS)
+        if unknown:
+            raise TypeError(f"Argumentos não suportados pelo cache de embeddings: {', '.join(sorted(unknown))}")
+        variant = {k: kwargs[k] for k in VECTOR_KWARGS if kwargs.get(k) not in (None, False)}
+        cache = self._cache_for(variant)
+
+        texts = list(texts)
+        cached = cache.get_many(texts)
+
+        pendentes = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        metrics.count("embeddings_requested", len(texts))
+        metrics.count("embeddings_computed", len(pendentes))
+        if pendentes:
+            print(f"Embeddings: {len(texts) - sum(v is None for v in cached)} em cache, calculando {len(pendentes)} novos...")
+            with metrics.span("encode"):
+                novos = np.asarray(self.encoder.encode(pendentes, batch_size=batch_size, **kwargs), dtype=np.float32)
+            cache.put_many(pendentes, novos)
+            por_texto = dict(zip(pendentes, novos))
+            cached = [por_texto[t] if v is None else v for t, v in zip(texts, cached)]
+
+        metrics.record_cache("embeddings", {"hits": cache.hits, "misses": cache.misses, "entries": len(cache)})
+        if not cached:
+            return np.empty((0, cache.dim or 0), dtype=np.float32)
+        return np.stack(cached).astype(np.float32, copy=False)
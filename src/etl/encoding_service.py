@@ -0,0 +1,180 @@
+import atexit
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from src.etl.embedding_cache import DEFAULT_MODEL_NAME
+
+ONNX_CACHE_DIR = ROOT_DIR / "data" / "cache" / "onnx"
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+QUANTIZATION_CONFIG = "avx2"
+DEFAULT_BATCH_SIZE = 64
+# Abaixo disso o custo de distribuir os textos entre processos supera o ganho.
+POOL_MIN_TEXTS = 256
+POOL_CHUNK_SIZE = 1024
+
+ENCODE_BACKEND = os.environ.get("TAXONOMIA_ENCODE_BACKEND", "torch")
+ENCODE_PROCESSES = int(os.environ.get("TAXONOMIA_ENCODE_PROCESSES", "0")) or max(1, (os.cpu_count() or 1) // 2)
+ENCODE_BATCH_SIZE = int(os.environ.get("TAXONOMIA_ENCODE_BATCH_SIZE", str(DEFAULT_BATCH_SIZE)))
+
+
+def _require_onnx():
+    """Os backends ONNX dependem do onnxruntime e do optimum, fora do requirements.txt."""
+    try:
+        import onnxruntime  # noqa: F401
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            f"O backend de codificação ONNX precisa de pacotes não instalados ({e.name}). "
+            "Instale com: pip install \"sentence-transformers[onnx]\", ou use TAXONOMIA_ENCODE_BACKEND=torch."
+        ) from e
+
+
+class EncodingService:
+    """Codificação de textos em CPU compartilhada pelas etapas do pipeline.
+
+    Com `backend="torch"` e mais de um processo, lotes grandes são distribuídos por um pool
+    do `start_multi_process_pool`, cada processo limitado à sua fatia dos núcleos. Os
+    backends ONNX (`onnx`, `onnx-int8` com quantização dinâmica) rodam no processo atual,
+    já que o onnxruntime paraleliza internamente e a sessão não é enviada a outros processos.
+    Com `bucket_by_length`, os textos são ordenados por tamanho antes de formar os lotes,
+    reduzindo o padding, e a ordem original é restaurada na saída.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, backend: str = "torch", processes: int = 1,
+                 batch_size: int = DEFAULT_BATCH_SIZE, bucket_by_length: bool = True):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend desconhecido: {backend} (opções: {', '.join(BACKENDS)})")
+        self.model_name = model_name
+        self.backend = backend
+        self.processes = processes if backend == "torch" else 1
+        self.batch_size = batch_size
+        self.bucket_by_length = bucket_by_length
+        self._lock = threading.Lock()
+        self._model = None
+        self._pool = None
+
+    @property
+    def cache_namespace(self) -> str:
+        """Identifica os vetores deste serviço no cache de embeddings: modelo, backend e quantização.
+
+        Vetores do torch ficam só sob o nome do modelo, como antes dos backends ONNX.
+        """
+        if self.backend == "torch":
+            return self.model_name
+        if self.backend == "onnx":
+            return f"{self.model_name}__onnx"
+        return f"{self.model_name}__onnx-int8-{QUANTIZATION_CONFIG}"
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                print(f"Carregando modelo de Embeddings ({self.model_name}, backend={self.backend})...")
+                self._model = self._load_model()
+            return self._model
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend != "torch":
+            _require_onnx()
+
+        if self.backend == "torch":
+            return SentenceTransformer(self.model_name, device="cpu")
+        if self.backend == "onnx":
+            return SentenceTransformer(self.model_name, device="cpu", backend="onnx")
+
+        local_dir = ONNX_CACHE_DIR / re.sub(r'[^\w.-]', '_', self.model_name)
+        quantized = sorted(local_dir.glob(f"onnx/model_*_{QUANTIZATION_CONFIG}.onnx"))
+        if not quantized:
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+
+            print(f"Exportando {self.model_name} para ONNX int8 ({QUANTIZATION_CONFIG})...")
+            model = SentenceTransformer(self.model_name, device="cpu", backend="onnx")
+            model.save(str(local_dir))
+            export_dynamic_quantized_onnx_model(model, QUANTIZATION_CONFIG, str(local_dir))
+            quantized = sorted(local_dir.glob(f"onnx/model_*_{QUANTIZATION_CONFIG}.onnx"))
+        file_name = str(quantized[0].relative_to(local_dir))
+        return SentenceTransformer(str(local_dir), device="cpu", backend="onnx", model_kwargs={"file_name": file_name})
+
+    def _get_pool(self):
+        model = self.model
+        with self._lock:
+            if self._pool is None:
+                # Cada processo herda o limite de threads no spawn; sem isso, todos disputam
+                # todos os núcleos.
+                threads = str(max(1, (os.cpu_count() or 1) // self.processes))
+                previous = {k: os.environ.get(k) for k in ("OMP_NUM_THREADS", "MKL_NUM_THREADS")}
+                os.environ.update({k: threads for k in previous})
+                try:
+                    self._pool = model.start_multi_process_pool(["cpu"] * self.processes)
+                finally:
+                    for k, v in previous.items():
+                        if v is None:
+                            os.environ.pop(k, None)
+                        else:
+                            os.environ[k] = v
+            return self._pool
+
+    def encode(self, texts, batch_size: int = None, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        batch_size = batch_size or self.batch_size
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        order = None
+        if self.bucket_by_length:
+            order = np.argsort([len(t) for t in texts], kind="stable")
+            texts = [texts[i] for i in order]
+
+        if self.processes > 1 and len(texts) >= POOL_MIN_TEXTS:
+            vectors = self.model.encode(
+                texts, pool=self._get_pool(), batch_size=batch_size, chunk_size=POOL_CHUNK_SIZE, **kwargs
+            )
+        else:
+            vectors = self.model.encode(texts, batch_size=batch_size, **kwargs)
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        if order is not None:
+            restored = np.empty_like(vectors)
+            restored[order] = vectors
+            vectors = restored
+        return vectors
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            from sentence_transformers import SentenceTransformer
+            SentenceTransformer.stop_multi_process_pool(pool)
+
+
+_SERVICES: dict = {}
+_SERVICES_LOCK = threading.Lock()
+
+
+def get_encoding_service(model_name: str = DEFAULT_MODEL_NAME) -> EncodingService:
+    """Serviço compartilhado por modelo, configurado pelas variáveis `TAXONOMIA_ENCODE_*`."""
+    with _SERVICES_LOCK:
+        if model_name not in _SERVICES:
+            _SERVICES[model_name] = EncodingService(
+                model_name, backend=ENCODE_BACKEND, processes=ENCODE_PROCESSES, batch_size=ENCODE_BATCH_SIZE
+            )
+        return _SERVICES[model_name]
+
+
+@atexit.register
+def _close_services():
+    with _SERVICES_LOCK:
+        services = list(_SERVICES.values())
+    for service in services:
+        service.close()
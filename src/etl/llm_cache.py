@@ -0,0 +1,165 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+
+from src import metrics
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+LLM_CACHE_PATH = ROOT_DIR / "data" / "cache" / "llm_responses.sqlite"
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+def _sha256(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """Cache local (SQLite) de respostas do LLM, com despejo LRU limitado a `max_entries`.
+
+    Só faz sentido para chains determinísticas (temperature=0): a mesma entrada devolve
+    sempre a mesma resposta.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON responses(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str, count_miss: bool = True):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, last_used) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (excess,)
+                )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+
+_SHARED_CACHE = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_shared_cache() -> LLMResponseCache:
+    global _SHARED_CACHE
+    with _SHARED_LOCK:
+        if _SHARED_CACHE is None:
+            _SHARED_CACHE = LLMResponseCache()
+        return _SHARED_CACHE
+
+
+class CachedChain:
+    """Envolve uma chain `prompt | llm.with_structured_output(Schema)` com o cache de respostas.
+
+    A chave combina o modelo, o hash dos templates do prompt, o JSON Schema da saída e as
+    variáveis de entrada; erros nunca são guardados.
+    """
+
+    def __init__(self, chain, model_name: str, templates, output_schema, cache: LLMResponseCache = None):
+        self.chain = chain
+        self.output_schema = output_schema
+        self.cache = cache if cache is not None else get_shared_cache()
+        self._prefix = {
+            "model": model_name,
+            "prompt": _sha256(list(templates)),
+            "schema": _sha256(output_schema.model_json_schema()),
+        }
+
+    def cache_key(self, inputs: dict) -> str:
+        return _sha256(dict(self._prefix, inputs=inputs))
+
+    def _lookup(self, key: str, count_miss: bool = True):
+        cached = self.cache.get(key, count_miss)
+        if cached is None:
+            return None
+        return self.output_schema.model_validate_json(cached)
+
+    def peek(self, inputs: dict):
+        """Resposta em cache para a entrada, sem chamar o LLM (None se não houver)."""
+        return self._lookup(self.cache_key(inputs), count_miss=False)
+
+    @staticmethod
+    def _with_usage(config):
+        handler = UsageMetadataCallbackHandler()
+        config = dict(config or {})
+        config["callbacks"] = list(config.get("callbacks") or []) + [handler]
+        return config, handler
+
+    @staticmethod
+    def _record_call(seconds: float, handler: UsageMetadataCallbackHandler):
+        usage = handler.usage_metadata.values()
+        metrics.record_llm_call(
+            seconds,
+            sum(u.get("input_tokens", 0) for u in usage),
+            sum(u.get("output_tokens", 0) for u in usage),
+        )
+
+    def invoke(self, inputs: dict, config=None):
+        key = self.cache_key(inputs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        config, handler = self._with_usage(config)
+        inicio = time.perf_counter()
+        response = self.chain.invoke(inputs, config)
+        self._record_call(time.perf_counter() - inicio, handler)
+        self.cache.put(key, response.model_dump_json())
+        return response
+
+    async def ainvoke(self, inputs: dict, config=None):
+        key = self.cache_key(inputs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        config, handler = self._with_usage(config)
+        inicio = time.perf_counter()
+        response = await self.chain.ainvoke(inputs, config)
+        self._record_call(time.perf_counter() - inicio, handler)
+        self.cache.put(key, response.model_dump_json())
+        return response
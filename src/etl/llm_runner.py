@@ -0,0 +1,102 @@
+import asyncio
+import random
+import time
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_SECOND = 5.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BASE_DELAY = 1.0
+
+
+def _transient_errors() -> tuple:
+    """Falhas que valem nova tentativa: limite de taxa, timeout, conexão e erro 5xx da API.
+
+    Erros de autenticação, requisições inválidas e respostas fora do schema estruturado
+    falhariam de novo e só gastariam tokens.
+    """
+    errors = [TimeoutError, asyncio.TimeoutError, ConnectionError]
+    try:
+        import openai
+    except ImportError:
+        return tuple(errors)
+    return tuple(errors + [openai.RateLimitError, openai.APITimeoutError,
+                           openai.APIConnectionError, openai.InternalServerError])
+
+
+TRANSIENT_ERRORS = _transient_errors()
+
+
+class TokenBucket:
+    """Limitador de taxa: no máximo `rate` requisições por segundo, com rajadas até `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def ainvoke_with_retry(chain, inputs: dict, bucket: TokenBucket = None,
+                             max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = DEFAULT_BASE_DELAY,
+                             retry_on: tuple = TRANSIENT_ERRORS):
+    """`chain.ainvoke` com backoff exponencial (com jitter) entre as tentativas.
+
+    Só as exceções de `retry_on` são repetidas; as demais sobem na primeira falha.
+    Respostas já em cache (chains com `peek`) não consomem o limite de taxa.
+    """
+    peek = getattr(chain, "peek", None)
+    if peek is not None:
+        cached = peek(inputs)
+        if cached is not None:
+            return cached
+
+    for attempt in range(max_retries + 1):
+        if bucket is not None:
+            await bucket.acquire()
+        try:
+            return await chain.ainvoke(inputs)
+        except retry_on:
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(base_delay * (2 ** attempt) * (0.5 + random.random()))
+
+
+async def _ainvoke_all(chain, inputs_list, max_concurrency, requests_per_second, max_retries, base_delay, on_done):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    bucket = TokenBucket(requests_per_second) if requests_per_second else None
+
+    async def run_one(i, inputs):
+        async with semaphore:
+            try:
+                result = await ainvoke_with_retry(chain, inputs, bucket, max_retries, base_delay)
+            except Exception as e:
+                result = e
+        if on_done is not None:
+            on_done(i, result)
+        return result
+
+    return await asyncio.gather(*(run_one(i, inputs) for i, inputs in enumerate(inputs_list)))
+
+
+def invoke_all(chain, inputs_list, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+               requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+               max_retries: int = DEFAULT_MAX_RETRIES, on_done=None,
+               base_delay: float = DEFAULT_BASE_DELAY) -> list:
+    """Executa a chain para cada entrada em paralelo e devolve os resultados na ordem das entradas.
+
+    Chamadas que falham mesmo após as tentativas aparecem na lista como a exceção levantada.
+    """
+    return asyncio.run(_ainvoke_all(chain, list(inputs_list), max_concurrency,
+                                    requests_per_second, max_retries, base_delay, on_done))
@@ -1,12 +1,21 @@
 import pandas as pd
 import os
-import json
+import sys
+from pathlib import Path
 from typing import List
 from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
 
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src import metrics
+from src.etl import llm_runner
+from src.etl.llm_cache import CachedChain
+from src.etl.topic_store import STORE_DIR, TopicStore
+
 load_dotenv()
 
 class AreaPrediction(BaseModel):
@@ -23,8 +32,10 @@ class TopicLabel(BaseModel):
         description="Lista de até 3 áreas do conhecimento às quais este tópico se conecta, ordenadas por relevância."
     )
 
-def get_labeling_chain():
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+LLM_MODEL = "gpt-4o-mini"
+
+def get_labeling_chain(use_cache: bool = True):
+    llm = ChatOpenAI(model=LLM_MODEL, temperature=0)
     structured_llm = llm.with_structured_output(TopicLabel)
 
     system_template = """
@@ -61,59 +72,109 @@ def get_labeling_chain():
         ("human", human_template),
     ])
 
-    return prompt | structured_llm
+    chain = prompt | structured_llm
+    if use_cache:
+        chain = CachedChain(chain, LLM_MODEL, [system_template, human_template], TopicLabel)
+    return chain
 
-def processar_topicos(input_csv: str, output_csv: str):
-    df = pd.read_csv(input_csv)
-    chain = get_labeling_chain()
-    results = []
-    
-    print("Iniciando rotulagem ajustada...")
+def _montar_resultado(topic_id, response: TopicLabel) -> dict:
+    final_label = response.short_label
+    if topic_id == -1 and response.multi_areas[0].confidence < 0.5:
+        final_label = "Tópicos Multidisciplinares / Diversos"
+
+    areas_json = [area.model_dump() for area in response.multi_areas]
     
+    return {
+        "Topic": topic_id,
+        "LLM_Label": final_label,
+        "Multi_Areas": areas_json,
+        "Main_Area": response.multi_areas[0].area_name
+    }
+
+def _resultado_erro(topic_id) -> dict:
+    return {
+        "Topic": topic_id,
+        "LLM_Label": "Erro de Processamento",
+        "Multi_Areas": [],
+        "Main_Area": "Desconhecido"
+    }
+
+def _entrada(row) -> dict:
+    # As listas vão para o prompt na mesma representação em texto que os CSVs antigos
+    # guardavam, o que mantém as chaves do cache de respostas do LLM.
+    return {"keywords": str(list(row['Representation'])), "docs": str(list(row['Representative_Docs']))}
+
+def _rotular_sequencial(df: pd.DataFrame, chain) -> list:
+    results = []
     for index, row in df.iterrows():
         topic_id = row['Topic']
-        
-        is_outlier = (topic_id == -1)
-        prefix_msg = "[Outliers]" if is_outlier else f"[Tópico {topic_id}]"
+        prefix_msg = "[Outliers]" if topic_id == -1 else f"[Tópico {topic_id}]"
 
         try:
             print(f"Processando {prefix_msg}...", end="\r")
             
-            response: TopicLabel = chain.invoke({
-                "keywords": row['Representation'], 
-                "docs": row['Representative_Docs']
-            })
-            
-            final_label = response.short_label
-            if is_outlier and response.multi_areas[0].confidence < 0.5:
-                final_label = "Tópicos Multidisciplinares / Diversos"
-
-            areas_json = [area.model_dump() for area in response.multi_areas]
-            
-            results.append({
-                "Topic": topic_id,
-                "LLM_Label": final_label,
-                "Multi_Areas_JSON": json.dumps(areas_json),
-                "Main_Area": response.multi_areas[0].area_name
-            })
+            response: TopicLabel = chain.invoke(_entrada(row))
+            results.append(_montar_resultado(topic_id, response))
             
         except Exception as e:
             print(f"Erro {topic_id}: {e}")
-            results.append({
-                "Topic": topic_id,
-                "LLM_Label": "Erro de Processamento",
-                "Multi_Areas_JSON": "[]",
-                "Main_Area": "Desconhecido"
-            })
-
-    df_labels = pd.DataFrame(results)
+            results.append(_resultado_erro(topic_id))
+    return results
+
+def _rotular_concorrente(df: pd.DataFrame, chain, max_concurrency: int, requests_per_second: float, max_retries: int) -> list:
+    topic_ids = df['Topic'].tolist()
+    inputs = [_entrada(row) for _, row in df.iterrows()]
+    concluidos = [0]
+
+    def on_done(i, result):
+        concluidos[0] += 1
+        print(f"Processados {concluidos[0]}/{len(inputs)} tópicos...", end="\r")
+
+    responses = llm_runner.invoke_all(
+        chain, inputs,
+        max_concurrency=max_concurrency,
+        requests_per_second=requests_per_second,
+        max_retries=max_retries,
+        on_done=on_done,
+    )
 
-    df_final = pd.merge(df, df_labels, on="Topic", how="left")
+    results = []
+    for topic_id, response in zip(topic_ids, responses):
+        try:
+            if isinstance(response, Exception):
+                raise response
+            results.append(_montar_resultado(topic_id, response))
+        except Exception as e:
+            print(f"Erro {topic_id}: {e}")
+            results.append(_resultado_erro(topic_id))
+    return results
+
+def processar_topicos(store_dir=STORE_DIR, chain=None, concorrente: bool = True,
+                      max_concurrency: int = llm_runner.DEFAULT_MAX_CONCURRENCY,
+                      requests_per_second: float = llm_runner.DEFAULT_REQUESTS_PER_SECOND,
+                      max_retries: int = llm_runner.DEFAULT_MAX_RETRIES):
+    store = TopicStore(store_dir)
+    df = store.read_topics()
+    if chain is None:
+        chain = get_labeling_chain()
+    
+    print("Iniciando rotulagem ajustada...")
     
-    df_final.to_csv(output_csv, index=False)
-    print(f"\nSalvo em {output_csv}")
+    if concorrente:
+        results = _rotular_concorrente(df, chain, max_concurrency, requests_per_second, max_retries)
+    else:
+        results = _rotular_sequencial(df, chain)
+
+    metrics.count("topics", len(results))
+    metrics.count("label_errors", sum(r["LLM_Label"] == "Erro de Processamento" for r in results))
+
+    store.write_labels(results)
+    print(f"\nSalvo em {store.labels_path}")
+    if isinstance(chain, CachedChain):
+        print(f"Cache de respostas do LLM: {chain.cache.stats()}")
+        metrics.record_cache("llm_responses", chain.cache.stats())
     
-    print(df_final[['Topic', 'LLM_Label', 'Main_Area']].head(5))
+    print(pd.DataFrame(results)[['Topic', 'LLM_Label', 'Main_Area']].head(5))
 
 if __name__ == "__main__":
-    processar_topicos("data/processed/topicos_gerados.csv", "data/processed/topicos_nomeados_llm.csv")
\ No newline at end of file
+    processar_topicos()
\ No newline at end of file
@@ -1,14 +1,38 @@
+import numpy as np
 from bertopic import BERTopic
 from sklearn.feature_extraction.text import CountVectorizer
-import pandas as pd
 import nltk
+import sys
+from pathlib import Path
 from nltk.corpus import stopwords
 
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src.etl.curriculos_loader import garantir_parquet, iter_document_batches, resumo_tipos
+from src import metrics
+from src.etl.embedding_cache import DEFAULT_MODEL_NAME, CachedEncoder
+from src.etl.topic_store import STORE_DIR, TopicStore
+
+DATASET_PATH = ROOT_PATH / "data" / "curriculos" / "dataset_bertopic.csv"
+MODEL_OUTPUT_PATH = ROOT_PATH / "data" / "processed" / "bertopic_model"
+
+EMBEDDING_MODEL_NAME = DEFAULT_MODEL_NAME
+ENCODE_BATCH_SIZE = 64
+
 nltk.download('stopwords')
 
-def gerar_topicos(docs: list[str]):
+def embed_documents(docs: list[str], encoder: CachedEncoder = None):
+    """Embeddings dos documentos via cache em disco; só textos inéditos passam pelo modelo."""
+    encoder = encoder or CachedEncoder(EMBEDDING_MODEL_NAME)
+    return encoder.encode(docs, batch_size=ENCODE_BATCH_SIZE, show_progress_bar=True)
+
+def gerar_topicos(docs: list[str], embeddings=None):
     print(f"Iniciando BERTopic com {len(docs)} documentos...")
 
+    if embeddings is None:
+        embeddings = embed_documents(docs)
+
 
     stop_pt = stopwords.words('portuguese')
     stop_en = stopwords.words('english')
@@ -19,33 +43,78 @@ def gerar_topicos(docs: list[str]):
     
     topic_model = BERTopic(
         language="multilingual",
+        embedding_model=EMBEDDING_MODEL_NAME,
         vectorizer_model=vectorizer_model,
         min_topic_size=5, 
         verbose=True
     )
 
-    topics, probs = topic_model.fit_transform(docs)
+    with metrics.span("bertopic_fit"):
+        topics, probs = topic_model.fit_transform(docs, embeddings)
 
     info = topic_model.get_topic_info()
+    metrics.count("documents", len(docs))
+    metrics.count("topics", len(info))
     
     print("\nTop 5 Tópicos encontrados:")
     print(info.head())
 
     return topic_model, info, topics
 
-if __name__ == "__main__":
-    from curriculos_loader import carregar_dados_mistos
-    
-    caminho_csv = "data/curriculos/dataset_bertopic.csv" 
-    
-    docs, _ = carregar_dados_mistos(caminho_csv)
-    modelo, tabela_topicos, lista_topicos = gerar_topicos(docs)
+def save_model(topic_model: BERTopic, model_path=MODEL_OUTPUT_PATH):
+    """Salva o modelo ajustado (safetensors) para atribuir tópicos a textos novos sem reajuste.
+
+    O modelo de embeddings é guardado só pelo nome; os vetores vêm do cache de embeddings.
+    """
+    topic_model.save(
+        str(model_path),
+        serialization="safetensors",
+        save_ctfidf=True,
+        save_embedding_model=EMBEDDING_MODEL_NAME
+    )
+    print(f"Modelo BERTopic salvo em: {model_path}")
+
+def load_model(model_path=MODEL_OUTPUT_PATH) -> BERTopic:
+    return BERTopic.load(str(model_path), embedding_model=EMBEDDING_MODEL_NAME)
+
+def atribuir_topicos(docs: list[str], topic_model: BERTopic = None, model_path=MODEL_OUTPUT_PATH):
+    """Atribui tópicos do modelo salvo a documentos novos com `transform`, sem reajustar."""
+    if topic_model is None:
+        topic_model = load_model(model_path)
+    topics, probs = topic_model.transform(docs, embed_documents(docs))
+    return topics, probs
+
+def run_topic_modeling(caminho_csv=DATASET_PATH, store_dir=STORE_DIR, model_output=MODEL_OUTPUT_PATH, extra_docs=()):
+    """Ajusta o BERTopic no dataset mais `extra_docs` (documentos ingeridos fora do CSV).
+
+    O dataset é convertido para Parquet (se a cópia estiver desatualizada) e lido em blocos;
+    cada bloco é codificado assim que é lido, sem montar o DataFrame completo.
+    """
+    encoder = CachedEncoder(EMBEDDING_MODEL_NAME)
+    counts = {}
+    docs = []
+    partes = []
+    for batch in iter_document_batches(garantir_parquet(caminho_csv), counts=counts):
+        docs.extend(batch)
+        partes.append(embed_documents(batch, encoder))
+    print(f"Carregado: {resumo_tipos(counts)}.")
+    if extra_docs:
+        conhecidos = set(docs)
+        novos = [d for d in dict.fromkeys(extra_docs) if d not in conhecidos]
+        print(f"Incluindo {len(novos)} documentos da ingestão incremental.")
+        if novos:
+            docs = docs + novos
+            partes.append(embed_documents(novos, encoder))
+    embeddings = np.vstack(partes) if partes else None
+    modelo, tabela_topicos, lista_topicos = gerar_topicos(docs, embeddings)
     
-    tabela_topicos.to_csv("data/processed/topicos_gerados.csv", index=False)
-
-    df_mapping = pd.DataFrame({
-        "Document": docs,
-        "Topic": lista_topicos
-    })
-    df_mapping.to_csv("data/processed/doc_topic_mapping.csv", index=False)
-    print("Mapeamento de documentos para tópicos salvo em: data/processed/doc_topic_mapping.csv")
\ No newline at end of file
+    store = TopicStore(store_dir)
+    store.write_topics(tabela_topicos)
+    save_model(modelo, model_output)
+
+    store.write_mapping(docs, [int(t) for t in lista_topicos])
+    print(f"Tópicos e mapeamento de documentos salvos em: {store_dir}")
+    return modelo
+
+if __name__ == "__main__":
+    run_topic_modeling()
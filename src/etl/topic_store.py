@@ -0,0 +1,288 @@
+import ast
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+STORE_DIR = ROOT_DIR / "data" / "processed" / "topic_store"
+ROW_GROUP_SIZE = 64_000
+
+TOPICS_SCHEMA = pa.schema([
+    ("topic", pa.int64()),
+    ("count", pa.int64()),
+    ("name", pa.string()),
+    ("representation", pa.list_(pa.string())),
+    ("representative_docs", pa.list_(pa.string())),
+])
+LABELS_SCHEMA = pa.schema([
+    ("topic", pa.int64()),
+    ("llm_label", pa.string()),
+    ("main_area", pa.string()),
+])
+AREAS_SCHEMA = pa.schema([
+    ("topic", pa.int64()),
+    ("rank", pa.int32()),
+    ("area_name", pa.string()),
+    ("confidence", pa.float64()),
+])
+DOCUMENTS_SCHEMA = pa.schema([
+    ("doc_id", pa.int64()),
+    ("fingerprint", pa.string()),
+    ("document", pa.string()),
+])
+DOC_TOPICS_SCHEMA = pa.schema([
+    ("topic", pa.int64()),
+    ("row", pa.int64()),
+    ("doc_id", pa.int64()),
+])
+
+
+def document_fingerprint(doc: str) -> str:
+    return hashlib.sha1(doc.encode('utf-8')).hexdigest()
+
+
+def _as_list(value) -> list:
+    """Listas vindas do BERTopic, ou a representação em texto delas gravada nos CSVs antigos."""
+    if isinstance(value, str):
+        return list(ast.literal_eval(value))
+    return list(value)
+
+
+def _write_table(table: pa.Table, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+
+
+class TopicStore:
+    """Tópicos, rótulos e mapeamento documento→tópico em Parquet, trocados entre as etapas.
+
+    - `topics.parquet`: saída do BERTopic, com as listas de palavras e documentos tipadas;
+    - `labels.parquet` + `topic_areas.parquet`: rótulo do LLM e as áreas normalizadas
+      (uma linha por tópico e área, em ordem de relevância);
+    - `documents/` + `doc_topics/`: cada texto é guardado uma única vez, por `doc_id`, e o
+      mapeamento fica ordenado por tópico, então ler um tópico só toca os row groups dele.
+
+    As partes do mapeamento são listadas no `manifest.json`, gravado por último; ingestões
+    incrementais acrescentam partes novas sem reescrever as anteriores, e um mapeamento
+    substituído só tem as partes antigas apagadas depois da troca do manifesto.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.topics_path = self.root / "topics.parquet"
+        self.labels_path = self.root / "labels.parquet"
+        self.areas_path = self.root / "topic_areas.parquet"
+        self.documents_dir = self.root / "documents"
+        self.doc_topics_dir = self.root / "doc_topics"
+        self.manifest_path = self.root / "manifest.json"
+
+    # --- mapeamento documento -> tópico ---
+
+    def _manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return {"parts": [], "documents": 0, "rows": 0}
+        return json.loads(self.manifest_path.read_text(encoding='utf-8'))
+
+    def _write_manifest(self, manifest: dict):
+        manifest["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.manifest_path)
+
+    def has_mapping(self) -> bool:
+        return self.manifest_path.exists()
+
+    def _dataset(self, directory: Path, schema: pa.Schema):
+        parts = [str(directory / part) for part in self._manifest()["parts"]]
+        return ds.dataset(parts, schema=schema, format="parquet")
+
+    def fingerprints(self) -> dict:
+        """fingerprint -> doc_id de todos os documentos já guardados (sem ler os textos)."""
+        if not self.has_mapping():
+            return {}
+        table = self._dataset(self.documents_dir, DOCUMENTS_SCHEMA).to_table(columns=["fingerprint", "doc_id"])
+        return dict(zip(table.column("fingerprint").to_pylist(), table.column("doc_id").to_pylist()))
+
+    def _write_part(self, docs: list, topics: list, reset: bool):
+        current = self._manifest()
+        # Índices anteriores ao contador numeravam as partes pela posição na lista.
+        next_part = current.get("next_part", len(current["parts"]))
+        manifest = {"parts": [], "documents": 0, "rows": 0} if reset else current
+        known = {} if reset else self.fingerprints()
+        next_doc_id = manifest["documents"]
+
+        new_docs = {"doc_id": [], "fingerprint": [], "document": []}
+        doc_ids = []
+        for doc in docs:
+            fp = document_fingerprint(doc)
+            if fp not in known:
+                known[fp] = next_doc_id
+                new_docs["doc_id"].append(next_doc_id)
+                new_docs["fingerprint"].append(fp)
+                new_docs["document"].append(doc)
+                next_doc_id += 1
+            doc_ids.append(known[fp])
+
+        rows = range(manifest["rows"], manifest["rows"] + len(docs))
+        mapping = pa.table({"topic": [int(t) for t in topics], "row": list(rows), "doc_id": doc_ids},
+                           schema=DOC_TOPICS_SCHEMA)
+        mapping = mapping.sort_by([("topic", "ascending"), ("row", "ascending")])
+
+        # Sempre um nome novo: as partes em uso só deixam de valer quando o manifesto é trocado.
+        part = f"part-{next_part:05d}.parquet"
+        _write_table(pa.table(new_docs, schema=DOCUMENTS_SCHEMA), self.documents_dir / part)
+        _write_table(mapping, self.doc_topics_dir / part)
+
+        manifest["parts"].append(part)
+        manifest["next_part"] = next_part + 1
+        manifest["documents"] = next_doc_id
+        manifest["rows"] += len(docs)
+        self._write_manifest(manifest)
+        if reset:
+            self._collect_parts(manifest["parts"])
+
+    def _collect_parts(self, live: list):
+        """Apaga as partes fora do manifesto (substituídas, ou de uma gravação interrompida)."""
+        for directory in (self.documents_dir, self.doc_topics_dir):
+            for old in directory.glob("part-*.parquet"):
+                if old.name not in live:
+                    old.unlink(missing_ok=True)
+
+    def write_mapping(self, docs: list, topics: list):
+        """Substitui o mapeamento inteiro (saída de um ajuste completo do BERTopic)."""
+        self._write_part(docs, topics, reset=True)
+
+    def append_mapping(self, docs: list, topics: list):
+        """Acrescenta documentos como uma parte nova; textos já guardados reaproveitam o `doc_id`."""
+        self._write_part(docs, topics, reset=False)
+
+    def topic_counts(self) -> pd.Series:
+        """Documentos por tópico, lendo só a coluna `topic`."""
+        table = self._dataset(self.doc_topics_dir, DOC_TOPICS_SCHEMA).to_table(columns=["topic"])
+        return table.column("topic").to_pandas().value_counts().sort_index()
+
+    def topic_ids(self) -> list:
+        return self.topic_counts().index.tolist()
+
+    def read_topic_documents(self, topic_id) -> list:
+        """Documentos do tópico, na ordem do mapeamento; o filtro é empurrado para o Parquet."""
+        refs = self._dataset(self.doc_topics_dir, DOC_TOPICS_SCHEMA).to_table(
+            columns=["row", "doc_id"], filter=ds.field("topic") == int(topic_id)
+        ).sort_by("row")
+        doc_ids = refs.column("doc_id").to_pylist()
+        if not doc_ids:
+            return []
+        docs = self._dataset(self.documents_dir, DOCUMENTS_SCHEMA).to_table(
+            columns=["doc_id", "document"], filter=ds.field("doc_id").isin(sorted(set(doc_ids)))
+        )
+        by_id = dict(zip(docs.column("doc_id").to_pylist(), docs.column("document").to_pylist()))
+        return [by_id[i] for i in doc_ids]
+
+    def documents(self) -> list:
+        """Todos os textos guardados, cada um uma única vez."""
+        if not self.has_mapping():
+            return []
+        table = self._dataset(self.documents_dir, DOCUMENTS_SCHEMA).to_table(columns=["document"])
+        return table.column("document").to_pylist()
+
+    def read_mapping(self) -> pd.DataFrame:
+        """Mapeamento completo no formato do antigo `doc_topic_mapping.csv` (Document, Topic)."""
+        refs = self._dataset(self.doc_topics_dir, DOC_TOPICS_SCHEMA).to_table().sort_by("row")
+        docs = self._dataset(self.documents_dir, DOCUMENTS_SCHEMA).to_table(columns=["doc_id", "document"])
+        by_id = dict(zip(docs.column("doc_id").to_pylist(), docs.column("document").to_pylist()))
+        return pd.DataFrame({
+            "Document": [by_id[i] for i in refs.column("doc_id").to_pylist()],
+            "Topic": refs.column("topic").to_pylist(),
+        })
+
+    # --- tópicos e rótulos ---
+
+    def write_topics(self, df_topics: pd.DataFrame):
+        """Grava a tabela de tópicos do BERTopic (colunas de `get_topic_info`)."""
+        _write_table(pa.table({
+            "topic": df_topics['Topic'].astype(int).tolist(),
+            "count": df_topics['Count'].astype(int).tolist(),
+            "name": df_topics['Name'].astype(str).tolist(),
+            "representation": [_as_list(v) for v in df_topics['Representation']],
+            "representative_docs": [_as_list(v) for v in df_topics['Representative_Docs']],
+        }, schema=TOPICS_SCHEMA), self.topics_path)
+
+    def read_topics(self) -> pd.DataFrame:
+        df = pq.read_table(self.topics_path).to_pandas()
+        df = df.rename(columns={
+            "topic": "Topic", "count": "Count", "name": "Name",
+            "representation": "Representation", "representative_docs": "Representative_Docs",
+        })
+        for col in ("Representation", "Representative_Docs"):
+            df[col] = df[col].apply(list)
+        return df
+
+    def write_labels(self, results: list):
+        """Grava os rótulos do LLM: dicts com Topic, LLM_Label, Main_Area e Multi_Areas."""
+        _write_table(pa.table({
+            "topic": [int(r["Topic"]) for r in results],
+            "llm_label": [r["LLM_Label"] for r in results],
+            "main_area": [r["Main_Area"] for r in results],
+        }, schema=LABELS_SCHEMA), self.labels_path)
+
+        areas = [(int(r["Topic"]), rank, a["area_name"], float(a["confidence"]))
+                 for r in results for rank, a in enumerate(r["Multi_Areas"])]
+        _write_table(pa.table({
+            "topic": [a[0] for a in areas],
+            "rank": [a[1] for a in areas],
+            "area_name": [a[2] for a in areas],
+            "confidence": [a[3] for a in areas],
+        }, schema=AREAS_SCHEMA), self.areas_path)
+
+    def read_labeled_topics(self, topics=None) -> pd.DataFrame:
+        """Tópicos rotulados, com `Multi_Areas` já como lista de dicts (na ordem de relevância).
+
+        Com `topics`, só as linhas desses ids são lidas.
+        """
+        filter_ = ds.field("topic").isin([int(t) for t in topics]) if topics is not None else None
+        labels = ds.dataset(self.labels_path, format="parquet").to_table(filter=filter_).to_pandas()
+        areas = ds.dataset(self.areas_path, format="parquet").to_table(filter=filter_).to_pandas()
+        topics_df = ds.dataset(self.topics_path, format="parquet").to_table(
+            columns=["topic", "count", "name"], filter=filter_
+        ).to_pandas()
+
+        areas = areas.sort_values(["topic", "rank"])
+        by_topic = {
+            t: [{"area_name": n, "confidence": c} for n, c in zip(g['area_name'], g['confidence'])]
+            for t, g in areas.groupby('topic', sort=False)
+        }
+        df = topics_df.merge(labels, on="topic", how="inner")
+        df["Multi_Areas"] = [by_topic.get(t, []) for t in df['topic']]
+        return df.rename(columns={
+            "topic": "Topic", "count": "Count", "name": "Name",
+            "llm_label": "LLM_Label", "main_area": "Main_Area",
+        })
+
+    # --- migração dos CSVs antigos ---
+
+    def migrate_from_csv(self, topics_csv=None, labels_csv=None, mapping_csv=None):
+        """Converte os CSVs trocados pelas versões anteriores do pipeline."""
+        if topics_csv is not None and Path(topics_csv).exists():
+            self.write_topics(pd.read_csv(topics_csv))
+        if labels_csv is not None and Path(labels_csv).exists():
+            df = pd.read_csv(labels_csv)
+            self.write_labels([
+                {"Topic": r['Topic'], "LLM_Label": r['LLM_Label'], "Main_Area": r['Main_Area'],
+                 "Multi_Areas": json.loads(r['Multi_Areas_JSON'])}
+                for _, r in df.iterrows()
+            ])
+            if topics_csv is None or not Path(topics_csv).exists():
+                self.write_topics(df)
+        if mapping_csv is not None and Path(mapping_csv).exists():
+            df = pd.read_csv(mapping_csv)
+            self.write_mapping(df['Document'].astype(str).tolist(), df['Topic'].tolist())
@@ -0,0 +1,336 @@
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+from src import metrics
+from src.graph.graph_format import read_graph
+
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+MICRO_GRAPHS_DIR = ROOT_PATH / "data" / "processed" / "micro_grafos"
+ENTITY_INDEX_PATH = MICRO_GRAPHS_DIR / "entity_index.npz"
+MICRO_GRAPH_NAME_RE = re.compile(r"^topico_(-?\d+)\.gpickle$")
+
+
+def normalize_entity(name) -> str:
+    """Chave de deduplicação: sem acentos, minúsculas, espaços colapsados e sem pontuação nas bordas."""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split()).strip(" .,;:!?'\"()[]{}")
+
+
+def _file_version(path: Path) -> str:
+    stat = path.stat()
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _micro_graph_files(directory: Path) -> dict:
+    """tópico -> (caminho, versão) dos micro-grafos do diretório."""
+    found = {}
+    if directory.exists():
+        for path in directory.iterdir():
+            match = MICRO_GRAPH_NAME_RE.match(path.name)
+            if match:
+                found[int(match.group(1))] = (path, _file_version(path))
+    return found
+
+
+def directory_fingerprint(directory: Path = MICRO_GRAPHS_DIR, files: dict = None) -> str:
+    """Hash dos nomes e versões dos micro-grafos; o próprio índice e o manifesto, gravados na
+    mesma pasta, não entram (a versão da pasta mudaria a cada gravação do índice)."""
+    files = _micro_graph_files(Path(directory)) if files is None else files
+    h = hashlib.sha1()
+    for topic_id, (_, version) in sorted(files.items()):
+        h.update(f"{topic_id}:{version}\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+def _rel(path: Path) -> str:
+    path = Path(path).resolve()
+    try:
+        return str(path.relative_to(ROOT_PATH))
+    except ValueError:
+        return str(path)
+
+
+class EntityIndex:
+    """Índice global das entidades de todos os micro-grafos.
+
+    As entidades são deduplicadas pela chave de `normalize_entity` (a primeira grafia vista é
+    a exibida) e as arestas ficam em arrays paralelos de inteiros (origem, destino, relação,
+    tópico). O índice invertido entidade → arestas é um CSR montado sob demanda a partir
+    desses arrays, então saber quais tópicos citam uma entidade não exige abrir nenhum pickle.
+
+    `update_topic` substitui as arestas de um tópico; `sync` relê só os micro-grafos cujo
+    arquivo mudou desde a última indexação.
+    """
+
+    def __init__(self, path: Path = ENTITY_INDEX_PATH):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self.keys: list[str] = []
+        self.names: list[str] = []
+        self._ids: dict[str, int] = {}
+        self.relations: list[str] = []
+        self._relation_ids: dict[str, int] = {}
+        self.topics: dict[int, dict] = {}
+        # `directory_fingerprint` na última `sync`: micro-grafos criados, trocados ou removidos
+        # por fora (um `git pull`) mudam o fingerprint e pedem uma nova sincronização.
+        self.directory_fingerprint = None
+        self.src = np.zeros(0, dtype=np.int32)
+        self.dst = np.zeros(0, dtype=np.int32)
+        self.rel = np.zeros(0, dtype=np.int32)
+        self.topic = np.zeros(0, dtype=np.int32)
+        self._csr = None
+
+    # --- construção ---
+
+    def _entity_id(self, name) -> int:
+        key = normalize_entity(name)
+        entity_id = self._ids.get(key)
+        if entity_id is None:
+            entity_id = len(self.keys)
+            self._ids[key] = entity_id
+            self.keys.append(key)
+            self.names.append(str(name).strip())
+        return entity_id
+
+    def _relation_id(self, relation) -> int:
+        relation = str(relation or "").strip()
+        relation_id = self._relation_ids.get(relation)
+        if relation_id is None:
+            relation_id = len(self.relations)
+            self._relation_ids[relation] = relation_id
+            self.relations.append(relation)
+        return relation_id
+
+    def _drop_rows(self, topic_id: int):
+        keep = self.topic != topic_id
+        if not keep.all():
+            self.src, self.dst, self.rel, self.topic = self.src[keep], self.dst[keep], self.rel[keep], self.topic[keep]
+
+    def update_topic(self, topic_id, G_micro: nx.DiGraph, path=None):
+        """Substitui as arestas do tópico pelas do micro-grafo recém-gravado."""
+        topic_id = int(topic_id)
+        with self._lock:
+            self._drop_rows(topic_id)
+            rows = [
+                (self._entity_id(u), self._entity_id(v), self._relation_id(data.get('relation')))
+                for u, v, data in G_micro.edges(data=True)
+            ]
+            if rows:
+                new = np.array(rows, dtype=np.int32)
+                self.src = np.concatenate([self.src, new[:, 0]])
+                self.dst = np.concatenate([self.dst, new[:, 1]])
+                self.rel = np.concatenate([self.rel, new[:, 2]])
+                self.topic = np.concatenate([self.topic, np.full(len(rows), topic_id, dtype=np.int32)])
+
+            entry = {"nodes": G_micro.number_of_nodes(), "edges": G_micro.number_of_edges()}
+            if path is not None and Path(path).exists():
+                entry.update(path=_rel(path), version=_file_version(Path(path)))
+            self.topics[topic_id] = entry
+            self._csr = None
+
+    def remove_topic(self, topic_id):
+        topic_id = int(topic_id)
+        with self._lock:
+            self._drop_rows(topic_id)
+            self.topics.pop(topic_id, None)
+            self._csr = None
+
+    def sync(self, directory: Path = MICRO_GRAPHS_DIR) -> int:
+        """Indexa os micro-grafos novos ou alterados e descarta os que sumiram do diretório.
+
+        Devolve quantos tópicos foram (re)indexados.
+        """
+        found = _micro_graph_files(Path(directory))
+
+        updated = 0
+        with self._lock:
+            for topic_id in [t for t in self.topics if t not in found]:
+                self.remove_topic(topic_id)
+            for topic_id, (path, version) in sorted(found.items()):
+                known = self.topics.get(topic_id)
+                if known is not None and known.get("version") == version:
+                    continue
+                self.update_topic(topic_id, read_graph(path), path)
+                updated += 1
+            self.directory_fingerprint = directory_fingerprint(directory, found)
+        metrics.count("entity_index_topics_updated", updated)
+        return updated
+
+    # --- persistência ---
+
+    def _compact(self):
+        """Remove entidades e relações que ficaram sem arestas após substituir tópicos."""
+        used = np.zeros(len(self.keys), dtype=bool)
+        used[self.src] = True
+        used[self.dst] = True
+        if not used.all():
+            remap = np.cumsum(used, dtype=np.int64) - 1
+            self.src, self.dst = remap[self.src].astype(np.int32), remap[self.dst].astype(np.int32)
+            self.keys = [k for k, u in zip(self.keys, used) if u]
+            self.names = [n for n, u in zip(self.names, used) if u]
+            self._ids = {k: i for i, k in enumerate(self.keys)}
+
+        used_rel = np.zeros(len(self.relations), dtype=bool)
+        used_rel[self.rel] = True
+        if not used_rel.all():
+            remap = np.cumsum(used_rel, dtype=np.int64) - 1
+            self.rel = remap[self.rel].astype(np.int32)
+            self.relations = [r for r, u in zip(self.relations, used_rel) if u]
+            self._relation_ids = {r: i for i, r in enumerate(self.relations)}
+        self._csr = None
+
+    def save(self, path: Path = None):
+        path = Path(path or self.path)
+        with self._lock:
+            self._compact()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp.npz")
+            np.savez(
+                tmp_path,
+                keys=np.array(self.keys, dtype=str),
+                names=np.array(self.names, dtype=str),
+                relations=np.array(self.relations, dtype=str),
+                src=self.src, dst=self.dst, rel=self.rel, topic=self.topic,
+                meta=np.array(json.dumps({
+                    "topics": {str(t): e for t, e in self.topics.items()},
+                    "directory_fingerprint": self.directory_fingerprint,
+                })),
+            )
+            tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = ENTITY_INDEX_PATH) -> "EntityIndex":
+        index = cls(path)
+        if not Path(path).exists():
+            return index
+        with np.load(path, allow_pickle=False) as arrays:
+            index.keys = arrays["keys"].tolist()
+            index.names = arrays["names"].tolist()
+            index.relations = arrays["relations"].tolist()
+            index.src, index.dst = arrays["src"], arrays["dst"]
+            index.rel, index.topic = arrays["rel"], arrays["topic"]
+            meta = json.loads(str(arrays["meta"]))
+        index._ids = {k: i for i, k in enumerate(index.keys)}
+        index._relation_ids = {r: i for i, r in enumerate(index.relations)}
+        index.topics = {int(t): e for t, e in meta["topics"].items()}
+        index.directory_fingerprint = meta.get("directory_fingerprint")
+        return index
+
+    # --- consultas ---
+
+    def _entity_rows(self):
+        """CSR entidade → linhas de aresta (como origem ou destino)."""
+        with self._lock:
+            if self._csr is None:
+                n_edges = len(self.src)
+                entities = np.concatenate([self.src, self.dst]).astype(np.int64)
+                rows = np.concatenate([np.arange(n_edges), np.arange(n_edges)])
+                order = np.argsort(entities, kind='stable')
+                indptr = np.zeros(len(self.keys) + 1, dtype=np.int64)
+                indptr[1:] = np.cumsum(np.bincount(entities, minlength=len(self.keys)))
+                self._csr = (indptr, rows[order])
+            return self._csr
+
+    def lookup(self, name):
+        """Id da entidade com a mesma chave normalizada, ou None."""
+        return self._ids.get(normalize_entity(name))
+
+    def _rows_for(self, entity_id) -> np.ndarray:
+        indptr, rows = self._entity_rows()
+        return np.unique(rows[indptr[entity_id]:indptr[entity_id + 1]])
+
+    def topics_for(self, name) -> list:
+        """[(tópico, arestas da entidade no tópico)], do tópico com mais arestas para o com menos."""
+        entity_id = self.lookup(name)
+        if entity_id is None:
+            return []
+        topic_ids, counts = np.unique(self.topic[self._rows_for(entity_id)], return_counts=True)
+        order = np.lexsort((topic_ids, -counts))
+        return [(int(topic_ids[i]), int(counts[i])) for i in order]
+
+    def edges_for(self, name, topic_id=None) -> list:
+        """[(origem, relação, destino, tópico)] das arestas que tocam a entidade."""
+        entity_id = self.lookup(name)
+        if entity_id is None:
+            return []
+        rows = self._rows_for(entity_id)
+        if topic_id is not None:
+            rows = rows[self.topic[rows] == int(topic_id)]
+        return [
+            (self.names[self.src[r]], self.relations[self.rel[r]], self.names[self.dst[r]], int(self.topic[r]))
+            for r in rows
+        ]
+
+    def search(self, text: str, limit: int = 20) -> list:
+        """[(nome, nº de tópicos)] das entidades cuja chave contém o texto normalizado.
+
+        Igualdade vem antes de prefixo, que vem antes de substring; empates vão para a
+        entidade citada em mais tópicos.
+        """
+        query = normalize_entity(text)
+        if not query:
+            return []
+        indptr, rows = self._entity_rows()
+        matches = []
+        for entity_id, key in enumerate(self.keys):
+            if query not in key or indptr[entity_id] == indptr[entity_id + 1]:
+                continue
+            rank = 0 if key == query else 1 if key.startswith(query) else 2
+            n_topics = len(np.unique(self.topic[rows[indptr[entity_id]:indptr[entity_id + 1]]]))
+            matches.append((rank, -n_topics, key, self.names[entity_id], n_topics))
+        matches.sort()
+        return [(name, n_topics) for _, _, _, name, n_topics in matches[:limit]]
+
+    def topic_path(self, topic_id):
+        """Caminho (relativo à raiz do projeto) do micro-grafo do tópico, sem listar o diretório."""
+        entry = self.topics.get(int(topic_id))
+        return entry.get("path") if entry else None
+
+    def stats(self) -> dict:
+        return {"entities": len(self.keys), "relations": len(self.relations),
+                "edges": int(len(self.src)), "topics": len(self.topics)}
+
+
+_LOCK = threading.Lock()
+_LOADED = {"version": None, "index": None}
+
+
+def get_entity_index(path: Path = ENTITY_INDEX_PATH, directory: Path = MICRO_GRAPHS_DIR) -> EntityIndex:
+    """Índice compartilhado pelo processo, relido só quando o arquivo muda.
+
+    Sem arquivo salvo (micro-grafos anteriores ao índice), ele é montado a partir do
+    diretório e gravado. Se os micro-grafos mudaram fora de `build_micro_graphs` (fingerprint
+    diferente do registrado na última `sync`), só os novos ou alterados são relidos.
+    """
+    with _LOCK:
+        path = Path(path)
+        directory = Path(directory)
+        if not path.exists():
+            index = EntityIndex(path)
+            index.sync(directory)
+            index.save()
+        version = _file_version(path)
+        if _LOADED["version"] != version:
+            _LOADED["index"] = EntityIndex.load(path)
+            _LOADED["version"] = version
+
+        index = _LOADED["index"]
+        if index.directory_fingerprint != directory_fingerprint(directory):
+            print("Micro-grafos alterados fora do pipeline; sincronizando o índice de entidades...")
+            index.sync(directory)
+            index.save()
+            _LOADED["version"] = _file_version(path)
+        return index
+
+
+def entity_index_version(path: Path = ENTITY_INDEX_PATH) -> str:
+    """Versão (mtime + tamanho) do índice salvo, para chaves de cache e ETags."""
+    return _file_version(Path(path))
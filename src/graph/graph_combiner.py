@@ -1,48 +1,67 @@
 import networkx as nx
 import pandas as pd
-import pickle
 import numpy as np
-import json
+import sys
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 
 ROOT_PATH = Path(__file__).resolve().parent.parent.parent
-INPUT_BASE_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_base.gpickle"
-TOPICS_PATH = ROOT_PATH / "data" / "processed" / "topicos_nomeados_llm.csv"
-OUTPUT_FINAL_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_final.gpickle"
+sys.path.append(str(ROOT_PATH))
 
-def graft_lattes_topics(G: nx.DiGraph, df_topics: pd.DataFrame):
-    print("Carregando modelo de Embeddings...")
-    model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-    
-    cnpq_leaves = [n for n in G.nodes() 
-                   if G.nodes[n].get('origin') == 'CNPQ' and G.out_degree(n) == 0]
-    
-    print(f"Calculando vetores para {len(cnpq_leaves)} nós FOLHA (Nível mais baixo)...")
+from src import metrics
+from src.etl.embedding_cache import CachedEncoder
+from src.etl.topic_store import STORE_DIR, TopicStore
+from src.graph.graph_format import preferred_path, read_graph
+from src.graph.graph_versions import publish_graph
+from src.graph.micro_view import write_topic_manifest
+from src.graph.vector_index import ExactIndex, get_cnpq_candidates, load_or_build_cnpq_index
 
-    cnpq_embeddings = model.encode(cnpq_leaves)
+INPUT_BASE_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_base.gpickle"
+OUTPUT_FINAL_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_final.gpickle"
 
+ENCODE_BATCH_SIZE = 64
 
-    print("Iniciando enxerto multi-áreas...")
-    count_nodes = 0
-    count_edges = 0
+def graft_lattes_topics(G: nx.DiGraph, df_topics: pd.DataFrame, model=None, batch_size: int = ENCODE_BATCH_SIZE, top_k: int = 1, index=None):
+    if model is None:
+        model = CachedEncoder()
     
+    if index is None:
+        cnpq_leaves = get_cnpq_candidates(G, scope="leaves")
+        print(f"Calculando vetores para {len(cnpq_leaves)} nós FOLHA (Nível mais baixo)...")
+        index = ExactIndex(cnpq_leaves, model.encode(cnpq_leaves, batch_size=batch_size))
+
+    # Primeiro monta todos os tópicos e consultas; o grafo só é alterado no final,
+    # na mesma ordem da tabela de tópicos. Com empates resolvidos pelo menor índice (como o
+    # `np.argmax` do enxerto linha a linha), o resultado é o mesmo; ver tests/test_graph_combiner.py.
+    topics = []
+    queries = []
     for _, row in df_topics.iterrows():
         if row['Topic'] == -1: 
             continue
 
+        areas = row['Multi_Areas']
         label = row['LLM_Label']
-        
-        try:
-            areas = json.loads(row['Multi_Areas_JSON'])
-        except Exception as e:
-            print(f"Erro lendo JSON do tópico {row['Topic']}: {e}")
-            continue
+        query_ids = []
+        for area in areas:
+            if area['confidence'] < 0.6:
+                continue
+            query_ids.append((len(queries), area['area_name']))
+            queries.append(f"{label} ({area['area_name']})")
+        topics.append((row['Topic'], label, areas, query_ids))
+
+    print(f"Codificando {len(queries)} consultas em lote (batch_size={batch_size})...")
+    if queries:
+        query_embeddings = model.encode(queries, batch_size=batch_size)
+        with metrics.span("similarity_search"):
+            best_idx, best_scores = index.search(query_embeddings, k=top_k)
 
+    print("Iniciando enxerto multi-áreas...")
+    count_nodes = 0
+    count_edges = 0
+    
+    for topic_id, label, areas, query_ids in topics:
         main_category = areas[0]['area_name'] if areas else "Indefinido"
         
-        micro_graph_file = f"data/processed/micro_grafos/topico_{row['Topic']}.gpickle"
+        micro_graph_file = f"data/processed/micro_grafos/topico_{topic_id}.gpickle"
         
         if not G.has_node(label):
             G.add_node(
@@ -57,63 +76,59 @@ def graft_lattes_topics(G: nx.DiGraph, df_topics: pd.DataFrame):
             )
             count_nodes += 1
 
-        for area in areas:
-            area_name = area['area_name']
-            confidence = area['confidence']
-
-            if confidence < 0.6:
-                continue
-
-            search_query = f"{label} ({area_name})"
-            query_embedding = model.encode([search_query])
-
-            similarities = cosine_similarity(query_embedding, cnpq_embeddings)[0]
-            best_idx = np.argmax(similarities)
-            best_score = similarities[best_idx]
-            parent_node_name = cnpq_leaves[best_idx]
-
-            if parent_node_name.strip().lower() == label.strip().lower():
-                continue
-
-            if G.has_edge(parent_node_name, label):
-                continue
-
-            if best_score > 0.4:
-                G.add_edge(
-                    parent_node_name, 
-                    label, 
-                    weight=float(best_score), 
-                    relation="interdisciplinar",
-                    context=area_name
-                )
-                
-                print(f"  {label} --> {parent_node_name} [Ctx: {area_name}] (Score: {best_score:.2f})")
-                count_edges += 1
-
+        for query_id, area_name in query_ids:
+            for leaf_idx, best_score in zip(best_idx[query_id], best_scores[query_id]):
+                if leaf_idx < 0:
+                    continue
+                parent_node_name = index.names[leaf_idx]
+
+                if parent_node_name.strip().lower() == label.strip().lower():
+                    continue
+
+                if G.has_edge(parent_node_name, label):
+                    continue
+
+                if best_score > 0.4:
+                    G.add_edge(
+                        parent_node_name, 
+                        label, 
+                        weight=float(best_score), 
+                        relation="interdisciplinar",
+                        context=area_name
+                    )
+                    
+                    print(f"  {label} --> {parent_node_name} [Ctx: {area_name}] (Score: {best_score:.2f})")
+                    count_edges += 1
+
+    metrics.count("queries", len(queries))
+    metrics.count("topics_grafted", count_nodes)
+    metrics.count("edges_created", count_edges)
     print(f"Grafo Final Concluído!")
     print(f"Tópicos inseridos: {count_nodes}")
     print(f"Conexões interdisciplinares criadas: {count_edges}")
     return G
 
-def run_grafting():
+def run_grafting(scope: str = "leaves", backend: str = "exact", store_dir=STORE_DIR, **backend_kwargs):
     if not INPUT_BASE_GRAPH_PATH.exists():
         print("Erro: Rode o script 'graph_cnpq.py' primeiro!")
         return
 
     print("Carregando grafo base...")
-    with open(INPUT_BASE_GRAPH_PATH, 'rb') as f:
-        G = pickle.load(f)
+    G = read_graph(preferred_path(INPUT_BASE_GRAPH_PATH))
 
-    if not TOPICS_PATH.exists():
-        print("Erro: CSV de tópicos não encontrado!")
+    store = TopicStore(store_dir)
+    if not store.labels_path.exists():
+        print("Erro: Tópicos rotulados não encontrados! Rode o 'topic_labeler_llm.py' primeiro.")
         return
     
-    df_topics = pd.read_csv(TOPICS_PATH)
+    df_topics = store.read_labeled_topics()
     
-    G_final = graft_lattes_topics(G, df_topics)
+    model = CachedEncoder()
+    index = load_or_build_cnpq_index(G, model, INPUT_BASE_GRAPH_PATH, scope=scope, backend=backend, **backend_kwargs)
+    G_final = graft_lattes_topics(G, df_topics, model=model, index=index)
     
-    with open(OUTPUT_FINAL_GRAPH_PATH, 'wb') as f:
-        pickle.dump(G_final, f)
+    publish_graph(G_final, OUTPUT_FINAL_GRAPH_PATH)
+    write_topic_manifest(G_final)
     
     print(f"Grafo final salvo em: {OUTPUT_FINAL_GRAPH_PATH}")
 
@@ -0,0 +1,307 @@
+import json
+import os
+import pickle
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+from src import metrics
+
+MAGIC = b"TGRAPH01"
+ALIGNMENT = 64
+COMPACT_SUFFIX = ".tgraph"
+# Reconstruir um nx.DiGraph a partir do .tgraph é mais lento que o unpickle (ver
+# benchmarks/graph_format_bench.py); por isso o pickle continua sendo o padrão de leitura.
+GRAPH_FORMAT = os.environ.get("TAXONOMIA_GRAPH_FORMAT", "pickle")
+
+
+class StringTable:
+    """Strings internadas: bytes UTF-8 concatenados + offsets, acessíveis sem decodificar tudo."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            offsets[1:] = np.cumsum([len(b) for b in encoded])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8) if encoded else np.zeros(0, dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def tolist(self) -> list:
+        raw = bytes(self.data)
+        offs = self.offsets.tolist()
+        return [raw[offs[i]:offs[i + 1]].decode('utf-8') for i in range(len(self))]
+
+
+def _column_kind(values) -> str:
+    """Tipo da coluna; valores de tipos misturados (ex.: 15 e 0.5) vão como JSON, que preserva
+    o tipo de cada um."""
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, bool) for v in present):
+        return "bool"
+    if all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in present):
+        return "int"
+    if all(isinstance(v, (float, np.floating)) for v in present):
+        return "float"
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    return "json"
+
+
+def _encode_column(values) -> tuple:
+    """Converte uma coluna de atributos em arrays tipados. Ausências são marcadas em `mask`."""
+    kind = _column_kind(values)
+    mask = np.array([v is not None for v in values], dtype=bool)
+    arrays = {"mask": mask}
+
+    if kind == "bool":
+        arrays["values"] = np.array([bool(v) if v is not None else False for v in values], dtype=bool)
+    elif kind == "int":
+        arrays["values"] = np.array([int(v) if v is not None else 0 for v in values], dtype=np.int64)
+    elif kind == "float":
+        arrays["values"] = np.array([float(v) if v is not None else 0.0 for v in values], dtype=np.float64)
+    else:
+        if kind == "json":
+            values = [json.dumps(v, ensure_ascii=False) if v is not None else None for v in values]
+        interned = {}
+        codes = np.full(len(values), -1, dtype=np.int32)
+        for i, v in enumerate(values):
+            if v is not None:
+                codes[i] = interned.setdefault(v, len(interned))
+        table = StringTable.build(list(interned))
+        arrays.update(values=codes, strings=table.data, string_offsets=table.offsets)
+    return kind, arrays
+
+
+class CompactGraph:
+    """Grafo dirigido em arrays: CSR de adjacência, tabela de nomes e atributos em colunas tipadas.
+
+    Carregado de um `.tgraph` via memmap, nada é copiado até ser acessado; `to_networkx`
+    reconstrói o `nx.DiGraph` equivalente quando for preciso.
+    """
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.arrays = arrays
+        self.meta = meta
+        self.names = StringTable(arrays["names"], arrays["name_offsets"])
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self._ids = None
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.names)
+
+    @property
+    def number_of_edges(self) -> int:
+        return len(self.indices)
+
+    def node_id(self, name: str) -> int:
+        if self._ids is None:
+            self._ids = {n: i for i, n in enumerate(self.names.tolist())}
+        return self._ids[name]
+
+    def successors(self, name: str) -> list:
+        i = self.node_id(name)
+        return [self.names[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def _column(self, scope: str, key: str) -> list:
+        info = self.meta[f"{scope}_columns"][key]
+        prefix = f"{scope}.{key}."
+        mask = self.arrays[prefix + "mask"]
+        values = self.arrays[prefix + "values"]
+        kind = info["kind"]
+
+        if kind in ("str", "json"):
+            strings = StringTable(self.arrays[prefix + "strings"], self.arrays[prefix + "string_offsets"]).tolist()
+            if kind == "json":
+                strings = [json.loads(s) for s in strings]
+            return [strings[c] if c >= 0 else None for c in values.tolist()]
+        return [v if m else None for v, m in zip(values.tolist(), mask.tolist())]
+
+    def node_attribute(self, key: str) -> list:
+        return self._column("node", key)
+
+    def edge_attribute(self, key: str) -> list:
+        return self._column("edge", key)
+
+    @classmethod
+    def from_networkx(cls, G: nx.DiGraph) -> "CompactGraph":
+        nodes = list(G.nodes())
+        ids = {n: i for i, n in enumerate(nodes)}
+        arrays = {}
+        meta = {
+            "graph": dict(G.graph),
+            "node_order": [],
+            "node_columns": {},
+            "edge_columns": {},
+        }
+
+        names = StringTable.build([str(n) for n in nodes])
+        arrays["names"], arrays["name_offsets"] = names.data, names.offsets
+
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        indices = []
+        edges = []
+        for i, u in enumerate(nodes):
+            succ = list(G.successors(u))
+            indptr[i + 1] = indptr[i] + len(succ)
+            indices.extend(ids[v] for v in succ)
+            edges.extend(G.edges[u, v] for v in succ)
+        arrays["indptr"] = indptr
+        arrays["indices"] = np.array(indices, dtype=np.int32)
+
+        for scope, records in (("node", [G.nodes[n] for n in nodes]), ("edge", edges)):
+            keys = []
+            for attrs in records:
+                for k in attrs:
+                    if k not in keys:
+                        keys.append(k)
+            for k in keys:
+                kind, cols = _encode_column([attrs.get(k) for attrs in records])
+                meta[f"{scope}_columns"][k] = {"kind": kind}
+                for suffix, arr in cols.items():
+                    arrays[f"{scope}.{k}.{suffix}"] = arr
+
+        # As chaves de cada nó e aresta, em ordem, são guardadas para que `to_networkx` devolva
+        # dicts idênticos, inclusive atributos presentes com valor None.
+        for scope, records in (("node", [G.nodes[n] for n in nodes]), ("edge", edges)):
+            key_orders = {}
+            order_codes = [key_orders.setdefault(tuple(attrs), len(key_orders)) for attrs in records]
+            meta[f"{scope}_order"] = [list(k) for k in key_orders]
+            arrays[f"{scope}_key_order"] = np.array(order_codes, dtype=np.int32)
+        return cls(arrays, meta)
+
+    def to_networkx(self) -> nx.DiGraph:
+        G = nx.DiGraph(**self.meta["graph"])
+        names = self.names.tolist()
+
+        node_cols = {k: self.node_attribute(k) for k in self.meta["node_columns"]}
+        orders = [[(k, node_cols[k]) for k in order] for order in self.meta["node_order"]]
+        G.add_nodes_from(
+            (name, {k: col[i] for k, col in orders[order]})
+            for i, (name, order) in enumerate(zip(names, self.arrays["node_key_order"].tolist()))
+        )
+
+        edge_cols = {k: self.edge_attribute(k) for k in self.meta["edge_columns"]}
+        sources = np.repeat(np.arange(len(names)), np.diff(self.indptr)).tolist()
+        if "edge_key_order" in self.arrays:
+            edge_orders = [[(k, edge_cols[k]) for k in order] for order in self.meta["edge_order"]]
+            G.add_edges_from(
+                (names[u], names[v], {k: col[i] for k, col in edge_orders[order]})
+                for i, (u, v, order) in enumerate(zip(sources, self.indices.tolist(),
+                                                      self.arrays["edge_key_order"].tolist()))
+            )
+        else:
+            # Arquivos anteriores à ordem das chaves das arestas: só os valores presentes.
+            G.add_edges_from(
+                (names[u], names[v], {k: col[i] for k, col in edge_cols.items() if col[i] is not None})
+                for i, (u, v) in enumerate(zip(sources, self.indices.tolist()))
+            )
+        return G
+
+    def save(self, path):
+        path = Path(path)
+        header = {"meta": self.meta, "arrays": {}}
+        offset = 0
+        blobs = []
+        for name, arr in self.arrays.items():
+            arr = np.ascontiguousarray(arr)
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            header["arrays"][name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+            blobs.append((offset, arr))
+            offset += arr.nbytes
+
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header_bytes)).tobytes())
+            f.write(header_bytes)
+            for blob_offset, arr in blobs:
+                f.seek(data_start + blob_offset)
+                f.write(arr.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "CompactGraph":
+        path = Path(path)
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Arquivo não está no formato {COMPACT_SUFFIX}: {path}")
+            header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGNMENT) * ALIGNMENT
+
+        if mmap:
+            buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        else:
+            buffer = np.fromfile(path, dtype=np.uint8)
+
+        arrays = {}
+        for name, info in header["arrays"].items():
+            dtype = np.dtype(info["dtype"])
+            count = int(np.prod(info["shape"], dtype=np.int64))
+            start = data_start + info["offset"]
+            arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(info["shape"])
+        return cls(arrays, header["meta"])
+
+
+def compact_path_for(path) -> Path:
+    return Path(path).with_suffix(COMPACT_SUFFIX)
+
+
+def preferred_path(path, fmt: str = None) -> Path:
+    """Com o formato "compact", a cópia `.tgraph` do grafo quando ela existe e está em dia
+    com o pickle; caso contrário, o próprio pickle."""
+    path = Path(path)
+    if (fmt or GRAPH_FORMAT) != "compact":
+        return path
+    compact = compact_path_for(path)
+    if compact.exists() and (not path.exists() or compact.stat().st_mtime_ns >= path.stat().st_mtime_ns):
+        return compact
+    return path
+
+
+def read_graph(path) -> nx.DiGraph:
+    """Lê um grafo salvo em pickle (`.gpickle`) ou no formato compacto (`.tgraph`)."""
+    path = Path(path)
+    with metrics.span("graph_read"):
+        if path.suffix == COMPACT_SUFFIX:
+            return CompactGraph.load(path).to_networkx()
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def wants_compact_copy(compact_copy: bool = None) -> bool:
+    """Por padrão, a cópia `.tgraph` só é gravada quando ela é o formato de leitura escolhido."""
+    return GRAPH_FORMAT == "compact" if compact_copy is None else compact_copy
+
+
+def write_graph(G: nx.DiGraph, path, compact_copy: bool = None):
+    """Grava o grafo no formato indicado pela extensão e, se `wants_compact_copy`, uma cópia
+    `.tgraph` ao lado."""
+    path = Path(path)
+    with metrics.span("graph_write"):
+        if path.suffix == COMPACT_SUFFIX:
+            CompactGraph.from_networkx(G).save(path)
+            return
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(G, f)
+        os.replace(tmp_path, path)
+        if wants_compact_copy(compact_copy):
+            CompactGraph.from_networkx(G).save(compact_path_for(path))
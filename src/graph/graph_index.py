@@ -0,0 +1,154 @@
+from collections import deque
+
+import networkx as nx
+
+AGGREGATE_COLOR = "#F5B041"
+DEFAULT_NODE_BUDGET = 400
+
+
+class ClosureIndex:
+    """Fecho transitivo (ancestrais/descendentes) do grafo, calculado uma única vez.
+
+    A taxonomia é quase uma árvore, então cada conjunto tem no máximo a profundidade
+    da hierarquia em ancestrais; filtrar por área vira uma união de conjuntos prontos.
+    """
+
+    def __init__(self, G: nx.DiGraph):
+        self.graph = G
+        self._ancestors: dict = {}
+        self._descendants: dict = {}
+        self._lattes_by_category: dict = {}
+
+        if nx.is_directed_acyclic_graph(G):
+            order = list(nx.topological_sort(G))
+            for node in order:
+                anc = set()
+                for parent in G.predecessors(node):
+                    anc.add(parent)
+                    anc.update(self._ancestors[parent])
+                self._ancestors[node] = frozenset(anc)
+            for node in reversed(order):
+                desc = set()
+                for child in G.successors(node):
+                    desc.add(child)
+                    desc.update(self._descendants[child])
+                self._descendants[node] = frozenset(desc)
+        else:
+            # Enxertos podem criar ciclos quando um rótulo coincide com um nó do CNPq.
+            for node in G.nodes():
+                self._ancestors[node] = frozenset(nx.ancestors(G, node))
+                self._descendants[node] = frozenset(nx.descendants(G, node))
+
+        for node, attr in G.nodes(data=True):
+            if attr.get('origin') == 'LATTES':
+                self._lattes_by_category.setdefault(attr.get('Category'), []).append(node)
+
+    def ancestors(self, node) -> frozenset:
+        return self._ancestors.get(node, frozenset())
+
+    def descendants(self, node) -> frozenset:
+        return self._descendants.get(node, frozenset())
+
+    def categories(self) -> list:
+        return sorted(c for c in self._lattes_by_category if c)
+
+    def lattes_nodes(self, categories=None) -> list:
+        if categories:
+            return [n for c in categories for n in self._lattes_by_category.get(c, [])]
+        return [n for nodes in self._lattes_by_category.values() for n in nodes]
+
+    def focused_nodes(self, categories=None) -> set:
+        """Tópicos LATTES das categorias escolhidas e toda a cadeia de ancestrais."""
+        relevant = set()
+        for node in self.lattes_nodes(categories):
+            relevant.add(node)
+            relevant.update(self._ancestors[node])
+        return relevant
+
+    def area_tree_nodes(self, areas) -> set:
+        """Cada área escolhida com todos os seus descendentes e ancestrais."""
+        nodes = set()
+        for area in areas:
+            if area not in self._ancestors:
+                continue
+            nodes.add(area)
+            nodes.update(self._descendants[area])
+            nodes.update(self._ancestors[area])
+        return nodes
+
+
+def get_focused_subgraph(G: nx.DiGraph, selected_categories=None, index: ClosureIndex = None):
+    if index is None:
+        index = ClosureIndex(G)
+    relevant_nodes = index.focused_nodes(selected_categories)
+    if not relevant_nodes:
+        return None 
+    return G.subgraph(relevant_nodes)
+
+
+def get_tree_by_area(G: nx.DiGraph, selected_areas, index: ClosureIndex = None):
+    if index is None:
+        index = ClosureIndex(G)
+    nodes_to_keep = index.area_tree_nodes(selected_areas)
+    if not nodes_to_keep:
+        return None
+    return G.subgraph(nodes_to_keep)
+
+
+def _visible_nodes(G: nx.DiGraph, nodes: set, max_layer: int, expanded: set):
+    roots = [n for n in G.nodes() if n in nodes and not any(p in nodes for p in G.predecessors(n))]
+    visible = set(roots)
+    collapsed = []
+    queue = deque(roots)
+    while queue:
+        node = queue.popleft()
+        children = [c for c in G.successors(node) if c in nodes]
+        if not children:
+            continue
+        if G.nodes[node].get('layer', 0) >= max_layer and node not in expanded:
+            collapsed.append(node)
+            continue
+        for child in children:
+            if child not in visible:
+                visible.add(child)
+                queue.append(child)
+    return visible, [n for n in collapsed if any(c not in visible for c in G.successors(n) if c in nodes)]
+
+
+def level_of_detail(G: nx.DiGraph, nodes: set, index: ClosureIndex, max_layer: int,
+                    expanded=(), node_budget: int = DEFAULT_NODE_BUDGET):
+    """Recolhe os ramos abaixo de `max_layer` em nós agregados, respeitando `node_budget`.
+
+    Os ramos em `expanded` são abertos um nível por vez. Se o resultado passar do orçamento,
+    as expansões são desfeitas em ordem alfabética inversa (o resultado só depende do
+    conjunto, como a chave do cache de renderização) e depois o nível de corte sobe
+    até caber. Devolve (subgrafo, info) com o nível efetivo, os nós recolhidos e as
+    expansões descartadas.
+    """
+    expanded = sorted(set(expanded), key=str)
+    dropped = []
+    while True:
+        visible, collapsed = _visible_nodes(G, nodes, max_layer, set(expanded))
+        if len(visible) <= node_budget:
+            break
+        if expanded:
+            dropped.append(expanded.pop())
+        elif max_layer > 0:
+            max_layer -= 1
+        else:
+            break
+
+    H = G.subgraph(visible).copy()
+    for node in collapsed:
+        hidden = (index.descendants(node) & nodes) - visible
+        topics = sum(1 for n in hidden if G.nodes[n].get('origin') == 'LATTES')
+        attrs = H.nodes[node]
+        attrs['aggregate'] = True
+        attrs['hidden_nodes'] = len(hidden)
+        attrs['hidden_topics'] = topics
+        attrs['label'] = f"{attrs.get('label', node)} [+{len(hidden)}]"
+        attrs['title'] = f"{len(hidden)} nós recolhidos, {topics} tópicos LATTES"
+        attrs['color'] = AGGREGATE_COLOR
+        attrs['shape'] = "box"
+
+    return H, {"max_layer": max_layer, "collapsed": sorted(collapsed), "dropped": dropped}
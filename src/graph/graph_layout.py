@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src.graph.graph_format import preferred_path, read_graph
+
+FINAL_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_final.gpickle"
+LAYOUT_PATH = ROOT_PATH / "data" / "processed" / "grafo_final.layouts.json"
+# Arquivo anterior, só com as posições por forças; aproveitado na primeira execução.
+LEGACY_LAYOUT_PATH = ROOT_PATH / "data" / "processed" / "grafo_final.layout.json"
+
+MODE_FORCE = "force"
+MODE_HIERARCHICAL = "hierarchical"
+POSITION_MODES = (MODE_FORCE, MODE_HIERARCHICAL)
+
+LEVEL_SEPARATION = 220
+NODE_SPACING = 380
+LATTES_LEVEL = 5
+FORCE_SCALE_PER_NODE = 40
+FORCE_ITERATIONS = 100
+INCREMENTAL_ITERATIONS = 30
+REPULSION_CHUNK_ELEMENTS = 2_000_000
+
+
+def node_level(attrs: dict) -> int:
+    if attrs.get('origin') == 'LATTES':
+        return LATTES_LEVEL
+    return attrs.get('layer', 0)
+
+
+def hierarchical_layout(G: nx.DiGraph, level_separation: int = LEVEL_SEPARATION, node_spacing: int = NODE_SPACING) -> dict:
+    """Layout em camadas pelo atributo `layer`, em tempo linear.
+
+    As folhas ocupam posições consecutivas na ordem de uma busca em profundidade e cada
+    pai fica centralizado sobre os filhos. Um tópico com vários pais fica sob o primeiro.
+    """
+    positions = {}
+    next_slot = [0]
+
+    def place(node):
+        positions[node] = None
+        children_x = []
+        for child in G.successors(node):
+            if child not in positions:
+                place(child)
+                children_x.append(positions[child][0])
+        if children_x:
+            x = (min(children_x) + max(children_x)) / 2
+        else:
+            x = next_slot[0] * node_spacing
+            next_slot[0] += 1
+        positions[node] = (x, node_level(G.nodes[node]) * level_separation)
+
+    roots = [n for n in G.nodes() if G.in_degree(n) == 0]
+    for node in roots + list(G.nodes()):
+        if node not in positions:
+            place(node)
+    return positions
+
+
+def _cnpq_signature(G: nx.DiGraph) -> str:
+    cnpq = sorted(str(n) for n, attr in G.nodes(data=True) if attr.get('origin') != 'LATTES')
+    cnpq_set = set(cnpq)
+    edges = sorted(f"{u}\t{v}" for u, v in G.edges() if u in cnpq_set and v in cnpq_set)
+    return hashlib.sha1("\n".join(cnpq + ["--"] + edges).encode('utf-8')).hexdigest()
+
+
+def graph_signature(G: nx.DiGraph) -> str:
+    nodes = sorted(str(n) for n in G.nodes())
+    edges = sorted(f"{u}\t{v}" for u, v in G.edges())
+    return hashlib.sha1("\n".join(nodes + ["--"] + edges).encode('utf-8')).hexdigest()
+
+
+def _fruchterman_reingold(pos: np.ndarray, edges: np.ndarray, movable: np.ndarray,
+                          iterations: int, temperature: float) -> np.ndarray:
+    """Fruchterman-Reingold vetorizado; a repulsão é calculada em blocos de linhas para
+    limitar a memória a O(bloco * n)."""
+    n = len(pos)
+    k = 1.0 / np.sqrt(max(n, 1))
+    chunk = max(1, REPULSION_CHUNK_ELEMENTS // max(n, 1))
+    dt = temperature / (iterations + 1)
+    rows = np.flatnonzero(movable)
+
+    for _ in range(iterations):
+        disp = np.zeros_like(pos)
+        for start in range(0, len(rows), chunk):
+            idx = rows[start:start + chunk]
+            dx = pos[idx, 0, np.newaxis] - pos[np.newaxis, :, 0]
+            dy = pos[idx, 1, np.newaxis] - pos[np.newaxis, :, 1]
+            weight = (k * k) / np.maximum(dx * dx + dy * dy, 1e-4)
+            disp[idx, 0] = (dx * weight).sum(axis=1)
+            disp[idx, 1] = (dy * weight).sum(axis=1)
+
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            dist = np.maximum(np.linalg.norm(delta, axis=1), 1e-2)
+            force = delta * (dist / k)[:, np.newaxis]
+            np.subtract.at(disp, edges[:, 0], force)
+            np.add.at(disp, edges[:, 1], force)
+
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-2)
+        step = disp * (np.minimum(length, temperature) / length)[:, np.newaxis]
+        step[~movable] = 0
+        pos = pos + step
+        temperature -= dt
+    return pos
+
+
+def force_layout(G: nx.DiGraph, previous: dict = None, seed: int = 42) -> dict:
+    """Layout por forças (Fruchterman-Reingold em NumPy), normalizado para [-1, 1].
+
+    Com `previous`, as posições conhecidas ficam fixas e só os nós novos são acomodados,
+    partindo do centro dos seus pais.
+    """
+    nodes = list(G.nodes())
+    ids = {n: i for i, n in enumerate(nodes)}
+    edges = np.array([(ids[u], ids[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+    rng = np.random.default_rng(seed)
+
+    if not previous:
+        pos = rng.uniform(-1, 1, size=(len(nodes), 2))
+        movable = np.ones(len(nodes), dtype=bool)
+        pos = _fruchterman_reingold(pos, edges, movable, FORCE_ITERATIONS, temperature=0.1)
+        pos -= pos.mean(axis=0)
+        pos /= max(np.abs(pos).max(), 1e-9)
+        return {n: (float(x), float(y)) for n, (x, y) in zip(nodes, pos)}
+
+    pos = np.zeros((len(nodes), 2))
+    movable = np.array([n not in previous for n in nodes], dtype=bool)
+    for i, node in enumerate(nodes):
+        if not movable[i]:
+            pos[i] = previous[node]
+    for i in np.flatnonzero(movable):
+        parents = [pos[ids[p]] for p in G.predecessors(nodes[i]) if not movable[ids[p]]]
+        center = np.mean(parents, axis=0) if parents else np.zeros(2)
+        pos[i] = center + rng.normal(scale=0.01, size=2)
+
+    pos = _fruchterman_reingold(pos, edges, movable, INCREMENTAL_ITERATIONS, temperature=0.02)
+    return {n: (float(x), float(y)) for n, (x, y) in zip(nodes, pos)}
+
+
+def _read_saved(path: Path):
+    if path.exists():
+        return json.loads(path.read_text(encoding='utf-8'))
+    if path == LAYOUT_PATH and LEGACY_LAYOUT_PATH.exists():
+        legacy = json.loads(LEGACY_LAYOUT_PATH.read_text(encoding='utf-8'))
+        return {"signature": legacy.get("signature"), "cnpq_signature": legacy.get("cnpq_signature"),
+                "modes": {MODE_FORCE: legacy.get("positions", {})}}
+    return None
+
+
+def load_or_compute_layout(G: nx.DiGraph, path: Path = LAYOUT_PATH) -> dict:
+    """Posições do grafo final em cada modo (`POSITION_MODES`), persistidas em disco.
+
+    Reaproveita o arquivo se o grafo não mudou; se só os tópicos LATTES mudaram, mantém as
+    posições por forças do CNPq e recalcula apenas os tópicos. O layout em camadas é linear
+    e é sempre refeito junto.
+    """
+    signature = graph_signature(G)
+    cnpq_signature = _cnpq_signature(G)
+    saved = _read_saved(path)
+    modes = {}
+    if saved is not None and saved.get("signature") == signature:
+        modes = {mode: {n: tuple(p) for n, p in positions.items()}
+                 for mode, positions in saved.get("modes", {}).items()}
+        if all(mode in modes for mode in POSITION_MODES):
+            return modes
+
+    if MODE_FORCE not in modes:
+        previous = None
+        if saved is not None and saved.get("cnpq_signature") == cnpq_signature:
+            print("Layout: taxonomia CNPq inalterada, reposicionando apenas os tópicos LATTES...")
+            previous = {
+                n: p for n, p in saved.get("modes", {}).get(MODE_FORCE, {}).items()
+                if G.has_node(n) and G.nodes[n].get('origin') != 'LATTES'
+            }
+        else:
+            print(f"Layout: calculando posições para {G.number_of_nodes()} nós...")
+        modes[MODE_FORCE] = force_layout(G, previous)
+    modes[MODE_HIERARCHICAL] = hierarchical_layout(G)
+
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps({
+        "signature": signature,
+        "cnpq_signature": cnpq_signature,
+        "modes": modes,
+    }, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_path, path)
+    return modes
+
+
+_SAVED_LOCK = threading.Lock()
+_SAVED = {}
+
+
+def saved_positions(mode: str, signature: str, path: Path = LAYOUT_PATH):
+    """(versão do arquivo, posições) do modo, lidos do arquivo da etapa `layout`, sem calcular nada.
+
+    As posições são None se o arquivo não existe ou é de outra versão do grafo (a etapa
+    ainda vai rodar); o arquivo só é relido quando muda em disco.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None, None
+    version = f"{stat.st_mtime_ns}-{stat.st_size}"
+    with _SAVED_LOCK:
+        cached = _SAVED.get(str(path))
+    if cached is None or cached[0] != version:
+        cached = (version, json.loads(path.read_text(encoding='utf-8')))
+        with _SAVED_LOCK:
+            _SAVED[str(path)] = cached
+    saved = cached[1]
+    if saved.get("signature") != signature or mode not in saved.get("modes", {}):
+        return version, None
+    return version, saved["modes"][mode]
+
+
+def scale_positions(positions: dict, n_nodes: int) -> dict:
+    """Converte as coordenadas do layout por forças para pixels do vis.js."""
+    scale = FORCE_SCALE_PER_NODE * np.sqrt(max(n_nodes, 1))
+    return {n: (x * scale, y * scale) for n, (x, y) in positions.items()}
+
+
+def run_layout():
+    G = read_graph(preferred_path(FINAL_GRAPH_PATH))
+    load_or_compute_layout(G)
+    print(f"Layout salvo em: {LAYOUT_PATH}")
+
+
+if __name__ == "__main__":
+    run_layout()
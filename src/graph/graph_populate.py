@@ -1,9 +1,14 @@
 import networkx as nx
 import json
+import sys
 from pathlib import Path
-import pickle
 
 ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src import metrics
+from src.graph.graph_versions import publish_graph
+
 TAXONOMY_PATH = ROOT_PATH / "data" / "taxonomies" / "cnpq_taxonomy.json"
 OUTPUT_BASE_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_base.gpickle"
 
@@ -56,8 +61,9 @@ def build_and_save_cnpq():
             child = recursive_graph_populate(G, item, level=0)
             G.add_edge("CNPQ_Raiz", child)
 
-    with open(OUTPUT_BASE_GRAPH_PATH, 'wb') as f:
-        pickle.dump(G, f)
+    metrics.count("nodes", G.number_of_nodes())
+    metrics.count("edges", G.number_of_edges())
+    publish_graph(G, OUTPUT_BASE_GRAPH_PATH)
     
     print(f"Sucesso! Grafo base salvo em: {OUTPUT_BASE_GRAPH_PATH}")
     print(f"   Nós: {G.number_of_nodes()} | Arestas: {G.number_of_edges()}")
@@ -0,0 +1,196 @@
+import threading
+from collections import OrderedDict
+
+import networkx as nx
+from pyvis.network import Network
+
+from src.graph.graph_index import ClosureIndex, get_focused_subgraph, get_tree_by_area, level_of_detail
+from src.graph.graph_layout import MODE_FORCE, MODE_HIERARCHICAL, scale_positions
+
+LAYOUT_HIERARCHICAL = "Hierárquico (Árvore Organizada)"
+LAYOUT_EXPLOSION = "Explosão (Espalhado)"
+LAYOUT_MODES = [LAYOUT_HIERARCHICAL, LAYOUT_EXPLOSION]
+# Modo correspondente no arquivo de posições da etapa `layout` (ver `graph_layout.saved_positions`).
+LAYOUT_POSITIONS = {LAYOUT_HIERARCHICAL: MODE_HIERARCHICAL, LAYOUT_EXPLOSION: MODE_FORCE}
+
+HIERARCHICAL_OPTIONS = """
+var options = {
+  "layout": { "hierarchical": { "enabled": true, "direction": "UD", "sortMethod": "directed", "nodeSpacing": 380, "treeSpacing": 380, "levelSeparation": 220 } },
+  "physics": { "enabled": false },
+  "interaction": { "hover": true }
+}
+"""
+
+EXPLOSION_OPTIONS = """
+var options = {
+  "physics": {
+    "forceAtlas2Based": { "gravitationalConstant": -50, "springLength": 100, "springConstant": 0.08, "damping": 0.4 },
+    "maxVelocity": 50, "minVelocity": 0.1, "solver": "forceAtlas2Based",
+    "stabilization": { "enabled": true, "iterations": 1000, "updateInterval": 25, "onlyDynamicEdges": false, "fit": true }
+  },
+  "interaction": { "hover": true }
+}
+"""
+
+# Posições já calculadas no servidor: o navegador só desenha, sem simulação de física.
+STATIC_OPTIONS = """
+var options = {
+  "physics": { "enabled": false },
+  "edges": { "smooth": false },
+  "interaction": { "hover": true }
+}
+"""
+
+DEFAULT_CACHE_ENTRIES = 64
+
+
+def build_macro_html(G_viz: nx.DiGraph, layout_mode: str, show_labels: bool, positions: dict = None) -> str:
+    """HTML do pyvis para o subgrafo, com as `positions` do modo já calculadas pela etapa
+    `layout` do pipeline. Na falta delas (etapa ainda rodando), o navegador volta ao layout
+    hierárquico do vis.js ou à simulação forceAtlas2."""
+    G_plot = G_viz.copy()
+
+    for node in G_plot.nodes():
+        attrs = G_plot.nodes[node]
+        if positions is not None and node in positions:
+            attrs['x'], attrs['y'] = positions[node]
+        if 'layer' in attrs:
+            attrs['level'] = attrs['layer']
+            if attrs.get('origin') == 'LATTES':
+                 attrs['level'] = 5
+
+        if not show_labels:
+            if 'title' not in attrs or not attrs['title']:
+                attrs['title'] = str(attrs.get('label', node))
+            attrs['label'] = " "
+
+    net = Network(height="700px", width="100%", bgcolor="#ffffff", font_color="black")
+    net.from_nx(G_plot)
+
+    if positions is not None:
+        net.set_options(STATIC_OPTIONS)
+    elif layout_mode == LAYOUT_HIERARCHICAL:
+        net.set_options(HIERARCHICAL_OPTIONS)
+    else:
+        net.set_options(EXPLOSION_OPTIONS)
+
+    return net.generate_html()
+
+
+def build_micro_html(G_micro: nx.DiGraph, focus=None, degrees: dict = None) -> str:
+    """HTML de uma página do micro-grafo. `degrees` (grau no micro-grafo inteiro) define o
+    tamanho dos nós, para que a importância não dependa do recorte; o foco é destacado."""
+    G_viz = G_micro.copy()
+    for node in G_viz.nodes():
+        degree = (degrees or {}).get(node, G_micro.degree(node))
+        G_viz.nodes[node]['size'] = 10 + 3 * min(degree, 10)
+        G_viz.nodes[node]['title'] = f"{node} (grau {degree})"
+        if node == focus:
+            G_viz.nodes[node]['color'] = "#FF5733"
+
+    net = Network(height="700px", width="100%", bgcolor="#ffffff", font_color="black", directed=True)
+    net.from_nx(G_viz)
+    net.repulsion(node_distance=150, spring_length=200)
+    return net.generate_html()
+
+
+def render_macro_view(index: ClosureIndex, selected_areas, show_full_tree: bool, layout_mode: str, show_labels: bool,
+                      positions: dict = None, lod: dict = None) -> dict:
+    """Seleciona o subgrafo do filtro e gera o HTML do pyvis.
+
+    Com `lod` (`max_layer`, `expanded`, `node_budget`), a árvore completa é recolhida em nós
+    agregados (ver `graph_index.level_of_detail`). Devolve um dict com `html`, `nodes` e,
+    se houver, `lod_info`; `html` é None quando a seleção é vazia.
+    """
+    G_full = index.graph
+    lod_info = None
+    if show_full_tree:
+        G_viz = get_tree_by_area(G_full, selected_areas, index=index)
+        if G_viz is not None and lod is not None:
+            G_viz, lod_info = level_of_detail(G_full, set(G_viz.nodes()), index, **lod)
+    else:
+        G_viz = get_focused_subgraph(G_full, selected_categories=selected_areas, index=index)
+
+    if G_viz is None or G_viz.number_of_nodes() == 0:
+        return {"html": None, "nodes": 0, "lod_info": lod_info}
+    if positions is not None and LAYOUT_POSITIONS[layout_mode] == MODE_FORCE:
+        positions = scale_positions(positions, G_full.number_of_nodes())
+    html = build_macro_html(G_viz, layout_mode, show_labels, positions)
+    return {"html": html, "nodes": G_viz.number_of_nodes(), "lod_info": lod_info}
+
+
+class RenderCache:
+    """Cache LRU em memória do HTML já renderizado, compartilhado por todas as sessões."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: tuple, render):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = render()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def __contains__(self, key: tuple):
+        with self._lock:
+            return key in self._entries
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def macro_cache_key(version: str, selected_areas, show_full_tree: bool, layout_mode: str, show_labels: bool,
+                    lod: dict = None, layout_version: str = None) -> tuple:
+    lod_key = None
+    if lod is not None:
+        lod_key = (lod.get("max_layer"), tuple(sorted(lod.get("expanded", ()))), lod.get("node_budget"))
+    return ("macro", version, tuple(sorted(selected_areas)), bool(show_full_tree), layout_mode, bool(show_labels),
+            lod_key, layout_version)
+
+
+def cached_macro_view(cache: RenderCache, version: str, index: ClosureIndex, selected_areas,
+                      show_full_tree: bool, layout_mode: str, show_labels: bool, positions: dict = None,
+                      lod: dict = None, layout_version: str = None) -> dict:
+    """`layout_version` identifica as `positions` usadas (sem elas, None), para a renderização
+    feita antes da etapa `layout` terminar não ser reaproveitada depois."""
+    if positions is None:
+        layout_version = None
+    key = macro_cache_key(version, selected_areas, show_full_tree, layout_mode, show_labels, lod, layout_version)
+    return cache.get_or_render(
+        key, lambda: render_macro_view(index, selected_areas, show_full_tree, layout_mode, show_labels, positions, lod)
+    )
+
+
+def prewarm_macro_views(cache: RenderCache, version: str, index: ClosureIndex, layouts: dict = None):
+    """Renderiza a seleção padrão (todas as áreas, só ramos com tópicos) em todos os layouts.
+
+    `layouts` mapeia cada modo de `LAYOUT_MODES` para (versão do arquivo, posições).
+    """
+    categories = index.categories()
+    for layout_mode in LAYOUT_MODES:
+        layout_version, positions = (layouts or {}).get(layout_mode, (None, None))
+        cached_macro_view(cache, version, index, categories, False, layout_mode, True, positions,
+                          layout_version=layout_version)
+
+
+_RENDER_CACHE = RenderCache()
+
+
+def get_render_cache() -> RenderCache:
+    return _RENDER_CACHE
@@ -0,0 +1,224 @@
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import networkx as nx
+
+from src.graph import graph_versions
+from src.graph.graph_format import read_graph
+
+
+class _StoreEntry:
+    def __init__(self, version: str, graph: nx.DiGraph):
+        self.version = version
+        self.graph = graph
+        self.derived = {}
+        self.building: dict[str, Future] = {}
+
+
+class GraphStore:
+    """Cache em memória dos grafos em disco, compartilhado por todas as sessões do processo.
+
+    Cada arquivo é identificado pelo caminho e pela versão (mtime + tamanho); o pickle só é
+    relido quando o pipeline reescreve o arquivo. Os grafos devolvidos são compartilhados
+    e não devem ser alterados por quem os lê (use `.copy()` antes de modificar).
+
+    Grafos publicados com `graph_versions.publish_graph` são identificados pela versão do
+    ponteiro e lidos da pasta da versão. Quando uma versão nova é publicada, a antiga continua
+    sendo servida enquanto a nova é carregada em segundo plano e tem os derivados já pedidos
+    (índices, layouts) recalculados; só então a troca acontece e a versão antiga é liberada.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: dict[str, _StoreEntry] = {}
+        self._listeners = {}
+        self._stats = {
+            "loads": 0,
+            "hits": 0,
+            "load_seconds_total": 0.0,
+            "last_load_seconds": 0.0,
+            "last_load_path": None,
+            "background_reloads": 0,
+            "stale_hits": 0,
+        }
+        self._builders: dict[str, dict] = {}
+        self._pending: dict[str, str] = {}
+        self._loading: dict[str, tuple[str, Future]] = {}
+
+    @staticmethod
+    def file_version(path) -> str:
+        stat = Path(path).stat()
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    @classmethod
+    def _current(cls, key: str):
+        """(versão, arquivo a ler): a versão publicada, ou mtime + tamanho do próprio arquivo.
+
+        O ponteiro só vale enquanto o arquivo canônico for o publicado; trocado por fora
+        (`git pull`), o arquivo é lido diretamente.
+        """
+        version = graph_versions.published_version(key)
+        if version is not None:
+            source = graph_versions.resolve(key, version)
+            if source != Path(key):
+                return version, source, True
+        return cls.file_version(key), Path(key), False
+
+    def _load(self, key: str, version: str, source: Path) -> _StoreEntry:
+        inicio = time.perf_counter()
+        graph = read_graph(source)
+        elapsed = time.perf_counter() - inicio
+        with self._lock:
+            self._stats["loads"] += 1
+            self._stats["load_seconds_total"] += elapsed
+            self._stats["last_load_seconds"] = elapsed
+            self._stats["last_load_path"] = key
+        return _StoreEntry(version, graph)
+
+    def _notify(self, key: str, version: str):
+        for listener in list(self._listeners.values()):
+            threading.Thread(target=listener, args=(key, version), daemon=True).start()
+
+    def _entry(self, path) -> _StoreEntry:
+        key = str(Path(path).resolve())
+        version, source, versioned = self._current(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._stats["hits"] += 1
+                return entry
+            if entry is not None and versioned:
+                # Continua servindo a versão atual até a nova estar carregada e aquecida.
+                self._stats["stale_hits"] += 1
+                if self._pending.get(key) != version:
+                    self._pending[key] = version
+                    threading.Thread(target=self._reload, args=(key, version, source), daemon=True).start()
+                return entry
+
+            # A leitura do arquivo roda fora do lock: quem pede o mesmo caminho e versão espera
+            # pelo mesmo `Future`, e os demais grafos seguem sendo servidos.
+            loading = self._loading.get(key)
+            owner = loading is None or loading[0] != version
+            if owner:
+                future = Future()
+                self._loading[key] = (version, future)
+            else:
+                future = loading[1]
+
+        if not owner:
+            return future.result()
+        try:
+            entry = self._load(key, version, source)
+        except BaseException as e:
+            with self._lock:
+                if self._loading.get(key, (None, None))[1] is future:
+                    self._loading.pop(key)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._entries[key] = entry
+            if self._loading.get(key, (None, None))[1] is future:
+                self._loading.pop(key)
+        if versioned:
+            graph_versions.acquire_lease(key, version)
+        future.set_result(entry)
+
+        self._notify(key, version)
+        return entry
+
+    def _reload(self, key: str, version: str, source: Path):
+        try:
+            entry = self._load(key, version, source)
+            with self._lock:
+                builders = dict(self._builders.get(key, {}))
+            for name, builder in builders.items():
+                entry.derived[name] = builder(entry.graph)
+        except Exception as e:
+            print(f"Falha ao carregar a versão {version} de {Path(key).name}: {e}")
+            with self._lock:
+                if self._pending.get(key) == version:
+                    self._pending.pop(key)
+            return
+
+        with self._lock:
+            # Publicações seguidas: uma carga mais antiga que termine depois da nova é descartada.
+            if self._pending.get(key) != version:
+                return
+            old = self._entries.get(key)
+            self._entries[key] = entry
+            self._pending.pop(key)
+            self._stats["background_reloads"] += 1
+        graph_versions.acquire_lease(key, version)
+        if old is not None:
+            graph_versions.release_lease(key, old.version)
+        graph_versions.collect_garbage(key)
+        self._notify(key, version)
+
+    def get(self, path) -> nx.DiGraph:
+        """Devolve o grafo do arquivo, recarregando apenas se ele mudou em disco."""
+        return self._entry(path).graph
+
+    def version(self, path) -> str:
+        """Versão do grafo atualmente servido para o caminho."""
+        return self._entry(path).version
+
+    def derived(self, path, key: str, builder):
+        """Objeto derivado do grafo (índices, layouts...), calculado uma vez por versão.
+
+        O cálculo roda fora do lock do store: quem pede o mesmo derivado ao mesmo tempo
+        espera pelo mesmo `Future`, e as demais leituras seguem sem bloquear.
+        O `builder` fica registrado para aquecer as próximas versões antes da troca.
+        """
+        entry = self._entry(path)
+        with self._lock:
+            self._builders.setdefault(str(Path(path).resolve()), {})[key] = builder
+            if key in entry.derived:
+                return entry.derived[key]
+            future = entry.building.get(key)
+            owner = future is None
+            if owner:
+                future = entry.building[key] = Future()
+
+        if owner:
+            try:
+                value = builder(entry.graph)
+            except BaseException as e:
+                with self._lock:
+                    entry.building.pop(key, None)
+                future.set_exception(e)
+                raise
+            with self._lock:
+                entry.derived[key] = value
+                entry.building.pop(key, None)
+            future.set_result(value)
+        return future.result()
+
+    def add_listener(self, name: str, callback):
+        """Registra `callback(path, version)`, chamado em segundo plano a cada nova versão carregada.
+
+        Registrar de novo com o mesmo nome substitui o anterior (o script do Streamlit roda
+        a cada interação).
+        """
+        with self._lock:
+            self._listeners[name] = callback
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(Path(path).resolve()), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, cached_files=len(self._entries))
+
+
+_STORE = GraphStore()
+
+
+def get_graph_store() -> GraphStore:
+    return _STORE
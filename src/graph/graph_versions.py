@@ -0,0 +1,192 @@
+import itertools
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import networkx as nx
+
+from src.graph.graph_format import COMPACT_SUFFIX, compact_path_for, wants_compact_copy, write_graph
+
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+VERSIONS_DIR = ROOT_PATH / "data" / "processed" / "versions"
+# Versões mantidas além da atual, mesmo sem leitores (para inspeção ou rollback manual).
+KEEP_VERSIONS = 2
+
+_COUNTER = itertools.count()
+
+
+def _artifact_name(path) -> str:
+    """Nome lógico do artefato: o mesmo para o `.gpickle` e a cópia `.tgraph`."""
+    return Path(path).stem
+
+
+def versions_dir_for(path) -> Path:
+    return VERSIONS_DIR / _artifact_name(path)
+
+
+def pointer_path(path) -> Path:
+    path = Path(path)
+    return path.with_name(f"{_artifact_name(path)}.current.json")
+
+
+def current_version(path):
+    """Conteúdo do ponteiro da versão publicada ({"version", "published_at"}), ou None."""
+    pointer = pointer_path(path)
+    try:
+        return json.loads(pointer.read_text(encoding='utf-8'))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def file_identity(path) -> str:
+    """Inode + mtime + tamanho: muda quando o arquivo é trocado por qualquer caminho."""
+    stat = Path(path).stat()
+    return f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def published_version(path):
+    """A versão do ponteiro, se o arquivo em `path` ainda é o que `publish_graph` deixou lá.
+
+    Os grafos canônicos são versionados no git e o ponteiro não: depois de um `git pull`
+    (ou de qualquer gravação fora do `publish_graph`), o próprio arquivo volta a valer.
+    """
+    pointer = current_version(path)
+    if pointer is None:
+        return None
+    path = Path(path)
+    try:
+        identity = file_identity(path)
+    except OSError:
+        return None
+    if pointer.get("files", {}).get(path.name) != identity:
+        return None
+    return pointer["version"]
+
+
+def resolve(path, version: str = None) -> Path:
+    """Arquivo da versão (a publicada, por padrão) no mesmo formato de `path`; o próprio
+    `path` quando o artefato nunca foi publicado por aqui."""
+    path = Path(path)
+    if version is None:
+        pointer = current_version(path)
+        version = pointer["version"] if pointer else None
+    if version is not None:
+        versioned = versions_dir_for(path) / version / path.name
+        if versioned.exists():
+            return versioned
+    return path
+
+
+def _write_json(path: Path, payload: dict):
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def _swap_in(source: Path, target: Path):
+    """Troca `target` pelo arquivo da versão de forma atômica: hardlink (sem cópia) num
+    temporário e `os.replace`. Quem já abriu o arquivo antigo continua lendo o antigo."""
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def publish_graph(G: nx.DiGraph, path, compact_copy: bool = None) -> str:
+    """Grava o grafo numa pasta de versão nova e só então a publica.
+
+    1. a versão é gravada por completo em `VERSIONS_DIR/<artefato>/<versão>/`;
+    2. o caminho de sempre (`path` e, com o formato compacto, a cópia `.tgraph`) vira um
+       hardlink para a versão, por troca atômica, para o pipeline e scripts que leem o
+       caminho direto;
+    3. o ponteiro `<artefato>.current.json` passa a apontar para ela (também por troca
+       atômica), com a identidade dos arquivos do passo 2 para detectar trocas externas.
+
+    Nenhum leitor vê um arquivo pela metade; versões antigas sem leitores são removidas.
+    """
+    path = Path(path)
+    compact_copy = wants_compact_copy(compact_copy)
+    version = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}-{next(_COUNTER):04d}"
+    version_dir = versions_dir_for(path) / version
+    version_dir.mkdir(parents=True, exist_ok=True)
+    write_graph(G, version_dir / path.name, compact_copy=compact_copy)
+
+    _swap_in(version_dir / path.name, path)
+    files = {path.name: file_identity(path)}
+    if compact_copy and path.suffix != COMPACT_SUFFIX:
+        compact = compact_path_for(path)
+        _swap_in(compact_path_for(version_dir / path.name), compact)
+        files[compact.name] = file_identity(compact)
+    _write_json(pointer_path(path), {
+        "version": version,
+        "published_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "files": files,
+    })
+
+    print(f"Versão {version} de {path.name} publicada.")
+    collect_garbage(path)
+    return version
+
+
+# --- leitores e coleta de versões antigas ---
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def acquire_lease(path, version: str):
+    """Marca que este processo está servindo a versão; ela não é coletada enquanto ele viver."""
+    leases = versions_dir_for(path) / version / "leases"
+    if leases.parent.exists():
+        leases.mkdir(exist_ok=True)
+        (leases / str(os.getpid())).touch()
+
+
+def release_lease(path, version: str):
+    (versions_dir_for(path) / version / "leases" / str(os.getpid())).unlink(missing_ok=True)
+
+
+def _has_live_lease(version_dir: Path) -> bool:
+    leases = version_dir / "leases"
+    if not leases.exists():
+        return False
+    alive = False
+    for lease in leases.iterdir():
+        if lease.name.isdigit() and _pid_alive(int(lease.name)):
+            alive = True
+        else:
+            # Processo que morreu sem liberar a versão.
+            lease.unlink(missing_ok=True)
+    return alive
+
+
+def collect_garbage(path, keep: int = KEEP_VERSIONS) -> list:
+    """Remove versões que não são a atual, nem estão entre as `keep` mais recentes, nem
+    têm leitores vivos. Devolve as versões removidas."""
+    root = versions_dir_for(path)
+    if not root.exists():
+        return []
+    pointer = current_version(path)
+    current = pointer["version"] if pointer else None
+    versions = sorted((d for d in root.iterdir() if d.is_dir()), key=lambda d: d.name, reverse=True)
+
+    removed = []
+    for version_dir in versions[keep + 1:]:
+        if version_dir.name == current or _has_live_lease(version_dir):
+            continue
+        shutil.rmtree(version_dir, ignore_errors=True)
+        removed.append(version_dir.name)
+    return removed
@@ -1,6 +1,10 @@
 import pandas as pd
 import networkx as nx
-import pickle
+import hashlib
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import List
 from pydantic import BaseModel, Field
@@ -11,8 +15,18 @@ from dotenv import load_dotenv
 load_dotenv()
 
 ROOT_PATH = Path(__file__).resolve().parent.parent.parent
-MAPPING_PATH = ROOT_PATH / "data" / "processed" / "doc_topic_mapping.csv"
+sys.path.append(str(ROOT_PATH))
+
+from src import metrics
+from src.etl.llm_cache import CachedChain
+from src.etl.topic_store import STORE_DIR, TopicStore
+from src.graph.entity_index import ENTITY_INDEX_PATH, EntityIndex
+from src.graph.graph_format import write_graph
+
 MICRO_GRAPHS_DIR = ROOT_PATH / "data" / "processed" / "micro_grafos"
+JOURNAL_PATH = MICRO_GRAPHS_DIR / "extraction_journal.jsonl"
+DOCS_PER_TOPIC = 5
+LLM_MODEL = "gpt-4o-mini"
 
 MICRO_GRAPHS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -26,8 +40,8 @@ class GraphExtraction(BaseModel):
     """Lista de relações extraídas de um documento."""
     triples: List[Relation] = Field(description="Lista de tríades extraídas do texto.")
 
-def get_extraction_chain():
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+def get_extraction_chain(use_cache: bool = True):
+    llm = ChatOpenAI(model=LLM_MODEL, temperature=0)
     structured_llm = llm.with_structured_output(GraphExtraction)
 
     system_template = """
@@ -51,52 +65,176 @@ def get_extraction_chain():
         ("human", human_template),
     ])
 
-    return prompt | structured_llm
+    chain = prompt | structured_llm
+    if use_cache:
+        chain = CachedChain(chain, LLM_MODEL, [system_template, human_template], GraphExtraction)
+    return chain
 
-def build_micro_graphs():
-    if not MAPPING_PATH.exists():
-        print("Erro: Arquivo doc_topic_mapping.csv não encontrado. Rode o topic_modeling.py primeiro.")
-        return
+class ExtractionJournal:
+    """Diário JSONL só de acréscimo com as tríades extraídas por documento e o estado de cada tópico.
 
-    df = pd.read_csv(MAPPING_PATH)
-    chain = get_extraction_chain()
-    
-    grouped = df.groupby('Topic')
+    Cada documento é identificado pelo hash do texto normalizado; um tópico só é
+    reconstruído quando o conjunto de documentos selecionados muda.
+    """
+
+    def __init__(self, path: Path = JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._docs: dict[str, list] = {}
+        self._topics: dict[str, str] = {}
+
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Última linha truncada por uma execução interrompida.
+                        continue
+                    if entry["kind"] == "doc":
+                        self._docs[entry["fingerprint"]] = entry["triples"]
+                    elif entry["kind"] == "topic":
+                        self._topics[str(entry["topic"])] = entry["fingerprint"]
+
+    def _append(self, entry: dict):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+
+    def get_triples(self, fingerprint: str):
+        return self._docs.get(fingerprint)
+
+    def record_doc(self, fingerprint: str, triples: list):
+        self._docs[fingerprint] = triples
+        self._append({"kind": "doc", "fingerprint": fingerprint, "triples": triples})
+
+    def topic_fingerprint(self, topic_id):
+        return self._topics.get(str(topic_id))
+
+    def record_topic(self, topic_id, fingerprint: str):
+        self._topics[str(topic_id)] = fingerprint
+        self._append({"kind": "topic", "topic": str(topic_id), "fingerprint": fingerprint})
+
+def document_fingerprint(doc: str) -> str:
+    return hashlib.sha1(doc.encode('utf-8')).hexdigest()
+
+def select_topic_documents(docs: list) -> list:
+    docs_series = pd.Series(docs, dtype=object).apply(str)
     
-    for topic_id, group in grouped:
-        if topic_id == -1:
-            continue
-            
-        print(f"\nConstruindo Micro-Grafo para o Tópico {topic_id} ({len(group)} documentos)...")
-        
-        G_micro = nx.DiGraph(name=f"Micro_Grafo_Topico_{topic_id}")
-        
-        docs_series = group['Document'].apply(str)
-        
-        docs_limpos = docs_series.str.strip().str.replace(r'\s+', ' ', regex=True)
-
-        mascara_unicos = ~docs_limpos.str.lower().duplicated()
-        docs_unicos = docs_limpos[mascara_unicos]
-
-        docs_to_process = docs_unicos.sort_values(key=lambda x: x.str.len(), ascending=False).head(5)
-        
-        for doc in docs_to_process:
+    docs_limpos = docs_series.str.strip().str.replace(r'\s+', ' ', regex=True)
+
+    mascara_unicos = ~docs_limpos.str.lower().duplicated()
+    docs_unicos = docs_limpos[mascara_unicos]
+
+    return docs_unicos.sort_values(key=lambda x: x.str.len(), ascending=False).head(DOCS_PER_TOPIC).tolist()
+
+def build_topic_micro_graph(topic_id, docs: list, chain, journal: ExtractionJournal = None):
+    """Devolve (micro-grafo, documentos cuja extração falhou); os que falharam ficam de fora do grafo."""
+    G_micro = nx.DiGraph(name=f"Micro_Grafo_Topico_{topic_id}")
+    failures = 0
+
+    for doc in docs:
+        fingerprint = document_fingerprint(doc)
+        triples = journal.get_triples(fingerprint) if journal is not None else None
+
+        if triples is None:
             try:
                 extraction: GraphExtraction = chain.invoke({"text": doc})
-                
-                for triple in extraction.triples:
-                    G_micro.add_node(triple.source, type="Entity")
-                    G_micro.add_node(triple.target, type="Entity")
-                    G_micro.add_edge(triple.source, triple.target, relation=triple.relation_type)
-                    
             except Exception as e:
                 print(f"Erro ao extrair de um documento no tópico {topic_id}: {e}")
-                
-        output_path = MICRO_GRAPHS_DIR / f"topico_{topic_id}.gpickle"
-        with open(output_path, 'wb') as f:
-            pickle.dump(G_micro, f)
-            
-        print(f" -> Salvo: {output_path.name} (Nós: {G_micro.number_of_nodes()}, Arestas: {G_micro.number_of_edges()})")
+                failures += 1
+                continue
+            triples = [[t.source, t.target, t.relation_type] for t in extraction.triples]
+            metrics.count("documents_extracted")
+            if journal is not None:
+                journal.record_doc(fingerprint, triples)
+
+        for source, target, relation_type in triples:
+            G_micro.add_node(source, type="Entity")
+            G_micro.add_node(target, type="Entity")
+            G_micro.add_edge(source, target, relation=relation_type)
+
+    return G_micro, failures
+
+def _process_topic(topic_id, store: TopicStore, chain, journal: ExtractionJournal, incremental: bool,
+                   entity_index: EntityIndex = None):
+    output_path = MICRO_GRAPHS_DIR / f"topico_{topic_id}.gpickle"
+    docs = store.read_topic_documents(topic_id)
+    docs_to_process = select_topic_documents(docs)
+    topic_fingerprint = hashlib.sha1("\n".join(document_fingerprint(d) for d in docs_to_process).encode()).hexdigest()
+
+    if incremental and output_path.exists() and journal.topic_fingerprint(topic_id) == topic_fingerprint:
+        print(f"Tópico {topic_id}: documentos inalterados, mantendo {output_path.name}.")
+        metrics.count("topics_skipped")
+        return True
+
+    print(f"\nConstruindo Micro-Grafo para o Tópico {topic_id} ({len(docs)} documentos)...")
+    G_micro, failures = build_topic_micro_graph(topic_id, docs_to_process, chain, journal if incremental else None)
+
+    write_graph(G_micro, output_path)
+    if entity_index is not None:
+        entity_index.update_topic(topic_id, G_micro, output_path)
+    metrics.count("topics_built")
+    metrics.count("micro_graph_edges", G_micro.number_of_edges())
+
+    if failures:
+        # Grafo parcial: o tópico não é marcado como concluído e volta na próxima execução.
+        print(f"Aviso: {failures} documentos do tópico {topic_id} falharam; o tópico será refeito.")
+        metrics.count("topics_incomplete")
+    elif incremental:
+        journal.record_topic(topic_id, topic_fingerprint)
+
+    print(f" -> Salvo: {output_path.name} (Nós: {G_micro.number_of_nodes()}, Arestas: {G_micro.number_of_edges()})")
+    return not failures
+
+def build_micro_graphs(incremental: bool = True, max_workers: int = 4, chain=None, topics=None, store_dir=STORE_DIR):
+    """Constrói os micro-grafos de todos os tópicos do mapeamento, ou só dos ids em `topics`.
+
+    Cada tópico lê do `TopicStore` apenas os próprios documentos, dentro da thread que o processa,
+    e entra no índice global de entidades assim que o micro-grafo é gravado.
+    Devolve os ids dos tópicos que ficaram incompletos (com extrações que falharam).
+    """
+    store = TopicStore(store_dir)
+    if not store.has_mapping():
+        print("Erro: Mapeamento de documentos para tópicos não encontrado. Rode o topic_modeling.py primeiro.")
+        return []
+
+    if chain is None:
+        chain = get_extraction_chain()
+    journal = ExtractionJournal() if incremental else None
+    entity_index = EntityIndex.load(ENTITY_INDEX_PATH)
+    
+    topic_ids = [topic_id for topic_id in store.topic_ids() if topic_id != -1]
+    if topics is not None:
+        wanted = {int(t) for t in topics}
+        topic_ids = [topic_id for topic_id in topic_ids if int(topic_id) in wanted]
+
+    incomplete = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(metrics.bind(_process_topic), topic_id, store, chain, journal, incremental, entity_index): topic_id
+            for topic_id in topic_ids
+        }
+        for future in as_completed(futures):
+            try:
+                complete = future.result()
+            except Exception as e:
+                print(f"Erro ao construir o micro-grafo do tópico {futures[future]}: {e}")
+                complete = False
+            if not complete:
+                incomplete.append(futures[future])
+
+    # Tópicos mantidos sem reconstrução, mas ainda fora do índice, entram aqui.
+    with metrics.span("entity_index"):
+        entity_index.sync(MICRO_GRAPHS_DIR)
+        entity_index.save()
+    print(f"Índice de entidades: {entity_index.stats()}")
+
+    if isinstance(chain, CachedChain):
+        print(f"Cache de respostas do LLM: {chain.cache.stats()}")
+        metrics.record_cache("llm_responses", chain.cache.stats())
+    return sorted(incomplete)
 
 if __name__ == "__main__":
     build_micro_graphs()
\ No newline at end of file
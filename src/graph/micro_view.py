@@ -0,0 +1,135 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import deque
+from pathlib import Path
+
+import networkx as nx
+
+from src.graph.graph_format import preferred_path, read_graph
+
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+MICRO_GRAPHS_DIR = ROOT_PATH / "data" / "processed" / "micro_grafos"
+TOPIC_MANIFEST_PATH = MICRO_GRAPHS_DIR / "manifest.json"
+FINAL_GRAPH_PATH = ROOT_PATH / "data" / "processed" / "grafo_final.gpickle"
+
+# Entidades por página: acima disso o pyvis com física passa a demorar segundos para estabilizar.
+DEFAULT_PAGE_SIZE = 60
+DEFAULT_HOPS = 1
+MICRO_GRAPH_NAME_RE = re.compile(r"topico_(-?\d+)\.gpickle$")
+
+
+# --- manifesto tópico -> micro-grafo ---
+
+def build_topic_manifest(G_final: nx.DiGraph) -> dict:
+    """Rótulo do tópico -> id, caminho do micro-grafo e categoria, a partir dos nós LATTES."""
+    manifest = {}
+    for node, attr in G_final.nodes(data=True):
+        if attr.get('origin') != 'LATTES' or not attr.get('micro_path'):
+            continue
+        match = MICRO_GRAPH_NAME_RE.search(attr['micro_path'])
+        manifest[node] = {
+            "topic": int(match.group(1)) if match else None,
+            "path": attr['micro_path'],
+            "category": attr.get('Category'),
+        }
+    return manifest
+
+
+def _file_version(path: Path):
+    stat = Path(path).stat()
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def write_topic_manifest(G_final: nx.DiGraph, path: Path = TOPIC_MANIFEST_PATH,
+                         final_graph_path: Path = FINAL_GRAPH_PATH) -> dict:
+    """Grava o manifesto ao lado dos micro-grafos; chamado sempre que o grafo final é gravado.
+
+    A versão (mtime + tamanho) do grafo final em `final_graph_path` vai junto, para que um
+    grafo final trocado por fora (`git pull`, pipeline em outra máquina) invalide o manifesto.
+    """
+    manifest = build_topic_manifest(G_final)
+    final_graph_path = Path(final_graph_path)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps({
+        "final_graph_version": _file_version(final_graph_path) if final_graph_path.exists() else None,
+        "topics": manifest,
+    }, indent=2, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_path, path)
+    return manifest
+
+
+_LOCK = threading.Lock()
+_LOADED = {"version": None, "manifest": None}
+
+
+def get_topic_manifest(path: Path = TOPIC_MANIFEST_PATH, final_graph_path: Path = FINAL_GRAPH_PATH) -> dict:
+    """Manifesto compartilhado pelo processo, relido só quando ele ou o grafo final mudam.
+
+    Sem manifesto, ou com um gerado de outra versão do grafo final, o grafo final é lido
+    uma única vez para regerá-lo.
+    """
+    path = Path(path)
+    final_graph_path = Path(final_graph_path)
+    with _LOCK:
+        final_version = _file_version(final_graph_path) if final_graph_path.exists() else None
+        manifest_version = _file_version(path) if path.exists() else None
+        if _LOADED["version"] == (manifest_version, final_version):
+            return _LOADED["manifest"]
+
+        data = json.loads(path.read_text(encoding='utf-8')) if manifest_version is not None else {}
+        if final_version is not None and data.get("final_graph_version") != final_version:
+            print("Manifesto dos micro-grafos desatualizado; regerando a partir do grafo final...")
+            topics = write_topic_manifest(read_graph(preferred_path(final_graph_path)), path, final_graph_path)
+            data = {"final_graph_version": final_version, "topics": topics}
+            manifest_version = _file_version(path)
+
+        _LOADED["manifest"] = data.get("topics", {})
+        _LOADED["version"] = (manifest_version, final_version)
+        return _LOADED["manifest"]
+
+
+# --- visão paginada de um micro-grafo ---
+
+def degree_ranking(G_micro: nx.DiGraph) -> list:
+    """Entidades do maior para o menor grau (empates em ordem alfabética)."""
+    return sorted(G_micro.nodes(), key=lambda n: (-G_micro.degree(n), str(n)))
+
+
+def neighbourhood_ranking(G_micro: nx.DiGraph, focus, hops: int = DEFAULT_HOPS) -> list:
+    """Entidades a até `hops` arestas da entidade em foco (em qualquer direção), por distância e grau."""
+    if focus not in G_micro:
+        return []
+    distance = {focus: 0}
+    queue = deque([focus])
+    while queue:
+        node = queue.popleft()
+        if distance[node] == hops:
+            continue
+        for neighbour in nx.all_neighbors(G_micro, node):
+            if neighbour not in distance:
+                distance[neighbour] = distance[node] + 1
+                queue.append(neighbour)
+    return sorted(distance, key=lambda n: (distance[n], -G_micro.degree(n), str(n)))
+
+
+def page_count(n_nodes: int, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    return max(1, math.ceil(n_nodes / page_size))
+
+
+def micro_page(G_micro: nx.DiGraph, ranking: list, page: int = 0, page_size: int = DEFAULT_PAGE_SIZE,
+               focus=None) -> nx.DiGraph:
+    """Subgrafo induzido pelas entidades da página `page` (base 0) do ranking.
+
+    Cada página tem no máximo `page_size` entidades (mais o foco), então o custo de montar e
+    desenhar uma página não cresce com o tamanho do tópico. A entidade em `focus` entra em
+    todas as páginas, para que as arestas dela com a página continuem visíveis.
+    """
+    nodes = ranking[page * page_size:(page + 1) * page_size]
+    if focus is not None and focus in G_micro and focus not in nodes:
+        nodes = [focus] + nodes
+    return G_micro.subgraph(nodes).copy()
@@ -0,0 +1,252 @@
+import hashlib
+import json
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+SCORE_CHUNK_SIZE = 1024
+# Limite de elementos (consultas x candidatos x dimensões) montados de uma vez na busca IVF.
+PROBE_CHUNK_ELEMENTS = 1 << 24
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+    norms[norms == 0] = 1.0
+    return matrix / norms[:, np.newaxis]
+
+
+def _top_k_rows(sims: np.ndarray, ids: np.ndarray, k: int):
+    """Os k maiores scores de cada linha de `sims`, empates resolvidos pelo menor `ids`.
+
+    O `argpartition` escolhe um membro qualquer de um grupo empatado; por isso entram
+    todos os candidatos com score igual ao k-ésimo antes da ordenação final.
+    """
+    n = sims.shape[1]
+    if k < n:
+        kth = np.partition(sims, n - k, axis=1)[:, n - k, np.newaxis]
+        keep = sims >= kth
+        width = int(keep.sum(axis=1).max())
+        # Ordenação estável de booleanos: os candidatos mantidos vêm primeiro, na ordem das colunas.
+        part = np.argsort(~keep, axis=1, kind='stable')[:, :width]
+    else:
+        part = np.broadcast_to(np.arange(n), sims.shape)
+    part_ids = np.take_along_axis(np.broadcast_to(ids, sims.shape), part, axis=1)
+    part_scores = np.take_along_axis(sims, part, axis=1)
+    order = np.lexsort((part_ids, -part_scores), axis=1)[:, :k]
+    return np.take_along_axis(part_ids, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def top_k_parents(query_embeddings, candidate_embeddings, k: int = 1, chunk_size: int = SCORE_CHUNK_SIZE):
+    """Retorna (índices, scores) dos k candidatos mais similares a cada consulta.
+
+    Os scores são a similaridade de cosseno; empates são resolvidos pelo menor índice,
+    como no `np.argmax`.
+    """
+    queries = normalize_rows(query_embeddings)
+    candidates = normalize_rows(candidate_embeddings)
+    k = min(k, candidates.shape[0])
+
+    all_idx = np.empty((queries.shape[0], k), dtype=np.int64)
+    all_scores = np.empty((queries.shape[0], k), dtype=np.float32)
+
+    for start in range(0, queries.shape[0], chunk_size):
+        sims = queries[start:start + chunk_size] @ candidates.T
+        idx, scores = _top_k_rows(sims, np.arange(sims.shape[1]), k)
+        all_idx[start:start + chunk_size] = idx
+        all_scores[start:start + chunk_size] = scores
+
+    return all_idx, all_scores
+
+
+class ExactIndex:
+    """Busca exata (força bruta) por similaridade de cosseno."""
+
+    backend = "exact"
+
+    def __init__(self, names, vectors):
+        self.names = list(names)
+        self.vectors = normalize_rows(vectors)
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, queries, k: int = 1):
+        return top_k_parents(queries, self.vectors, k=k)
+
+    def _arrays(self) -> dict:
+        return {}
+
+    def _load_arrays(self, arrays):
+        pass
+
+
+class IVFIndex(ExactIndex):
+    """Índice aproximado IVF: k-means esférico em NumPy + busca exata nas `nprobe` listas mais próximas.
+
+    `nprobe` é o controle de recall x latência: com `nprobe == n_lists` o resultado é o
+    mesmo da busca exata.
+    """
+
+    backend = "ivf"
+
+    def __init__(self, names, vectors, n_lists: int = None, nprobe: int = 8, n_iter: int = 20, seed: int = 0):
+        super().__init__(names, vectors)
+        self.nprobe = nprobe
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(self.names))))
+        self.n_lists = min(n_lists, max(1, len(self.names)))
+        self.centroids = None
+        self.assignments = None
+        if len(self.names):
+            self._train(n_iter, seed)
+
+    def _train(self, n_iter: int, seed: int):
+        rng = np.random.default_rng(seed)
+        init = rng.choice(len(self.vectors), size=self.n_lists, replace=False)
+        centroids = self.vectors[init].copy()
+        for _ in range(n_iter):
+            assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+            for c in range(self.n_lists):
+                members = self.vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = normalize_rows(centroids)
+        self.centroids = centroids
+        self.assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+        self._build_lists()
+
+    def _build_lists(self):
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.n_lists + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.n_lists)]
+        # Listas completadas com -1 até o tamanho da maior, para sondar várias consultas de uma vez.
+        width = max(1, max(len(members) for members in self._lists))
+        self._padded_lists = np.full((self.n_lists, width), -1, dtype=np.int64)
+        for c, members in enumerate(self._lists):
+            self._padded_lists[c, :len(members)] = members
+
+    def search(self, queries, k: int = 1):
+        queries = normalize_rows(queries)
+        nprobe = min(self.nprobe, self.n_lists)
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1, kind='stable')[:, :nprobe]
+
+        all_idx = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        width = nprobe * self._padded_lists.shape[1]
+        found = min(k, width)
+        chunk_size = max(1, PROBE_CHUNK_ELEMENTS // (width * self.vectors.shape[1]))
+
+        for start in range(0, len(queries), chunk_size):
+            stop = start + chunk_size
+            candidates = self._padded_lists[probes[start:stop]].reshape(-1, width)
+            sims = np.einsum('qd,qcd->qc', queries[start:stop], self.vectors[candidates])
+            sims[candidates < 0] = -np.inf
+            # Empates vão para o menor índice, como na busca exata; o padding (-inf) fica por último.
+            idx, scores = _top_k_rows(sims, candidates, found)
+            all_idx[start:stop, :found] = idx
+            all_scores[start:stop, :found] = scores
+
+        return all_idx, all_scores
+
+    def _arrays(self) -> dict:
+        return {"centroids": self.centroids, "assignments": self.assignments}
+
+    def _load_arrays(self, arrays):
+        self.centroids = arrays["centroids"]
+        self.assignments = arrays["assignments"]
+        self.n_lists = len(self.centroids)
+        self._build_lists()
+
+
+BACKENDS = {"exact": ExactIndex, "ivf": IVFIndex}
+
+
+def get_cnpq_candidates(G: nx.DiGraph, scope: str = "leaves") -> list:
+    """Nós do CNPq que podem receber tópicos: só as folhas ou todos os quatro níveis."""
+    if scope == "leaves":
+        return [n for n in G.nodes()
+                if G.nodes[n].get('origin') == 'CNPQ' and G.out_degree(n) == 0]
+    if scope == "all":
+        return [n for n in G.nodes()
+                if G.nodes[n].get('origin') == 'CNPQ' and G.nodes[n].get('layer', 0) >= 1]
+    raise ValueError(f"Escopo desconhecido: {scope}")
+
+
+def file_digest(path) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def index_path_for(base_graph_path, scope: str, backend: str) -> Path:
+    base_graph_path = Path(base_graph_path)
+    return base_graph_path.with_name(f"{base_graph_path.stem}.{scope}.{backend}.npz")
+
+
+def save_index(index: ExactIndex, path, meta: dict):
+    meta = dict(meta, backend=index.backend, nprobe=getattr(index, "nprobe", None))
+    tmp_path = Path(path).with_suffix(".tmp.npz")
+    np.savez(
+        tmp_path,
+        names=np.array(index.names, dtype=str),
+        vectors=index.vectors,
+        meta=np.array(json.dumps(meta)),
+        **index._arrays()
+    )
+    tmp_path.replace(path)
+
+
+def load_index(path):
+    """Devolve (índice, metadados) de um arquivo salvo por `save_index`."""
+    with np.load(path, allow_pickle=False) as arrays:
+        meta = json.loads(str(arrays["meta"]))
+        cls = BACKENDS[meta["backend"]]
+        index = cls.__new__(cls)
+        index.names = arrays["names"].tolist()
+        index.vectors = arrays["vectors"]
+        if meta.get("nprobe") is not None:
+            index.nprobe = meta["nprobe"]
+        index._load_arrays(arrays)
+    return index, meta
+
+
+def _model_key(model):
+    """Modelo + backend dos vetores (ver `CachedEncoder.namespace`), para não misturar int8 e fp32."""
+    return getattr(model, "namespace", getattr(model, "model_name", None))
+
+
+def load_or_build_cnpq_index(G: nx.DiGraph, model, base_graph_path, scope: str = "leaves",
+                             backend: str = "exact", batch_size: int = 64, **backend_kwargs):
+    """Carrega o índice vetorial salvo ao lado do grafo base, reconstruindo-o se o grafo mudou.
+
+    Os parâmetros de construção (`n_lists`, `n_iter`, `seed`) fazem parte da chave do índice
+    salvo; `nprobe` só afeta a busca e é aplicado ao índice carregado.
+    """
+    path = index_path_for(base_graph_path, scope, backend)
+    base_digest = file_digest(base_graph_path)
+    build_params = {k: v for k, v in backend_kwargs.items() if k != "nprobe"}
+
+    if path.exists():
+        index, meta = load_index(path)
+        if (meta.get("base_digest") == base_digest
+                and meta.get("model") == _model_key(model)
+                and meta.get("build_params", {}) == build_params):
+            if "nprobe" in backend_kwargs:
+                index.nprobe = backend_kwargs["nprobe"]
+            print(f"Índice vetorial '{path.name}' reaproveitado ({len(index)} nós).")
+            return index
+
+    names = get_cnpq_candidates(G, scope)
+    print(f"Construindo índice '{backend}' para {len(names)} nós do CNPq (escopo: {scope})...")
+    index = BACKENDS[backend](names, model.encode(names, batch_size=batch_size), **backend_kwargs)
+    save_index(index, path, {
+        "base_digest": base_digest,
+        "model": _model_key(model),
+        "scope": scope,
+        "build_params": build_params,
+    })
+    return index
@@ -0,0 +1,184 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src import pipeline
+from src.etl.curriculos_loader import iter_chunks
+from src.etl.topic_store import TopicStore
+from src.graph.graph_format import preferred_path, read_graph
+from src.graph.graph_versions import publish_graph
+
+REFIT_QUEUE_PATH = pipeline.REFIT_QUEUE_PATH
+INGESTED_PATH = pipeline.INGESTED_PATH
+# Quantidade de documentos sem tópico acumulados a partir da qual vale reajustar o BERTopic.
+REFIT_THRESHOLD = 50
+
+
+def _normalize(doc) -> str:
+    return " ".join(str(doc).split())
+
+
+def load_new_documents(caminho) -> list:
+    """Documentos válidos de um CSV/Parquet no mesmo formato do `dataset_bertopic.csv`."""
+    docs = []
+    for chunk in iter_chunks(caminho):
+        docs.extend(chunk['content'].tolist())
+    return docs
+
+
+def flag_for_refit(docs: list, path: Path = REFIT_QUEUE_PATH) -> int:
+    """Registra documentos que o modelo atual não encaixa em nenhum tópico (outliers).
+
+    Devolve quantos documentos estão na fila desde o último reajuste completo.
+    """
+    from src.graph.micro_graph_extractor import document_fingerprint
+
+    if docs:
+        ingested_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        with open(path, 'a', encoding='utf-8') as f:
+            for doc in docs:
+                f.write(json.dumps({
+                    "fingerprint": document_fingerprint(doc),
+                    "document": doc,
+                    "ingested_at": ingested_at,
+                }, ensure_ascii=False) + "\n")
+    if not path.exists():
+        return 0
+    with open(path, 'r', encoding='utf-8') as f:
+        return sum(1 for _ in f)
+
+
+def record_ingested(docs: list, topics: list, path: Path = INGESTED_PATH):
+    """Guarda os documentos ingeridos fora do dataset; o próximo ajuste completo os inclui."""
+    from src.graph.micro_graph_extractor import document_fingerprint
+
+    ingested_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(path, 'a', encoding='utf-8') as f:
+        for doc, topic in zip(docs, topics):
+            f.write(json.dumps({
+                "fingerprint": document_fingerprint(doc),
+                "document": doc,
+                "topic": topic,
+                "ingested_at": ingested_at,
+            }, ensure_ascii=False) + "\n")
+
+
+def update_final_graph(topic_ids, store: TopicStore, scope: str = "leaves", backend: str = "exact"):
+    """Atualiza no grafo final apenas os nós LATTES dos tópicos afetados.
+
+    Tópicos rotulados que ainda não estão no grafo são enxertados com o mesmo índice do
+    `graph_combiner`; os demais só têm a contagem de documentos atualizada.
+    """
+    from src.etl.embedding_cache import CachedEncoder
+    from src.graph.graph_combiner import graft_lattes_topics
+    from src.graph.micro_view import write_topic_manifest
+    from src.graph.vector_index import load_or_build_cnpq_index
+
+    G = read_graph(preferred_path(pipeline.FINAL_GRAPH_PATH))
+    rows = store.read_labeled_topics(topics=topic_ids)
+
+    sem_rotulo = sorted(set(topic_ids) - set(rows['Topic']))
+    if sem_rotulo:
+        print(f"Aviso: tópicos sem rótulo do LLM, ignorados no grafo final: {sem_rotulo}")
+
+    novos = rows[~rows['LLM_Label'].apply(G.has_node)]
+    if len(novos):
+        print(f"Enxertando {len(novos)} tópicos que ainda não estavam no grafo final...")
+        model = CachedEncoder()
+        G_base = read_graph(preferred_path(pipeline.BASE_GRAPH_PATH))
+        index = load_or_build_cnpq_index(G_base, model, pipeline.BASE_GRAPH_PATH, scope=scope, backend=backend)
+        graft_lattes_topics(G, novos, model=model, index=index)
+
+    counts = store.topic_counts()
+    for topic_id, label in zip(rows['Topic'], rows['LLM_Label']):
+        if G.has_node(label):
+            G.nodes[label]['doc_count'] = int(counts.get(topic_id, 0))
+
+    publish_graph(G, pipeline.FINAL_GRAPH_PATH)
+    write_topic_manifest(G)
+    print(f"Grafo final atualizado: {len(rows)} nós LATTES.")
+
+
+def ingest(caminho, update_graph: bool = True, max_workers: int = 4, chain=None) -> dict:
+    """Incorpora currículos novos sem refazer o pipeline.
+
+    Os documentos são atribuídos aos tópicos existentes com o modelo BERTopic salvo,
+    acrescentados ao mapeamento do `TopicStore` como uma parte nova, e só os micro-grafos e nós LATTES dos
+    tópicos afetados são refeitos. Documentos sem tópico vão para a fila de reajuste. Todos
+    ficam em `ingested_documents.jsonl`, lido pela etapa `topics` no próximo ajuste completo.
+    """
+    from src.etl import topic_modeling
+    from src.graph import micro_graph_extractor
+
+    pipeline.adopt_legacy_csv()
+    store = TopicStore(pipeline.TOPIC_STORE_DIR)
+    existentes = {_normalize(d) for d in store.documents()}
+
+    docs = []
+    for doc in load_new_documents(caminho):
+        chave = _normalize(doc)
+        if chave not in existentes:
+            existentes.add(chave)
+            docs.append(doc)
+    if not docs:
+        print("Nenhum documento novo para ingerir.")
+        return {"documents": 0, "topics": [], "outliers": 0, "refit_pending": flag_for_refit([])}
+
+    if not pipeline.TOPIC_MODEL_PATH.exists():
+        raise FileNotFoundError(
+            f"Modelo BERTopic não encontrado em {pipeline.TOPIC_MODEL_PATH}; ele é salvo no próximo "
+            "ajuste completo (python -m src.pipeline --force topics)."
+        )
+
+    print(f"Atribuindo {len(docs)} documentos novos aos tópicos existentes...")
+    topics, _ = topic_modeling.atribuir_topicos(docs)
+    topics = [int(t) for t in topics]
+
+    state = pipeline.PipelineState()
+    micro_stage = pipeline.STAGES_BY_NAME["micro_graphs"]
+    micro_em_dia = pipeline.stale_reason(micro_stage, state) is None
+
+    store.append_mapping(docs, topics)
+    record_ingested(docs, topics)
+    outliers = [d for d, t in zip(docs, topics) if t == -1]
+    pendentes = flag_for_refit(outliers)
+
+    affected = sorted(set(topics) - {-1})
+    print(f"Tópicos afetados: {affected}")
+    if affected:
+        input_hashes = state.input_hashes(micro_stage)
+        inicio = time.perf_counter()
+        incompletos = micro_graph_extractor.build_micro_graphs(max_workers=max_workers, chain=chain, topics=affected)
+        # Os micro-grafos que dependiam do mapeamento antigo continuam válidos, então a etapa
+        # segue em dia para o pipeline se já estava antes da ingestão (e nenhum tópico falhou).
+        if micro_em_dia and not incompletos:
+            state.record(micro_stage, input_hashes, time.perf_counter() - inicio)
+
+    if update_graph and affected:
+        update_final_graph(affected, store)
+
+    if outliers:
+        print(f"{len(outliers)} documentos sem tópico foram para {REFIT_QUEUE_PATH.name} ({pendentes} pendentes).")
+    if pendentes >= REFIT_THRESHOLD:
+        print("Aviso: muitos documentos fora dos tópicos atuais; agende um reajuste completo "
+              "(python -m src.pipeline --force topics).")
+
+    return {"documents": len(docs), "topics": affected, "outliers": len(outliers), "refit_pending": pendentes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingere currículos novos nos tópicos e grafos existentes.")
+    parser.add_argument("caminho", help="CSV ou Parquet no formato do dataset_bertopic.csv.")
+    parser.add_argument("--sem-grafo", action="store_true", help="Não atualiza o grafo final.")
+    parser.add_argument("--workers", type=int, default=4, help="Tópicos processados em paralelo.")
+    args = parser.parse_args()
+    ingest(args.caminho, update_graph=not args.sem_grafo, max_workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import contextlib
+import contextvars
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+
+TRACE_PATH = ROOT_PATH / "data" / "processed" / "pipeline_trace.jsonl"
+TRACE_READ_BLOCK = 1 << 16
+PROFILES_DIR = ROOT_PATH / "data" / "processed" / "profiles"
+PROFILE_ENABLED = os.environ.get("TAXONOMIA_PROFILE", "0") == "1"
+LATENCY_PERCENTILES = (50, 90, 99)
+RSS_SAMPLE_INTERVAL = 0.1
+
+
+def _rss_mb() -> float:
+    """RSS atual do processo (Linux); cai para o pico quando /proc não está disponível."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class _RssSampler:
+    """Amostra o RSS numa thread durante a etapa; o `ru_maxrss` é o pico da vida toda do
+    processo e repetiria o valor da etapa mais pesada em todas as seguintes."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = _rss_mb()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, _rss_mb())
+
+    def stop(self) -> float:
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_mb())
+        return self.peak
+
+
+class StageMetrics:
+    """Medidas acumuladas durante uma etapa: contadores, trechos cronometrados, chamadas ao LLM
+    e estatísticas de cache. Pode ser alimentada por várias threads da mesma etapa."""
+
+    def __init__(self, run_id: str, stage: str):
+        self.run_id = run_id
+        self.stage = stage
+        self._lock = threading.Lock()
+        self.counters: dict[str, int] = {}
+        self.spans: dict[str, dict] = {}
+        self.llm_latencies: list[float] = []
+        self.llm_tokens = {"input": 0, "output": 0}
+        self.caches: dict[str, dict] = {}
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_span(self, name: str, seconds: float):
+        with self._lock:
+            span = self.spans.setdefault(name, {"calls": 0, "seconds": 0.0})
+            span["calls"] += 1
+            span["seconds"] += seconds
+
+    def add_llm_call(self, seconds: float, input_tokens: int = 0, output_tokens: int = 0):
+        with self._lock:
+            self.llm_latencies.append(seconds)
+            self.llm_tokens["input"] += input_tokens
+            self.llm_tokens["output"] += output_tokens
+
+    def set_cache(self, name: str, stats: dict):
+        with self._lock:
+            self.caches[name] = dict(stats)
+
+    def summary(self) -> dict:
+        with self._lock:
+            llm = {"calls": len(self.llm_latencies), "tokens": dict(self.llm_tokens)}
+            if self.llm_latencies:
+                values = np.percentile(self.llm_latencies, LATENCY_PERCENTILES)
+                llm.update({f"p{p}_s": round(float(v), 4) for p, v in zip(LATENCY_PERCENTILES, values)})
+            caches = {}
+            for name, stats in self.caches.items():
+                hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+                caches[name] = dict(stats, hit_rate=round(hits / (hits + misses), 4) if hits + misses else None)
+            return {
+                "counters": dict(self.counters),
+                "spans": {k: {"calls": v["calls"], "seconds": round(v["seconds"], 4)} for k, v in self.spans.items()},
+                "llm": llm,
+                "caches": caches,
+            }
+
+
+_LOCK = threading.Lock()
+# Por contexto, e não global: sessões do Streamlit e a API rodam em outras threads enquanto o
+# pipeline executa em segundo plano, e não devem contar para a etapa em andamento.
+_ACTIVE: contextvars.ContextVar = contextvars.ContextVar("taxonomia_stage_metrics", default=None)
+
+
+def _active() -> StageMetrics:
+    return _ACTIVE.get()
+
+
+def bind(fn):
+    """Liga `fn` à etapa em andamento, para rodar em threads de um pool (que não herdam o contexto)."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+
+
+def _write(record: dict, path: Path = TRACE_PATH):
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _LOCK:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+@contextlib.contextmanager
+def stage(run_id: str, name: str, profile: bool = None, trace_path: Path = TRACE_PATH):
+    """Mede uma etapa do pipeline e grava um registro no trace JSONL ao final.
+
+    Tempo de parede e de CPU (do processo inteiro), RSS atual e o pico amostrado durante a
+    etapa, e tudo o que os módulos reportarem via `count`, `span`, `record_llm_call` e
+    `record_cache` no contexto da etapa (threads de pool entram com `bind`).
+    Com `profile` (ou `TAXONOMIA_PROFILE=1`), a thread da etapa também roda sob o cProfile e o
+    dump vai para `PROFILES_DIR`.
+    """
+    metrics = StageMetrics(run_id, name)
+    profile = PROFILE_ENABLED if profile is None else profile
+    profiler = cProfile.Profile() if profile else None
+
+    token = _ACTIVE.set(metrics)
+    rss_inicio = _rss_mb()
+    sampler = _RssSampler()
+    cpu_inicio = time.process_time()
+    inicio = time.perf_counter()
+    status = "ok"
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield metrics
+    except BaseException as e:
+        status = f"erro: {type(e).__name__}: {e}"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall = time.perf_counter() - inicio
+        cpu = time.process_time() - cpu_inicio
+        peak = sampler.stop()
+        _ACTIVE.reset(token)
+
+        record = {
+            "kind": "stage",
+            "run_id": run_id,
+            "stage": name,
+            "status": status,
+            "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "rss_start_mb": round(rss_inicio, 1),
+            "rss_end_mb": round(_rss_mb(), 1),
+            "peak_rss_mb": round(peak, 1),
+            **metrics.summary(),
+        }
+        if profiler is not None:
+            PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+            profile_path = PROFILES_DIR / f"{run_id}_{name}.prof"
+            profiler.dump_stats(str(profile_path))
+            record["profile"] = str(profile_path.relative_to(ROOT_PATH))
+        _write(record, trace_path)
+
+
+def record_run(run_id: str, targets, executed: list, seconds: float, error: str = None, trace_path: Path = TRACE_PATH):
+    _write({
+        "kind": "run",
+        "run_id": run_id,
+        "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "targets": list(targets or []),
+        "executed": executed,
+        "wall_s": round(seconds, 4),
+        "error": error,
+    }, trace_path)
+
+
+def count(name: str, n: int = 1):
+    """Soma `n` ao contador da etapa em andamento (sem efeito fora do pipeline)."""
+    metrics = _active()
+    if metrics is not None:
+        metrics.count(name, n)
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Cronometra um trecho (encode, busca, E/S de grafos...) dentro da etapa em andamento."""
+    metrics = _active()
+    if metrics is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_span(name, time.perf_counter() - inicio)
+
+
+def record_llm_call(seconds: float, input_tokens: int = 0, output_tokens: int = 0):
+    metrics = _active()
+    if metrics is not None:
+        metrics.add_llm_call(seconds, input_tokens, output_tokens)
+
+
+def record_cache(name: str, stats: dict):
+    metrics = _active()
+    if metrics is not None:
+        metrics.set_cache(name, stats)
+
+
+def read_trace(path: Path = TRACE_PATH) -> list:
+    if not path.exists():
+        return []
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def _reversed_lines(path: Path, block: int = TRACE_READ_BLOCK):
+    """Linhas do arquivo da última para a primeira, lendo blocos a partir do fim."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        while position > 0:
+            step = min(block, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + tail).split(b"\n")
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                yield line.decode('utf-8', errors='replace')
+        yield tail.decode('utf-8', errors='replace')
+
+
+def _run_started_at(run: dict) -> str:
+    """Início da execução no formato de `finished_at`, tirado do `run_id` (ver `new_run_id`)."""
+    try:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.strptime(run["run_id"][:15], "%Y%m%d-%H%M%S"))
+    except (KeyError, ValueError):
+        return ""
+
+
+_LAST_RUN_CACHE = {}
+
+
+def last_run(path: Path = TRACE_PATH):
+    """(registro da execução, registros das etapas) da última execução completa do pipeline.
+
+    O trace só cresce: ele é lido de trás para frente, só até o início dessa execução, e o
+    resultado fica guardado enquanto o arquivo não muda.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None, []
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _LOCK:
+        if key in _LAST_RUN_CACHE:
+            return _LAST_RUN_CACHE[key]
+
+    run = None
+    inicio = ""
+    stages = []
+    for line in _reversed_lines(path):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if run is None:
+            if record.get("kind") == "run":
+                run = record
+                inicio = _run_started_at(run)
+            continue
+        # Registros terminados antes do início da execução não podem ser etapas dela.
+        if record.get("finished_at", "") < inicio:
+            break
+        if record.get("kind") == "stage" and record.get("run_id") == run["run_id"]:
+            stages.append(record)
+    result = (run, stages[::-1]) if run is not None else (None, [])
+
+    with _LOCK:
+        _LAST_RUN_CACHE.clear()
+        _LAST_RUN_CACHE[key] = result
+    return result
@@ -0,0 +1,433 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+from src import metrics
+
+DATA_PATH = ROOT_PATH / "data"
+PDF_PATH = DATA_PATH / "pdfs" / "cnpq_taxonomy.pdf"
+TAXONOMY_PATH = DATA_PATH / "taxonomies" / "cnpq_taxonomy.json"
+DATASET_PATH = DATA_PATH / "curriculos" / "dataset_bertopic.csv"
+DATASET_PARQUET_PATH = DATASET_PATH.with_suffix(".parquet")
+BASE_GRAPH_PATH = DATA_PATH / "processed" / "grafo_base.gpickle"
+TOPIC_STORE_DIR = DATA_PATH / "processed" / "topic_store"
+TOPICS_PATH = TOPIC_STORE_DIR / "topics.parquet"
+MAPPING_PATH = TOPIC_STORE_DIR / "manifest.json"
+LABELS_PATH = TOPIC_STORE_DIR / "labels.parquet"
+TOPIC_AREAS_PATH = TOPIC_STORE_DIR / "topic_areas.parquet"
+TOPIC_MODEL_PATH = DATA_PATH / "processed" / "bertopic_model"
+REFIT_QUEUE_PATH = DATA_PATH / "processed" / "refit_queue.jsonl"
+INGESTED_PATH = DATA_PATH / "processed" / "ingested_documents.jsonl"
+FINAL_GRAPH_PATH = DATA_PATH / "processed" / "grafo_final.gpickle"
+MICRO_GRAPHS_DIR = DATA_PATH / "processed" / "micro_grafos"
+LAYOUT_PATH = DATA_PATH / "processed" / "grafo_final.layouts.json"
+STATE_PATH = DATA_PATH / "processed" / "pipeline_state.json"
+
+# CSVs trocados entre as etapas antes do `TopicStore`; adotados quando o store ainda não existe.
+LEGACY_TOPICS_CSV = DATA_PATH / "processed" / "topicos_gerados.csv"
+LEGACY_MAPPING_CSV = DATA_PATH / "processed" / "doc_topic_mapping.csv"
+LEGACY_LABELS_CSV = DATA_PATH / "processed" / "topicos_nomeados_llm.csv"
+
+
+def _run_pdf_to_json():
+    from src.etl import cnpq_extractor
+    cnpq_extractor.parse_pdf_to_json()
+
+def _run_base_graph():
+    from src.graph import graph_populate
+    graph_populate.build_and_save_cnpq()
+
+def read_jsonl(path: Path) -> list:
+    """Entradas de um JSONL só de acréscimo; uma última linha truncada é ignorada."""
+    if not path.exists():
+        return []
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+def _line_count(path: Path) -> int:
+    if not path.exists():
+        return 0
+    with open(path, 'r', encoding='utf-8') as f:
+        return sum(1 for _ in f)
+
+def _drop_queue_head(path: Path, count: int):
+    """Remove as `count` primeiras linhas da fila, mantendo o que foi acrescentado depois."""
+    if not path.exists():
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        remaining = f.readlines()[count:]
+    if not remaining:
+        path.unlink(missing_ok=True)
+        return
+    tmp_path = path.with_suffix(".jsonl.tmp")
+    tmp_path.write_text("".join(remaining), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+def _run_topics():
+    from src.etl import topic_modeling
+    # Os documentos da ingestão incremental (inclusive os sem tópico, na fila de reajuste) não
+    # estão no dataset: entram no ajuste para não sumirem quando o mapeamento é substituído.
+    queued = _line_count(REFIT_QUEUE_PATH)
+    extras = [e["document"] for e in read_jsonl(INGESTED_PATH) + read_jsonl(REFIT_QUEUE_PATH)]
+    topic_modeling.run_topic_modeling(DATASET_PATH, TOPIC_STORE_DIR, TOPIC_MODEL_PATH, extra_docs=extras)
+    # Só os documentos que participaram do ajuste saem da fila.
+    _drop_queue_head(REFIT_QUEUE_PATH, queued)
+
+def _run_labels():
+    from src.etl import topic_labeler_llm
+    topic_labeler_llm.processar_topicos(TOPIC_STORE_DIR)
+
+def _run_final_graph():
+    from src.graph import graph_combiner
+    graph_combiner.run_grafting()
+
+def _run_layout():
+    from src.graph import graph_layout
+    graph_layout.run_layout()
+
+def _run_micro_graphs():
+    from src.graph import micro_graph_extractor
+    incompletos = micro_graph_extractor.build_micro_graphs()
+    if incompletos:
+        # A etapa não é registrada como concluída; a próxima execução refaz só esses tópicos.
+        raise RuntimeError(f"Micro-grafos incompletos para os tópicos {incompletos}")
+
+
+class Stage:
+    """Etapa do pipeline. `optional_outputs` são produzidos pela etapa, mas a falta deles não
+    a torna desatualizada (artefatos acrescentados depois que checkouts existentes já rodaram).
+    """
+
+    def __init__(self, name: str, inputs: list, outputs: list, run, optional_outputs: list = ()):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.optional_outputs = list(optional_outputs)
+        self.run = run
+
+
+STAGES = [
+    Stage("pdf_to_json", [PDF_PATH], [TAXONOMY_PATH], _run_pdf_to_json),
+    Stage("base_graph", [TAXONOMY_PATH], [BASE_GRAPH_PATH], _run_base_graph),
+    # Sem o modelo salvo só a ingestão incremental fica indisponível; exigi-lo refaria o BERTopic
+    # (renumerando tópicos, rótulos e enxertos) em todo checkout anterior a ele. A cópia Parquet
+    # do dataset é gerada pela própria etapa, antes do ajuste, e lida em blocos.
+    Stage("topics", [DATASET_PATH], [TOPICS_PATH, MAPPING_PATH], _run_topics,
+          optional_outputs=[TOPIC_MODEL_PATH, DATASET_PARQUET_PATH]),
+    Stage("labels", [TOPICS_PATH], [LABELS_PATH, TOPIC_AREAS_PATH], _run_labels),
+    Stage("final_graph", [LABELS_PATH, TOPIC_AREAS_PATH, BASE_GRAPH_PATH], [FINAL_GRAPH_PATH], _run_final_graph),
+    Stage("layout", [FINAL_GRAPH_PATH], [LAYOUT_PATH], _run_layout),
+    Stage("micro_graphs", [MAPPING_PATH], [MICRO_GRAPHS_DIR], _run_micro_graphs),
+]
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+
+
+def _rel(path: Path) -> str:
+    return str(path.relative_to(ROOT_PATH))
+
+
+class PipelineState:
+    """Hashes das entradas usadas na última execução bem-sucedida de cada etapa.
+
+    O hash de conteúdo de cada arquivo é reaproveitado enquanto tamanho e mtime não
+    mudam, então verificar o estado do pipeline custa apenas um `stat` por arquivo.
+    """
+
+    def __init__(self, path: Path = STATE_PATH):
+        self.path = path
+        self._data = {"stages": {}, "files": {}}
+        if path.exists():
+            self._data = json.loads(path.read_text(encoding='utf-8'))
+
+    def fingerprint(self, path: Path):
+        if not path.exists():
+            return None
+        stat = path.stat()
+        known = self._data["files"].get(_rel(path))
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha1"]
+
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._data["files"][_rel(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest}
+        return digest
+
+    def input_hashes(self, stage: Stage) -> dict:
+        return {_rel(p): self.fingerprint(p) for p in stage.inputs}
+
+    def recorded(self, stage: Stage):
+        return self._data["stages"].get(stage.name)
+
+    def record(self, stage: Stage, input_hashes: dict, seconds: float):
+        self._data["stages"][stage.name] = {
+            "inputs": input_hashes,
+            "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seconds": round(seconds, 3),
+        }
+        self.save()
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(self._data, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+
+def stale_reason(stage: Stage, state: PipelineState, adopt: bool = True, assumed=frozenset()):
+    """Motivo para a etapa precisar rodar, ou None se ela está em dia.
+
+    Com `adopt=False` nada é gravado: artefatos sem registro só são considerados em dia.
+    `assumed` são arquivos que ainda não existem mas seriam criados sem mudar o registro das
+    etapas (a conversão dos CSVs antigos): contam como presentes e inalterados.
+    """
+    def exists(p):
+        return p in assumed or p.exists()
+
+    if not all(exists(p) for p in stage.outputs):
+        return "saída ausente"
+    missing = [_rel(p) for p in stage.inputs if not exists(p)]
+    if missing:
+        return f"entrada ausente: {', '.join(missing)}"
+
+    recorded = state.recorded(stage)
+    if recorded is None:
+        # Artefatos anteriores ao pipeline: assume que estão em dia com as entradas atuais.
+        if adopt:
+            state.record(stage, state.input_hashes(stage), 0.0)
+        return None
+    changed = [_rel(p) for p in stage.inputs
+               if p not in assumed and recorded["inputs"].get(_rel(p)) != state.fingerprint(p)]
+    if changed:
+        return f"entrada alterada: {', '.join(changed)}"
+    return None
+
+
+def legacy_csv_pending() -> bool:
+    """Há CSVs antigos de tópicos ainda não convertidos para o `TopicStore`."""
+    legacy = [LEGACY_TOPICS_CSV, LEGACY_LABELS_CSV, LEGACY_MAPPING_CSV]
+    return not TOPIC_STORE_DIR.exists() and any(p.exists() for p in legacy)
+
+
+def legacy_adoption_outputs() -> set:
+    """Arquivos do `TopicStore` que `adopt_legacy_csv` criaria a partir dos CSVs antigos."""
+    if not legacy_csv_pending():
+        return set()
+    outputs = set()
+    if LEGACY_TOPICS_CSV.exists():
+        outputs.add(TOPICS_PATH)
+    if LEGACY_LABELS_CSV.exists():
+        outputs.update([TOPICS_PATH, LABELS_PATH, TOPIC_AREAS_PATH])
+    if LEGACY_MAPPING_CSV.exists():
+        outputs.add(MAPPING_PATH)
+    return outputs
+
+
+def adopt_legacy_csv(state: PipelineState = None) -> bool:
+    """Converte os CSVs de tópicos, rótulos e mapeamento para o `TopicStore` se ele ainda não existe.
+
+    Etapas registradas com os CSVs como entrada passam a apontar para os arquivos do store
+    (as demais entradas mantêm o hash registrado), então a conversão sozinha não faz o
+    pipeline refazer a rotulagem nem os grafos.
+    """
+    if not legacy_csv_pending():
+        return False
+    legacy = [LEGACY_TOPICS_CSV, LEGACY_LABELS_CSV, LEGACY_MAPPING_CSV]
+
+    from src.etl.topic_store import TopicStore
+    print("[pipeline] convertendo os CSVs de tópicos para o TopicStore...")
+    # Convertido numa pasta temporária e renomeado no fim: uma conversão interrompida não
+    # deixa um store pela metade, e a próxima chamada tenta de novo.
+    for leftover in TOPIC_STORE_DIR.parent.glob(f"{TOPIC_STORE_DIR.name}.tmp-*"):
+        shutil.rmtree(leftover, ignore_errors=True)
+    tmp_dir = TOPIC_STORE_DIR.with_name(f"{TOPIC_STORE_DIR.name}.tmp-{os.getpid()}")
+    TopicStore(tmp_dir).migrate_from_csv(LEGACY_TOPICS_CSV, LEGACY_LABELS_CSV, LEGACY_MAPPING_CSV)
+    os.replace(tmp_dir, TOPIC_STORE_DIR)
+
+    state = state or PipelineState()
+    legacy_rel = {_rel(p) for p in legacy}
+    for stage in STAGES:
+        recorded = state.recorded(stage)
+        if recorded is not None and legacy_rel & set(recorded["inputs"]):
+            inputs = {p: recorded["inputs"].get(p, h) for p, h in state.input_hashes(stage).items()}
+            state.record(stage, inputs, recorded["seconds"])
+    return True
+
+
+def resolve_stages(targets=None, include_upstream: bool = True) -> list:
+    """Etapas necessárias para produzir os alvos, em ordem topológica."""
+    if not targets:
+        return list(STAGES)
+    wanted = {STAGES_BY_NAME[t].name for t in targets}
+    if include_upstream:
+        producers = {str(p): s for s in STAGES for p in s.outputs}
+        pending = list(wanted)
+        while pending:
+            for p in STAGES_BY_NAME[pending.pop()].inputs:
+                producer = producers.get(str(p))
+                if producer is not None and producer.name not in wanted:
+                    wanted.add(producer.name)
+                    pending.append(producer.name)
+    return [s for s in STAGES if s.name in wanted]
+
+
+def plan(targets=None, include_upstream: bool = True, force=(), dry_run: bool = False) -> list:
+    """Lista (etapa, motivo) que `run_pipeline` executaria, propagando a invalidação adiante.
+
+    Com `dry_run`, nada é gravado: nem a conversão dos CSVs antigos nem o registro de
+    artefatos anteriores ao pipeline. A conversão é simulada, tratando os arquivos do store
+    que ela criaria como presentes, para a prévia coincidir com a execução real.
+    """
+    state = PipelineState()
+    assumed = set()
+    if dry_run:
+        assumed = legacy_adoption_outputs()
+    else:
+        adopt_legacy_csv(state)
+    invalid_outputs = set()
+    planned = []
+    for stage in resolve_stages(targets, include_upstream):
+        reason = "forçado" if stage.name in force else None
+        if reason is None and any(str(p) in invalid_outputs for p in stage.inputs):
+            reason = "etapa anterior será refeita"
+        if reason is None:
+            reason = stale_reason(stage, state, adopt=not dry_run, assumed=assumed)
+        if reason is not None:
+            planned.append((stage.name, reason))
+            invalid_outputs.update(str(p) for p in stage.outputs)
+    return planned
+
+
+def run_pipeline(targets=None, include_upstream: bool = True, force=(), on_stage=None, profile: bool = None) -> list:
+    """Executa apenas as etapas desatualizadas. O estado é reavaliado após cada etapa, então
+    uma etapa cujas saídas não mudaram não invalida as seguintes.
+
+    Cada etapa executada gera um registro no trace de `metrics` (com cProfile, se `profile`).
+    """
+    state = PipelineState()
+    adopt_legacy_csv(state)
+    run_id = metrics.new_run_id()
+    executed = []
+    erro = None
+    inicio_run = time.perf_counter()
+    try:
+        for stage in resolve_stages(targets, include_upstream):
+            reason = "forçado" if stage.name in force else stale_reason(stage, state)
+            if reason is None:
+                continue
+
+            print(f"[pipeline] {stage.name}: {reason}")
+            if on_stage is not None:
+                on_stage(stage.name)
+            input_hashes = state.input_hashes(stage)
+            inicio = time.perf_counter()
+            try:
+                with metrics.stage(run_id, stage.name, profile=profile):
+                    stage.run()
+            except SystemExit as e:
+                raise RuntimeError(f"Etapa '{stage.name}' abortou (código {e.code})") from e
+            state.record(stage, input_hashes, time.perf_counter() - inicio)
+            executed.append(stage.name)
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if executed or erro:
+            metrics.record_run(run_id, targets, executed, time.perf_counter() - inicio_run, erro)
+    return executed
+
+
+class BackgroundJob:
+    """Execução do pipeline numa thread, para não bloquear a requisição do Streamlit."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.current_stage = None
+        self.executed = []
+        self.error = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def failed(self) -> bool:
+        """A última execução falhou; o erro fica guardado até um novo `start` explícito."""
+        return not self.running and self.error is not None
+
+    def start(self, targets=None, include_upstream: bool = True, force=()) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self.error = None
+            self.executed = []
+            self._thread = threading.Thread(
+                target=self._run, args=(targets, include_upstream, force), daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, targets, include_upstream, force):
+        def on_stage(name):
+            self.current_stage = name
+        try:
+            self.executed = run_pipeline(targets, include_upstream, force, on_stage=on_stage)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.current_stage = None
+
+
+_JOB = BackgroundJob()
+
+
+def get_background_job() -> BackgroundJob:
+    return _JOB
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa as etapas desatualizadas do pipeline.")
+    parser.add_argument("targets", nargs="*",
+                        help=f"Etapas alvo (padrão: todas): {', '.join(STAGES_BY_NAME)}.")
+    parser.add_argument("--only", action="store_true", help="Não inclui as etapas anteriores aos alvos.")
+    parser.add_argument("--force", nargs="*", default=[], choices=list(STAGES_BY_NAME),
+                        help="Etapas a refazer mesmo se estiverem em dia.")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra o que seria executado.")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Grava um dump do cProfile por etapa em {metrics.PROFILES_DIR.relative_to(ROOT_PATH)}.")
+    args = parser.parse_args()
+    desconhecidas = [t for t in args.targets if t not in STAGES_BY_NAME]
+    if desconhecidas:
+        parser.error(f"etapas desconhecidas: {', '.join(desconhecidas)}")
+
+    if args.dry_run and legacy_csv_pending():
+        print(" - os CSVs antigos de tópicos seriam convertidos para o TopicStore")
+    pendentes = plan(args.targets, not args.only, args.force, dry_run=args.dry_run)
+    if not pendentes:
+        print("Tudo em dia.")
+        return
+    for name, reason in pendentes:
+        print(f" - {name}: {reason}")
+    if not args.dry_run:
+        run_pipeline(args.targets, not args.only, args.force, profile=args.profile or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import pickle
+
+import networkx as nx
+
+from src.graph import entity_index
+from src.graph.entity_index import get_entity_index
+
+
+def _write_micro(directory, topic_id, edges):
+    G = nx.DiGraph()
+    for u, relation, v in edges:
+        G.add_edge(u, v, relation=relation)
+    with open(directory / f"topico_{topic_id}.gpickle", 'wb') as f:
+        pickle.dump(G, f)
+
+
+def test_get_entity_index_resyncs_after_outside_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(entity_index, "_LOADED", {"version": None, "index": None})
+    directory = tmp_path / "micro_grafos"
+    directory.mkdir()
+    path = directory / "entity_index.npz"
+    _write_micro(directory, 1, [("Deep Learning", "usa", "Redes Neurais")])
+
+    index = get_entity_index(path, directory)
+    assert index.topics_for("deep learning") == [(1, 1)]
+    saved_version = entity_index.entity_index_version(path)
+
+    # Sem mudanças nos micro-grafos o índice não é regravado.
+    assert get_entity_index(path, directory) is index
+    assert entity_index.entity_index_version(path) == saved_version
+
+    # Micro-grafos trocados por fora (ex.: git pull), sem passar por `build_micro_graphs`.
+    _write_micro(directory, 2, [("Deep Learning", "aplicado em", "Visão Computacional")])
+    (directory / "topico_1.gpickle").unlink()
+
+    index = get_entity_index(path, directory)
+    assert index.topics_for("Deep Learning") == [(2, 1)]
+    assert index.topics_for("Redes Neurais") == []
+    assert entity_index.EntityIndex.load(path).topics_for("deep learning") == [(2, 1)]
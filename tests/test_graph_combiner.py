@@ -0,0 +1,88 @@
+import hashlib
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.graph.graph_combiner import graft_lattes_topics
+
+
+class HashEncoder:
+    """Encoder determinístico com poucos vetores distintos (±1), para forçar empates exatos."""
+
+    def __init__(self, dim=3):
+        self.dim = dim
+
+    def encode(self, texts, batch_size=None, **kwargs):
+        rows = []
+        for text in texts:
+            digest = hashlib.sha1(text.encode("utf-8")).digest()
+            rows.append([1.0 if digest[i] & 1 else -1.0 for i in range(self.dim)])
+        return np.array(rows, dtype=np.float32)
+
+
+def _base_graph(n_leaves=24):
+    G = nx.DiGraph()
+    G.add_node("Raiz", origin="CNPQ", layer=1)
+    for i in range(n_leaves):
+        G.add_node(f"Folha {i}", origin="CNPQ", layer=4)
+        G.add_edge("Raiz", f"Folha {i}")
+    return G
+
+
+def _topics(n_topics=30):
+    rows = [{"Topic": -1, "LLM_Label": "Outliers", "Multi_Areas": [{"area_name": "X", "confidence": 1.0}]}]
+    for t in range(n_topics):
+        areas = [{"area_name": f"Área {(t + j) % 7}", "confidence": c} for j, c in enumerate((0.9, 0.7, 0.5))]
+        rows.append({"Topic": t, "LLM_Label": f"Tópico {t % 25}", "Multi_Areas": areas})
+    return pd.DataFrame(rows)
+
+
+def _cosine(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return a @ b.T
+
+
+def _graft_row_by_row(G, df_topics, model):
+    """O enxerto original: uma consulta por área, `np.argmax` sobre as folhas."""
+    cnpq_leaves = [n for n in G.nodes() if G.nodes[n].get('origin') == 'CNPQ' and G.out_degree(n) == 0]
+    cnpq_embeddings = model.encode(cnpq_leaves)
+    for _, row in df_topics.iterrows():
+        if row['Topic'] == -1:
+            continue
+        label = row['LLM_Label']
+        areas = row['Multi_Areas']
+        if not G.has_node(label):
+            G.add_node(label, origin="LATTES", layer=5)
+        for area in areas:
+            if area['confidence'] < 0.6:
+                continue
+            similarities = _cosine(model.encode([f"{label} ({area['area_name']})"]), cnpq_embeddings)[0]
+            best_idx = np.argmax(similarities)
+            parent_node_name = cnpq_leaves[best_idx]
+            if parent_node_name.strip().lower() == label.strip().lower():
+                continue
+            if G.has_edge(parent_node_name, label):
+                continue
+            if similarities[best_idx] > 0.4:
+                G.add_edge(parent_node_name, label, weight=float(similarities[best_idx]),
+                           context=area['area_name'])
+    return G
+
+
+def _edges(G):
+    return {(u, v): (round(d["weight"], 5), d["context"])
+            for u, v, d in G.edges(data=True) if "context" in d}
+
+
+def test_batched_graft_matches_row_by_row_with_ties():
+    model = HashEncoder()
+    df_topics = _topics()
+
+    expected = _graft_row_by_row(_base_graph(), df_topics, model)
+    actual = graft_lattes_topics(_base_graph(), df_topics, model=model)
+
+    assert _edges(expected)
+    assert _edges(actual) == _edges(expected)
+    assert set(actual.nodes()) == set(expected.nodes())
@@ -0,0 +1,62 @@
+import networkx as nx
+import numpy as np
+
+from src.graph import graph_format
+from src.graph.graph_format import CompactGraph, compact_path_for, write_graph
+
+
+def _round_trip(G, tmp_path):
+    path = tmp_path / "g.tgraph"
+    CompactGraph.from_networkx(G).save(path)
+    return CompactGraph.load(path).to_networkx()
+
+
+def _sample_graph():
+    G = nx.DiGraph(name="teste")
+    G.add_node("a", size=15, layer=1, color="#fff", flag=True, tags=["x", "y"])
+    G.add_node("b", size=0.5, layer=2, color=None)
+    G.add_node("c", size=None, micro_path="topico_1.gpickle")
+    G.add_node("d")
+    G.add_edge("a", "b", weight=1, relation="r", context=None)
+    G.add_edge("a", "c", weight=0.75)
+    G.add_edge("b", "d")
+    return G
+
+
+def test_round_trip_keeps_types_and_none(tmp_path):
+    G = _sample_graph()
+    H = _round_trip(G, tmp_path)
+
+    assert H.graph == G.graph
+    assert list(H.nodes(data=True)) == list(G.nodes(data=True))
+    assert list(H.edges(data=True)) == list(G.edges(data=True))
+    assert type(H.nodes["a"]["size"]) is int
+    assert type(H.nodes["b"]["size"]) is float
+    assert type(H.edges["a", "b"]["weight"]) is int
+    assert "context" in H.edges["a", "b"] and H.edges["a", "b"]["context"] is None
+
+
+def test_uniform_columns_stay_typed():
+    G = nx.DiGraph()
+    for i in range(5):
+        G.add_node(f"n{i}", layer=i, weight=i / 2, origin="CNPQ")
+    compact = CompactGraph.from_networkx(G)
+
+    assert compact.meta["node_columns"]["layer"]["kind"] == "int"
+    assert compact.meta["node_columns"]["weight"]["kind"] == "float"
+    assert compact.meta["node_columns"]["origin"]["kind"] == "str"
+    assert compact.arrays["node.layer.values"].dtype == np.int64
+
+
+def test_write_graph_skips_compact_copy_unless_selected(tmp_path, monkeypatch):
+    G = _sample_graph()
+    path = tmp_path / "g.gpickle"
+
+    monkeypatch.setattr(graph_format, "GRAPH_FORMAT", "pickle")
+    write_graph(G, path)
+    assert path.exists() and not compact_path_for(path).exists()
+
+    monkeypatch.setattr(graph_format, "GRAPH_FORMAT", "compact")
+    write_graph(G, path)
+    assert compact_path_for(path).exists()
+    assert graph_format.preferred_path(path) == compact_path_for(path)
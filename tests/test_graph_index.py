@@ -0,0 +1,90 @@
+import networkx as nx
+import pytest
+
+from src.graph.graph_index import ClosureIndex, get_focused_subgraph, get_tree_by_area
+
+
+def _focused_by_traversal(G, selected_categories=None):
+    """O filtro original do app: percorre o grafo com `nx.ancestors` a cada consulta."""
+    lattes_nodes = [
+        n for n, attr in G.nodes(data=True)
+        if attr.get('origin') == 'LATTES' and (not selected_categories or attr.get('Category') in selected_categories)
+    ]
+    relevant = set(lattes_nodes)
+    for node in lattes_nodes:
+        relevant.update(nx.ancestors(G, node))
+    return relevant
+
+
+def _tree_by_traversal(G, selected_areas):
+    nodes = set()
+    for node in G.nodes():
+        if node in selected_areas:
+            nodes.add(node)
+            nodes.update(nx.descendants(G, node))
+            nodes.update(nx.ancestors(G, node))
+    return nodes
+
+
+def _taxonomy():
+    G = nx.DiGraph()
+    G.add_node("CNPQ_Raiz", origin="CNPQ")
+    for a in range(3):
+        area = f"Grande Área {a}"
+        G.add_node(area, origin="CNPQ", layer=1)
+        G.add_edge("CNPQ_Raiz", area)
+        for b in range(3):
+            sub = f"Área {a}.{b}"
+            G.add_node(sub, origin="CNPQ", layer=2)
+            G.add_edge(area, sub)
+            for c in range(2):
+                leaf = f"Subárea {a}.{b}.{c}"
+                G.add_node(leaf, origin="CNPQ", layer=3)
+                G.add_edge(sub, leaf)
+    # Tópicos enxertados em várias folhas, inclusive de grandes áreas diferentes.
+    for t in range(8):
+        topic = f"Tópico {t}"
+        G.add_node(topic, origin="LATTES", layer=5, Category=f"Categoria {t % 3}")
+        G.add_edge(f"Subárea {t % 3}.{t % 2}.0", topic)
+        if t % 2:
+            G.add_edge(f"Subárea {(t + 1) % 3}.2.1", topic)
+    return G
+
+
+def _with_cycle():
+    # Rótulo do LLM igual a um nó do CNPq: o enxerto liga a folha de volta à área.
+    G = _taxonomy()
+    G.nodes["Área 1.1"]["origin"] = "LATTES"
+    G.nodes["Área 1.1"]["Category"] = "Categoria 1"
+    G.add_edge("Subárea 0.0.0", "Área 1.1")
+    G.add_edge("Subárea 1.1.0", "Grande Área 1")
+    return G
+
+
+@pytest.mark.parametrize("build", [_taxonomy, _with_cycle])
+def test_focused_subgraph_matches_traversal(build):
+    G = build()
+    index = ClosureIndex(G)
+    selections = [None, [], ["Categoria 0"], ["Categoria 1", "Categoria 2"], ["Inexistente"]]
+    for selected in selections:
+        expected = _focused_by_traversal(G, selected)
+        result = get_focused_subgraph(G, selected, index=index)
+        if not expected:
+            assert result is None
+        else:
+            assert set(result.nodes()) == expected
+            assert set(result.edges()) == set(G.subgraph(expected).edges())
+
+
+@pytest.mark.parametrize("build", [_taxonomy, _with_cycle])
+def test_tree_by_area_matches_traversal(build):
+    G = build()
+    index = ClosureIndex(G)
+    selections = [["Grande Área 0"], ["Área 1.2", "Subárea 2.0.1"], ["Tópico 3"], ["CNPQ_Raiz"], ["Inexistente"]]
+    for selected in selections:
+        expected = _tree_by_traversal(G, selected)
+        result = get_tree_by_area(G, selected, index=index)
+        if not expected:
+            assert result is None
+        else:
+            assert set(result.nodes()) == expected
@@ -0,0 +1,85 @@
+import os
+import pickle
+
+import networkx as nx
+import pytest
+
+from src.graph import graph_format, graph_versions
+from src.graph.graph_format import read_graph
+from src.graph.graph_store import GraphStore
+from src.graph.graph_versions import (acquire_lease, collect_garbage, pointer_path, publish_graph,
+                                      published_version, release_lease, resolve, versions_dir_for)
+
+
+@pytest.fixture
+def graph_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_versions, "VERSIONS_DIR", tmp_path / "versions")
+    monkeypatch.setattr(graph_format, "GRAPH_FORMAT", "pickle")
+    return tmp_path / "grafo_final.gpickle"
+
+
+def _graph(n):
+    G = nx.DiGraph(name=f"versão {n}")
+    G.add_edge("Raiz", f"Nó {n}")
+    return G
+
+
+def _versions(path):
+    return sorted(d.name for d in versions_dir_for(path).iterdir() if d.is_dir())
+
+
+def test_publish_links_canonical_path_to_version(graph_path):
+    version = publish_graph(_graph(1), graph_path)
+
+    versioned = versions_dir_for(graph_path) / version / graph_path.name
+    assert versioned.exists()
+    assert os.path.samefile(versioned, graph_path)
+    assert pointer_path(graph_path).exists()
+    assert published_version(graph_path) == version
+    assert resolve(graph_path) == versioned
+    assert read_graph(graph_path).graph["name"] == "versão 1"
+
+
+def test_publish_swaps_without_touching_open_versions(graph_path):
+    v1 = publish_graph(_graph(1), graph_path)
+    old_file = resolve(graph_path, v1)
+    v2 = publish_graph(_graph(2), graph_path)
+
+    assert v2 != v1
+    assert published_version(graph_path) == v2
+    assert read_graph(graph_path).graph["name"] == "versão 2"
+    # A versão anterior continua intacta para quem ainda a serve.
+    assert read_graph(old_file).graph["name"] == "versão 1"
+
+
+def test_collect_garbage_keeps_current_recent_and_leased(graph_path):
+    leased = publish_graph(_graph(0), graph_path)
+    acquire_lease(graph_path, leased)
+    published = [leased] + [publish_graph(_graph(n), graph_path) for n in range(1, 6)]
+
+    # Atual + `KEEP_VERSIONS` mais recentes + a versão com leitor vivo.
+    expected = sorted([leased] + published[-(graph_versions.KEEP_VERSIONS + 1):])
+    assert _versions(graph_path) == expected
+    assert published_version(graph_path) == published[-1]
+
+    release_lease(graph_path, leased)
+    assert collect_garbage(graph_path) == [leased]
+    assert _versions(graph_path) == sorted(published[-(graph_versions.KEEP_VERSIONS + 1):])
+
+
+def test_outside_overwrite_falls_back_to_the_file(graph_path):
+    publish_graph(_graph(1), graph_path)
+    store = GraphStore()
+    assert store.get(graph_path).graph["name"] == "versão 1"
+
+    # Gravação fora do `publish_graph` (ex.: `git pull` do grafo versionado).
+    tmp = graph_path.with_name("externo.tmp")
+    with open(tmp, 'wb') as f:
+        pickle.dump(_graph(9), f)
+    os.replace(tmp, graph_path)
+
+    assert published_version(graph_path) is None
+    version, source, versioned = GraphStore._current(str(graph_path.resolve()))
+    assert source == graph_path.resolve() and not versioned
+    assert version == GraphStore.file_version(graph_path)
+    assert store.get(graph_path).graph["name"] == "versão 9"
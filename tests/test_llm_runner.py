@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+from src.etl import llm_runner
+from src.etl.llm_runner import TokenBucket, invoke_all
+
+
+class StubChatModel:
+    """Chat model local: devolve o texto da entrada, falhando antes conforme `failures`.
+
+    `failures` mapeia o texto para a lista de exceções levantadas nas primeiras chamadas.
+    """
+
+    def __init__(self, failures=None, delays=None):
+        self.failures = {k: list(v) for k, v in (failures or {}).items()}
+        self.delays = delays or {}
+        self.calls = {}
+
+    async def ainvoke(self, inputs):
+        text = inputs["text"]
+        self.calls[text] = self.calls.get(text, 0) + 1
+        await asyncio.sleep(self.delays.get(text, 0))
+        pending = self.failures.get(text)
+        if pending:
+            raise pending.pop(0)
+        return f"resposta:{text}"
+
+
+class CachedStub(StubChatModel):
+    def __init__(self, cached):
+        super().__init__()
+        self.cached = cached
+
+    def peek(self, inputs):
+        return self.cached.get(inputs["text"])
+
+
+def _inputs(*texts):
+    return [{"text": t} for t in texts]
+
+
+def test_results_follow_input_order():
+    chain = StubChatModel(delays={"a": 0.03, "b": 0.0, "c": 0.01})
+    results = invoke_all(chain, _inputs("a", "b", "c"), max_concurrency=3, requests_per_second=None)
+    assert results == ["resposta:a", "resposta:b", "resposta:c"]
+
+
+def test_transient_errors_are_retried():
+    chain = StubChatModel(failures={"a": [TimeoutError(), ConnectionError()]})
+    results = invoke_all(chain, _inputs("a", "b"), requests_per_second=None, base_delay=0.001)
+    assert results == ["resposta:a", "resposta:b"]
+    assert chain.calls == {"a": 3, "b": 1}
+
+
+def test_non_transient_errors_are_not_retried():
+    erro = ValueError("resposta fora do schema")
+    chain = StubChatModel(failures={"a": [erro]})
+    results = invoke_all(chain, _inputs("a", "b"), requests_per_second=None, base_delay=0.001)
+    assert results[0] is erro
+    assert results[1] == "resposta:b"
+    assert chain.calls["a"] == 1
+
+
+def test_retries_give_up_after_max_retries():
+    chain = StubChatModel(failures={"a": [TimeoutError() for _ in range(5)]})
+    done = []
+    results = invoke_all(chain, _inputs("a"), requests_per_second=None, max_retries=2,
+                         base_delay=0.001, on_done=lambda i, r: done.append(i))
+    assert isinstance(results[0], TimeoutError)
+    assert chain.calls["a"] == 3
+    assert done == [0]
+
+
+def test_cached_responses_skip_the_chain():
+    chain = CachedStub({"a": "do cache"})
+    results = invoke_all(chain, _inputs("a", "b"), requests_per_second=None)
+    assert results == ["do cache", "resposta:b"]
+    assert chain.calls == {"b": 1}
+
+
+def test_openai_transient_errors_are_classified():
+    openai = pytest.importorskip("openai")
+    assert openai.RateLimitError in llm_runner.TRANSIENT_ERRORS
+    assert openai.AuthenticationError not in llm_runner.TRANSIENT_ERRORS
+    assert openai.BadRequestError not in llm_runner.TRANSIENT_ERRORS
+
+
+def test_token_bucket_serves_waiters_in_arrival_order():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=1)
+        order = []
+
+        async def worker(i):
+            await bucket.acquire()
+            order.append((i, time.monotonic()))
+
+        inicio = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(5)))
+        return inicio, order
+
+    inicio, order = asyncio.run(run())
+    assert [i for i, _ in order] == list(range(5))
+    # Um token de rajada e os outros quatro a 50/s.
+    assert order[-1][1] - inicio >= 4 / 50 * 0.9
+
+
+def test_token_bucket_limits_request_rate():
+    async def run():
+        bucket = TokenBucket(rate=40, capacity=2)
+        inicio = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - inicio
+
+    # Dois tokens de rajada, os outros quatro a 40/s.
+    assert asyncio.run(run()) >= 4 / 40 * 0.9
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import pytest
+
+for _module in ("pydantic", "langchain_openai", "langchain_core", "dotenv"):
+    pytest.importorskip(_module)
+
+from src.etl.topic_store import TopicStore
+from src.graph import micro_graph_extractor
+from src.graph.micro_graph_extractor import ExtractionJournal, build_topic_micro_graph, document_fingerprint
+
+
+class StubChain:
+    """Extrai uma tríade fixa por documento; falha nos textos de `fail_on` (queda no meio do tópico)."""
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.calls = []
+
+    def invoke(self, inputs):
+        text = inputs["text"]
+        self.calls.append(text)
+        if text in self.fail_on:
+            raise RuntimeError("conexão perdida")
+        relation = SimpleNamespace(source=text.split()[0], target="Aplicação", relation_type="aplica-se em")
+        return SimpleNamespace(triples=[relation])
+
+
+DOCS = ["Redes neurais em imagens", "Grafos de conhecimento", "Otimização convexa", "Visão computacional"]
+
+
+def test_resumed_extraction_skips_journaled_documents(tmp_path):
+    journal_path = tmp_path / "extraction_journal.jsonl"
+    first = StubChain(fail_on=DOCS[2:])
+    G, failures = build_topic_micro_graph(1, DOCS, first, ExtractionJournal(journal_path))
+    assert failures == 2
+    assert G.has_edge("Redes", "Aplicação")
+
+    # Nova execução, com o diário relido do disco: só os documentos que faltaram vão ao LLM.
+    resumed = StubChain()
+    journal = ExtractionJournal(journal_path)
+    assert journal.get_triples(document_fingerprint(DOCS[0])) == [["Redes", "Aplicação", "aplica-se em"]]
+    G, failures = build_topic_micro_graph(1, DOCS, resumed, journal)
+    assert failures == 0
+    assert resumed.calls == DOCS[2:]
+    assert {source for source, _ in G.edges()} == {"Redes", "Grafos", "Otimização", "Visão"}
+
+    # Os mesmos documentos em outro tópico também não são extraídos de novo.
+    again = StubChain()
+    build_topic_micro_graph(2, DOCS, again, ExtractionJournal(journal_path))
+    assert again.calls == []
+
+
+def test_unchanged_topic_is_not_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setattr(micro_graph_extractor, "MICRO_GRAPHS_DIR", tmp_path)
+    store = TopicStore(tmp_path / "topic_store")
+    store.write_mapping(DOCS, [7, 7, 7, 8])
+    journal = ExtractionJournal(tmp_path / "extraction_journal.jsonl")
+
+    chain = StubChain()
+    assert micro_graph_extractor._process_topic(7, store, chain, journal, incremental=True)
+    assert chain.calls and (tmp_path / "topico_7.gpickle").exists()
+
+    resumed = StubChain(fail_on=DOCS)
+    assert micro_graph_extractor._process_topic(7, store, resumed, ExtractionJournal(journal.path), incremental=True)
+    assert resumed.calls == []
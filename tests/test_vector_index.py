@@ -0,0 +1,51 @@
+import numpy as np
+
+from src.graph.vector_index import ExactIndex, IVFIndex, top_k_parents
+
+
+def _tied_vectors(seed=0, n_queries=200, n_candidates=60, dim=4):
+    """Vetores ±1 com candidatos repetidos: normalizados viram ±0.5, e os produtos internos
+    são exatos em float32 (sem depender da ordem de soma do BLAS), forçando empates exatos."""
+    rng = np.random.default_rng(seed)
+    queries = rng.choice([-1.0, 1.0], size=(n_queries, dim)).astype(np.float32)
+    candidates = rng.choice([-1.0, 1.0], size=(n_candidates, dim)).astype(np.float32)
+    return queries, candidates
+
+
+def _normalized(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def test_top_1_matches_argmax_with_ties():
+    queries, candidates = _tied_vectors()
+    sims = _normalized(queries) @ _normalized(candidates).T
+
+    idx, scores = top_k_parents(queries, candidates, k=1)
+
+    np.testing.assert_array_equal(idx[:, 0], np.argmax(sims, axis=1))
+    np.testing.assert_array_equal(scores[:, 0], sims.max(axis=1))
+
+
+def test_top_k_matches_stable_sort_with_ties():
+    queries, candidates = _tied_vectors(seed=1)
+    sims = _normalized(queries) @ _normalized(candidates).T
+
+    idx, _ = top_k_parents(queries, candidates, k=5, chunk_size=32)
+
+    np.testing.assert_array_equal(idx, np.argsort(-sims, axis=1, kind="stable")[:, :5])
+
+
+def test_ivf_with_all_lists_matches_exact_with_ties():
+    queries, candidates = _tied_vectors(seed=2)
+    names = [f"n{i}" for i in range(len(candidates))]
+    exact = ExactIndex(names, candidates)
+    ivf = IVFIndex(names, candidates, n_lists=6, nprobe=6)
+
+    exact_idx, exact_scores = exact.search(queries, k=3)
+    ivf_idx, ivf_scores = ivf.search(queries, k=3)
+
+    np.testing.assert_array_equal(ivf_idx, exact_idx)
+    np.testing.assert_allclose(ivf_scores, exact_scores, rtol=1e-6)